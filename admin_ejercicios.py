@@ -1,16 +1,28 @@
 # backend/admin_ejercicios.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, ValidationError
+from typing import Optional, List, Literal
 import models
+import catalogo
+import buscador
+import estadisticas
+import corrector
+import progreso
 from dependencies import get_db, require_admin
+from respuestas import respuesta_lista
+from schemas import Mensaje, Creado, EjercicioDetalle, InformeImportacion, CasoPruebaOut
 
 router = APIRouter(
     prefix="/api/admin/ejercicios",
     tags=["Admin-Ejercicios"]
 )
 
+# Ejercicios por INSERT al importar en streaming (NDJSON)
+IMPORTAR_TAMANO_BLOQUE = 500
+
 # =========================================================
 # Helpers
 # =========================================================
@@ -73,21 +85,39 @@ class EjercicioUpdate(BaseModel):
     subcategoria: Optional[str] = None
 
 
+class CasoPruebaIn(BaseModel):
+    entrada: str = ""
+    salida_esperada: str
+
+
 # =========================================================
 # Listar ejercicios
 # =========================================================
 
-@router.get("/")
+@router.get("/", response_model=List[EjercicioDetalle])
 def listar_ejercicios(
     categoria_id: Optional[int] = None,
     dificultad: Optional[str] = None,
     subcategoria: Optional[str] = None,
-    skip: int = 0,
-    limit: int = 200,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(200, ge=1, le=1000),
+    cursor: Optional[int] = None,
+    vista: Literal["resumen", "completa"] = "resumen",
     db: Session = Depends(get_db),
     admin = Depends(require_admin)
 ):
-    q = db.query(models.Ejercicio)
+    """
+    Por defecto solo devuelve las columnas de resumen (sin enunciado ni solución);
+    el ejercicio completo está en GET /{ejercicio_id}, o con vista=completa.
+
+    Modo cursor: si se pasa `cursor` (último id recibido) se filtra por id < cursor
+    en lugar de usar OFFSET, y la siguiente página viene en la cabecera X-Next-Cursor.
+    Sin cursor se mantiene skip/limit.
+    """
+    columnas = catalogo.COLUMNAS_RESUMEN
+    if vista == "completa":
+        columnas += (models.Ejercicio.enunciado, models.Ejercicio.solucion)
+    q = db.query(*columnas)
 
     if categoria_id:
         q = q.filter(models.Ejercicio.categoria_id == categoria_id)
@@ -98,17 +128,28 @@ def listar_ejercicios(
     if subcategoria:
         q = q.filter(models.Ejercicio.subcategoria == subcategoria)
 
-    return q.order_by(models.Ejercicio.id.desc()).offset(skip).limit(limit).all()
-
+    siguiente = None
+    if cursor is None:
+        ejercicios = q.order_by(models.Ejercicio.id.desc()).offset(skip).limit(limit).all()
+    else:
+        ejercicios = q.filter(models.Ejercicio.id < cursor)\
+            .order_by(models.Ejercicio.id.desc())\
+            .limit(limit + 1)\
+            .all()
 
+        if len(ejercicios) > limit:
+            ejercicios = ejercicios[:limit]
+            siguiente = str(ejercicios[-1].id)
 
+    # Filas de columnas sueltas: se serializan tal cual, sin objetos ORM
+    return respuesta_lista([e._asdict() for e in ejercicios], siguiente)
 
 
 # =========================================================
 # Crear ejercicio
 # =========================================================
 
-@router.post("/")
+@router.post("/", response_model=Creado)
 def crear_ejercicio(
     payload: EjercicioCreate,
     db: Session = Depends(get_db),
@@ -128,8 +169,11 @@ def crear_ejercicio(
     )
 
     db.add(nuevo)
+    estadisticas.sumar(db, ejercicios=1)
     db.commit()
     db.refresh(nuevo)
+    catalogo.invalidar()
+    buscador.indexar(nuevo.id, buscador.datos_de(nuevo))
 
     return {
         "mensaje": "Ejercicio creado",
@@ -141,7 +185,90 @@ def crear_ejercicio(
 # Importar varios ejercicios de golpe
 # =========================================================
 
-@router.post("/importar-lote")
+def _validar_para_importar(i: int, item: EjercicioCreate, errores: list):
+    """
+    Devuelve la fila lista para insertar, o None (y anota el error) si no es válida.
+    """
+    if not item.titulo or item.titulo.strip() == "":
+        errores.append({
+            "index": i,
+            "titulo": None,
+            "error": "El título es obligatorio"
+        })
+        return None
+
+    return {
+        "titulo": item.titulo.strip(),
+        "enunciado": limpiar_texto(item.enunciado, ""),
+        "solucion": limpiar_texto(item.solucion, ""),
+        "dificultad": normalizar_dificultad(item.dificultad),
+        "lenguaje": limpiar_texto(item.lenguaje, "Python"),
+        "categoria_id": item.categoria_id,
+        "subcategoria": limpiar_texto(item.subcategoria, None)
+    }
+
+
+def _insertar_lote(db: Session, filas: list, ejercicios_creados: list, errores: list):
+    """
+    Inserta [(index, fila), ...] con un único INSERT ... RETURNING multi-fila
+    en una sola transacción. Si algo falla se repite fila a fila con un
+    SAVEPOINT por fila, para saber cuál falla sin perder las demás.
+    """
+    if not filas:
+        return
+
+    stmt = insert(models.Ejercicio).returning(
+        models.Ejercicio.id, models.Ejercicio.titulo, sort_by_parameter_order=True
+    )
+
+    try:
+        resultado = db.execute(stmt, [fila for _, fila in filas]).all()
+        estadisticas.sumar(db, ejercicios=len(resultado))
+        db.commit()
+        creados = [(i, r) for (i, _), r in zip(filas, resultado)]
+    except Exception:
+        db.rollback()
+        creados = []
+        for i, fila in filas:
+            try:
+                with db.begin_nested():
+                    creados.append((i, db.execute(stmt, [fila]).one()))
+            except Exception as e:
+                errores.append({
+                    "index": i,
+                    "titulo": fila["titulo"],
+                    "error": str(e)
+                })
+        estadisticas.sumar(db, ejercicios=len(creados))
+        db.commit()
+
+    por_indice = dict(filas)
+    for i, r in creados:
+        buscador.indexar(r.id, por_indice[i])
+        ejercicios_creados.append({
+            "index": i,
+            "id": r.id,
+            "titulo": r.titulo
+        })
+
+
+def _informe_importacion(ejercicios_creados: list, errores: list) -> dict:
+    if ejercicios_creados:
+        catalogo.invalidar()
+
+    ejercicios_creados.sort(key=lambda x: x["index"])
+    errores.sort(key=lambda x: x["index"])
+
+    return {
+        "mensaje": "Importación completada",
+        "insertados": len(ejercicios_creados),
+        "errores": len(errores),
+        "ejercicios_creados": ejercicios_creados,
+        "detalle_errores": errores
+    }
+
+
+@router.post("/importar-lote", response_model=InformeImportacion)
 def importar_ejercicios_lote(
     payload: List[EjercicioCreate],
     db: Session = Depends(get_db),
@@ -149,8 +276,9 @@ def importar_ejercicios_lote(
 ):
     """
     Importación parcial real:
-    - Si un ejercicio falla, los demás se siguen intentando.
-    - Se hace commit por cada ejercicio válido.
+    - Se valida todo el lote antes de tocar la BD.
+    - Los válidos se insertan con un único INSERT multi-fila y un solo commit.
+    - Si un ejercicio falla en BD, los demás se siguen insertando (savepoint por fila).
     """
     if not payload or len(payload) == 0:
         raise HTTPException(status_code=400, detail="No se han enviado ejercicios")
@@ -158,57 +286,78 @@ def importar_ejercicios_lote(
     ejercicios_creados = []
     errores = []
 
+    filas = []
     for i, item in enumerate(payload):
-        try:
-            if not item.titulo or item.titulo.strip() == "":
-                errores.append({
-                    "index": i,
-                    "titulo": None,
-                    "error": "El título es obligatorio"
-                })
-                continue
-
-            nuevo = models.Ejercicio(
-                titulo=item.titulo.strip(),
-                enunciado=limpiar_texto(item.enunciado, ""),
-                solucion=limpiar_texto(item.solucion, ""),
-                dificultad=normalizar_dificultad(item.dificultad),
-                lenguaje=limpiar_texto(item.lenguaje, "Python"),
-                categoria_id=item.categoria_id,
-                subcategoria=limpiar_texto(item.subcategoria, None)
-            )
-
-            db.add(nuevo)
-            db.commit()
-            db.refresh(nuevo)
-
-            ejercicios_creados.append({
-                "index": i,
-                "id": nuevo.id,
-                "titulo": nuevo.titulo
-            })
+        fila = _validar_para_importar(i, item, errores)
+        if fila is not None:
+            filas.append((i, fila))
+
+    _insertar_lote(db, filas, ejercicios_creados, errores)
+
+    return _informe_importacion(ejercicios_creados, errores)
 
-        except Exception as e:
-            db.rollback()
+
+@router.post("/importar-ndjson", response_model=InformeImportacion)
+async def importar_ejercicios_ndjson(
+    request: Request,
+    db: Session = Depends(get_db),
+    admin = Depends(require_admin)
+):
+    """
+    Igual que /importar-lote pero leyendo el cuerpo como NDJSON (un ejercicio
+    JSON por línea) a medida que llega, e insertando en bloques de
+    IMPORTAR_TAMANO_BLOQUE. Así un banco enorme nunca está entero en memoria.
+    """
+    ejercicios_creados = []
+    errores = []
+    filas = []
+    i = 0
+
+    async for linea in _lineas(request):
+        if not linea.strip():
+            continue
+
+        try:
+            item = EjercicioCreate.model_validate_json(linea)
+        except ValidationError as e:
             errores.append({
                 "index": i,
-                "titulo": getattr(item, "titulo", None),
+                "titulo": None,
                 "error": str(e)
             })
+        else:
+            fila = _validar_para_importar(i, item, errores)
+            if fila is not None:
+                filas.append((i, fila))
+        i += 1
 
-    return {
-        "mensaje": "Importación completada",
-        "insertados": len(ejercicios_creados),
-        "errores": len(errores),
-        "ejercicios_creados": ejercicios_creados,
-        "detalle_errores": errores
-    }
+        if len(filas) >= IMPORTAR_TAMANO_BLOQUE:
+            await run_in_threadpool(_insertar_lote, db, filas, ejercicios_creados, errores)
+            filas = []
+
+    await run_in_threadpool(_insertar_lote, db, filas, ejercicios_creados, errores)
+
+    if i == 0:
+        raise HTTPException(status_code=400, detail="No se han enviado ejercicios")
+
+    return _informe_importacion(ejercicios_creados, errores)
+
+
+async def _lineas(request: Request):
+    pendiente = b""
+    async for trozo in request.stream():
+        pendiente += trozo
+        *lineas, pendiente = pendiente.split(b"\n")
+        for linea in lineas:
+            yield linea
+    if pendiente:
+        yield pendiente
 
 # =========================================================
 # Obtener un ejercicio por id
 # =========================================================
 
-@router.get("/{ejercicio_id}")
+@router.get("/{ejercicio_id}", response_model=EjercicioDetalle)
 def obtener_ejercicio(
     ejercicio_id: int,
     db: Session = Depends(get_db),
@@ -226,7 +375,7 @@ def obtener_ejercicio(
 # Editar ejercicio
 # =========================================================
 
-@router.put("/{ejercicio_id}")
+@router.put("/{ejercicio_id}", response_model=Mensaje)
 def editar_ejercicio(
     ejercicio_id: int,
     payload: EjercicioUpdate,
@@ -264,6 +413,8 @@ def editar_ejercicio(
         setattr(e, field, value)
 
     db.commit()
+    catalogo.invalidar()
+    buscador.indexar(e.id, buscador.datos_de(e))
 
     return {"mensaje": "Ejercicio actualizado"}
 
@@ -272,7 +423,7 @@ def editar_ejercicio(
 # Borrar ejercicio
 # =========================================================
 
-@router.delete("/{ejercicio_id}")
+@router.delete("/{ejercicio_id}", response_model=Mensaje)
 def borrar_ejercicio(
     ejercicio_id: int,
     db: Session = Depends(get_db),
@@ -283,17 +434,78 @@ def borrar_ejercicio(
     if not e:
         raise HTTPException(status_code=404, detail="Ejercicio no encontrado")
 
+    db.query(models.CasoPrueba).filter(models.CasoPrueba.ejercicio_id == ejercicio_id).delete()
+    db.query(models.Correccion).filter(models.Correccion.ejercicio_id == ejercicio_id).delete()
+    progreso.eliminar(db, ejercicio_id=ejercicio_id)
     db.delete(e)
+    estadisticas.sumar(db, ejercicios=-1)
     db.commit()
+    catalogo.invalidar()
+    buscador.eliminar(ejercicio_id)
+    corrector.invalidar_casos(ejercicio_id)
 
     return {"mensaje": "Ejercicio eliminado"}
 
 
+# =========================================================
+# Casos de prueba (corrección automática)
+# =========================================================
+
+@router.get("/{ejercicio_id}/casos", response_model=List[CasoPruebaOut])
+def listar_casos(
+    ejercicio_id: int,
+    db: Session = Depends(get_db),
+    admin = Depends(require_admin)
+):
+    return respuesta_lista([
+        c._asdict()
+        for c in db.query(
+            models.CasoPrueba.id,
+            models.CasoPrueba.orden,
+            models.CasoPrueba.entrada,
+            models.CasoPrueba.salida_esperada,
+        )
+        .filter(models.CasoPrueba.ejercicio_id == ejercicio_id)
+        .order_by(models.CasoPrueba.orden, models.CasoPrueba.id)
+    ])
+
+
+@router.put("/{ejercicio_id}/casos", response_model=Mensaje)
+def guardar_casos(
+    ejercicio_id: int,
+    casos: List[CasoPruebaIn],
+    db: Session = Depends(get_db),
+    admin = Depends(require_admin)
+):
+    """
+    Sustituye todos los casos del ejercicio. Las correcciones memorizadas con
+    los casos anteriores dejan de usarse (la clave incluye el hash de los casos).
+    """
+    if not db.query(models.Ejercicio.id).filter(models.Ejercicio.id == ejercicio_id).first():
+        raise HTTPException(status_code=404, detail="Ejercicio no encontrado")
+
+    db.query(models.CasoPrueba).filter(models.CasoPrueba.ejercicio_id == ejercicio_id).delete()
+    if casos:
+        db.execute(insert(models.CasoPrueba), [
+            {
+                "ejercicio_id": ejercicio_id,
+                "orden": i,
+                "entrada": c.entrada,
+                "salida_esperada": c.salida_esperada,
+            }
+            for i, c in enumerate(casos)
+        ])
+    db.commit()
+    corrector.invalidar_casos(ejercicio_id)
+
+    return {"mensaje": f"{len(casos)} casos de prueba guardados"}
+
+
 # =========================================================
 # Duplicar ejercicio
 # =========================================================
 
-@router.post("/{ejercicio_id}/duplicar")
+@router.post("/{ejercicio_id}/duplicar", response_model=Creado)
 def duplicar_ejercicio(
     ejercicio_id: int,
     db: Session = Depends(get_db),
@@ -315,8 +527,11 @@ def duplicar_ejercicio(
     )
 
     db.add(clon)
+    estadisticas.sumar(db, ejercicios=1)
     db.commit()
     db.refresh(clon)
+    catalogo.invalidar()
+    buscador.indexar(clon.id, buscador.datos_de(clon))
 
     return {
         "mensaje": "Ejercicio duplicado",
@@ -1,8 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 import models
+import database
 from models import Usuario
-from dependencies import get_db, get_password_hash, require_admin
+from dependencies import get_db, require_admin, invalidar_usuario, estadisticas_auth_cache
+import hashing
+import estadisticas as estadisticas_db
+import exportacion
+import corrector
+import codigos
+import progreso
+import limites
+import sesiones
+from consultas import consulta_entregas, filtrar_entregas, paginar_entregas
+from respuestas import respuesta_lista
+from schemas import Mensaje, Creado, UsuarioOut, Estadisticas, EntregaAdmin, ProgresoOut, ProgresoAlumno
 
 
 router = APIRouter(
@@ -11,15 +27,19 @@ router = APIRouter(
 )
 
 # 🟩 Listar usuarios
-@router.get("/usuarios")
+@router.get("/usuarios", response_model=List[UsuarioOut])
 def listar_usuarios(
     db: Session = Depends(get_db),
     prof = Depends(require_admin)
 ):
-    return db.query(Usuario).all()
+    # Solo columnas públicas: hashed_password no sale de la BD
+    return respuesta_lista([
+        u._asdict()
+        for u in db.query(Usuario.id, Usuario.nombre, Usuario.email, Usuario.rol).order_by(Usuario.id)
+    ])
 
 # 🟥 Borrar usuario
-@router.delete("/usuarios/{usuario_id}")
+@router.delete("/usuarios/{usuario_id}", response_model=Mensaje)
 def borrar_usuario(
     usuario_id: int,
     db: Session = Depends(get_db),
@@ -29,34 +49,47 @@ def borrar_usuario(
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
+    progreso.eliminar(db, usuario_id=usuario_id)
+    sesiones.revocar_usuario(db, usuario_id)
     db.delete(usuario)
+    estadisticas_db.sumar(db, usuarios=-1, **estadisticas_db.delta_rol(usuario.rol, -1))
     db.commit()
+    invalidar_usuario(usuario_id)
     return {"mensaje": "Usuario eliminado"}
 
 # 🟦 Crear usuario
-@router.post("/usuarios")
-def crear_usuario(
+@router.post("/usuarios", response_model=Creado)
+async def crear_usuario(
     email: str,
     nombre: str,
     password: str,
     db: Session = Depends(get_db),
     prof = Depends(require_admin)
 ):
-    if db.query(Usuario).filter(Usuario.nombre == nombre).first():
+    existente = await run_in_threadpool(
+        lambda: db.query(Usuario).filter(Usuario.nombre == nombre).first()
+    )
+    if existente:
         raise HTTPException(status_code=400, detail="Ese nombre ya existe")
 
     nuevo = Usuario(
         email=email,
         nombre=nombre,
-        hashed_password=get_password_hash(password),
+        hashed_password=await hashing.hash_password_async(password),
         rol="alumno"
     )
-    db.add(nuevo)
-    db.commit()
-    return {"mensaje": "Usuario creado", "id": nuevo.id}
+
+    def guardar():
+        db.add(nuevo)
+        estadisticas_db.sumar(db, usuarios=1, alumnos=1)
+        db.commit()
+        return nuevo.id
+
+    nuevo_id = await run_in_threadpool(guardar)
+    return {"mensaje": "Usuario creado", "id": nuevo_id}
 
 # 🟨 Cambiar rol
-@router.put("/usuarios/{usuario_id}/rol")
+@router.put("/usuarios/{usuario_id}/rol", response_model=Mensaje)
 def cambiar_rol(
     usuario_id: int,
     nuevo_rol: str,
@@ -67,74 +100,232 @@ def cambiar_rol(
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
+    estadisticas_db.sumar(db, **estadisticas_db.delta_rol(usuario.rol, -1))
+    estadisticas_db.sumar(db, **estadisticas_db.delta_rol(nuevo_rol, 1))
     usuario.rol = nuevo_rol
     db.commit()
+    invalidar_usuario(usuario_id)
     return {"mensaje": f"Rol cambiado a {nuevo_rol}"}
 
 # 🟧 Resetear contraseña
-@router.put("/usuarios/{usuario_id}/password")
-def reset_password(
+@router.put("/usuarios/{usuario_id}/password", response_model=Mensaje)
+async def reset_password(
     usuario_id: int,
     new_password: str,
     db: Session = Depends(get_db),
     prof = Depends(require_admin)
 ):
-    usuario = db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    usuario = await run_in_threadpool(
+        lambda: db.query(Usuario).filter(Usuario.id == usuario_id).first()
+    )
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
 
-    usuario.hashed_password = get_password_hash(new_password)
-    db.commit()
+    usuario.hashed_password = await hashing.hash_password_async(new_password)
+
+    def guardar():
+        # Las sesiones abiertas con la contraseña anterior ya no se pueden renovar
+        sesiones.revocar_usuario(db, usuario_id)
+        db.commit()
+
+    await run_in_threadpool(guardar)
+    invalidar_usuario(usuario_id)
     return {"mensaje": "Contraseña actualizada"}
 
 # 🟦 Estadísticas del sistema
-@router.get("/estadisticas")
+@router.get("/estadisticas", response_model=Estadisticas)
 def estadisticas(db: Session = Depends(get_db), admin = Depends(require_admin)):
 
-    total_usuarios = db.query(Usuario).count()
-    total_admins = db.query(Usuario).filter(Usuario.rol == "admin").count()
-    total_alumnos = db.query(Usuario).filter(Usuario.rol == "alumno").count()
+    totales = estadisticas_db.leer_totales(db)
 
-    total_categorias = db.query(models.Categoria).count()
-    total_ejercicios = db.query(models.Ejercicio).count()
-    total_entregas = db.query(models.Entrega).count()
-
-    # últimas 5 entregas
-    entregas = db.query(models.Entrega)\
+    # últimas 5 entregas (una sola query con JOIN)
+    entregas = consulta_entregas(db)\
         .order_by(models.Entrega.fecha_envio.desc())\
         .limit(5)\
         .all()
 
     ultimas = [
         {
-            "usuario": e.usuario.nombre,
-            "ejercicio": e.ejercicio.titulo,
+            "usuario": e.usuario,
+            "ejercicio": e.ejercicio,
             "fecha_envio": e.fecha_envio.isoformat(),
         } for e in entregas
     ]
 
     return {
-        "usuarios": total_usuarios,
-        "admins": total_admins,
-        "alumnos": total_alumnos,
-        "categorias": total_categorias,
-        "ejercicios": total_ejercicios,
-        "entregas": total_entregas,
+        "usuarios": totales["usuarios"],
+        "admins": totales["admins"],
+        "alumnos": totales["alumnos"],
+        "categorias": totales["categorias"],
+        "ejercicios": totales["ejercicios"],
+        "entregas": totales["entregas"],
         "ultimas_entregas": ultimas
     }
 
+# 🟦 Recalcular contadores materializados
+@router.post("/estadisticas/recalcular", response_model=Dict[str, int])
+def recalcular_estadisticas(db: Session = Depends(get_db), admin = Depends(require_admin)):
+    return estadisticas_db.recalcular(db)
+
+# 🟩 Listar entregas (vista admin, con código y resultado)
+@router.get("/entregas", response_model=List[EntregaAdmin])
+def listar_entregas_admin(
+    usuario_id: Optional[int] = None,
+    ejercicio_id: Optional[int] = None,
+    categoria_id: Optional[int] = None,
+    resultado: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    con_codigo: bool = True,
+    db: Session = Depends(get_db),
+    admin = Depends(require_admin)
+):
+    q = filtrar_entregas(
+        consulta_entregas(db, detalle=True),
+        usuario_id, ejercicio_id, categoria_id, resultado, desde, hasta
+    )
+
+    # Sin limit ni cursor se mantiene el listado completo de siempre
+    siguiente = None
+    if limit is None and cursor is None:
+        filas = q.order_by(models.Entrega.id).all()
+    else:
+        filas, siguiente = paginar_entregas(q, cursor, limit or 100)
+
+    # El código sale de la tabla de blobs con una sola consulta para toda la página
+    textos = codigos.resolver(db, filas) if con_codigo else [None] * len(filas)
+
+    return respuesta_lista([
+        {
+            "id": f.id,
+            "usuario": f.usuario,
+            "ejercicio": f.ejercicio,
+            "codigo": codigo,
+            "fecha_envio": f.fecha_envio,
+            "resultado": f.resultado,
+            "categoria_id": f.categoria_id
+        }
+        for f, codigo in zip(filas, textos)
+    ], siguiente)
+
+# 🟩 Exportar entregas en streaming (NDJSON / CSV, opcionalmente .gz)
+@router.get("/entregas/exportar")
+def exportar_entregas(
+    formato: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    usuario_id: Optional[int] = None,
+    ejercicio_id: Optional[int] = None,
+    categoria_id: Optional[int] = None,
+    resultado: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    admin = Depends(require_admin)
+):
+    filtros = (usuario_id, ejercicio_id, categoria_id, resultado, desde, hasta)
+    nombre = f"entregas.{formato}" + (".gz" if gzip else "")
+
+    media_type = "application/x-ndjson" if formato == "ndjson" else "text/csv; charset=utf-8"
+    if gzip:
+        media_type = "application/gzip"
+
+    return StreamingResponse(
+        exportacion.generar(formato, gzip, filtros),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'},
+    )
+
+# 🟦 Estado de la caché de autenticación
+@router.get("/cache/auth", response_model=dict)
+def estado_cache_auth(admin = Depends(require_admin)):
+    return estadisticas_auth_cache()
+
+# 🟦 Estado del límite de peticiones
+@router.get("/limites", response_model=dict)
+def estado_limites(admin = Depends(require_admin)):
+    return limites.estadisticas()
+
+# 🟦 Estado del pool de conexiones
+@router.get("/pool", response_model=dict)
+def estado_pool(admin = Depends(require_admin)):
+    return database.estadisticas_pool()
+
+# 🟩 Progreso de la clase: una fila por alumno
+@router.get("/progreso", response_model=List[ProgresoAlumno])
+def progreso_clase(
+    categoria_id: Optional[int] = None,
+    ejercicio_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    admin = Depends(require_admin)
+):
+    return respuesta_lista(progreso.de_clase(db, categoria_id, ejercicio_id))
+
+# 🟩 Progreso de un alumno
+@router.get("/progreso/{usuario_id}", response_model=ProgresoOut)
+def progreso_alumno(
+    usuario_id: int,
+    categoria_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    admin = Depends(require_admin)
+):
+    if not db.query(Usuario.id).filter(Usuario.id == usuario_id).first():
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    return progreso.de_alumno(db, usuario_id, categoria_id)
+
+# 🟧 Rehacer la tabla de progreso desde las entregas
+@router.post("/progreso/recalcular", response_model=Dict[str, int])
+def recalcular_progreso(db: Session = Depends(get_db), admin = Depends(require_admin)):
+    filas = progreso.recalcular(db)
+    db.commit()
+    return {"filas": filas}
+
+# 🟦 Estado del corrector automático
+@router.get("/corrector", response_model=dict)
+def estado_corrector(admin = Depends(require_admin)):
+    return corrector.estado()
+
+# 🟧 Encolar entregas sin resultado de ejercicios con casos de prueba
+@router.post("/corrector/pendientes", response_model=Dict[str, int])
+def corregir_pendientes(
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+    admin = Depends(require_admin)
+):
+    if not corrector.CORRECCION_AUTOMATICA:
+        raise HTTPException(status_code=409, detail="La corrección automática está desactivada (CORRECCION_AUTOMATICA)")
+    con_casos = db.query(models.CasoPrueba.ejercicio_id).distinct()
+    pendientes = (
+        db.query(models.Entrega.id, models.Entrega.ejercicio_id, models.Entrega.codigo, models.Entrega.codigo_hash)
+        .filter(models.Entrega.resultado.is_(None), models.Entrega.ejercicio_id.in_(con_casos))
+        .order_by(models.Entrega.id.desc())
+        .limit(limit)
+        .all()
+    )
+    encoladas = sum(
+        1 for e, codigo in zip(pendientes, codigos.resolver(db, pendientes))
+        if corrector.encolar(e.id, e.ejercicio_id, codigo)
+    )
+    return {"pendientes": len(pendientes), "encoladas": encoladas}
+
 # ejemplo dentro del router admin
-@router.put("/entregas/{entrega_id}/revisar")
+@router.put("/entregas/{entrega_id}/revisar", response_model=Mensaje)
 def revisar_entrega(entrega_id: int, resultado: str = "revisado", db: Session = Depends(get_db), admin = Depends(require_admin)):
     e = db.query(models.Entrega).filter(models.Entrega.id == entrega_id).first()
     if not e: raise HTTPException(status_code=404, detail="No encontrado")
     e.resultado = resultado
+    progreso.actualizar_resultado(db, e.id, e.usuario_id, e.ejercicio_id, resultado)
     db.commit()
     return {"mensaje": "Entrega marcada"}
 
-@router.delete("/entregas/{entrega_id}")
+@router.delete("/entregas/{entrega_id}", response_model=Mensaje)
 def borrar_entrega(entrega_id: int, db: Session = Depends(get_db), admin = Depends(require_admin)):
     e = db.query(models.Entrega).filter(models.Entrega.id == entrega_id).first()
     if not e: raise HTTPException(status_code=404)
-    db.delete(e); db.commit()
+    db.delete(e)
+    db.flush()
+    # Puede ser la primera o la última del alumno: se rehace solo su fila
+    progreso.recalcular(db, e.usuario_id, e.ejercicio_id)
+    estadisticas_db.sumar(db, entregas=-1)
+    db.commit()
     return {"mensaje":"Eliminada"}
@@ -0,0 +1,218 @@
+# backend/api_async.py
+"""
+Versiones async de los endpoints calientes (auth, catálogo, entregas).
+Solo se montan con DB_ASYNC=1, delante de las versiones sync de main.py,
+que quedan ocultas porque FastAPI usa la primera ruta que coincide.
+
+Las consultas de consultas.py / catalogo.py / estadisticas.py se reutilizan
+tal cual con AsyncSession.run_sync: el código es síncrono pero la E/S va
+por el driver async, sin bloquear el event loop. La excepción es el snapshot
+del catálogo, que se construye en el threadpool (ver _snapshot).
+"""
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+import catalogo
+import estadisticas
+import hashing
+import ingesta
+import corrector
+import codigos
+import progreso
+import sesiones
+from consultas import consulta_entregas, filtrar_entregas, paginar_entregas
+from database import SessionLocal
+from dependencies import get_async_db, get_current_user_async
+from respuestas import respuesta_lista
+from schemas import (
+    UsuarioCreate, LoginRequest, EntregaCreate,
+    CategoriaOut, EjercicioResumen, EjercicioDetalle,
+    LoginOut, UsuarioCreado, EntregaRecibida, EntregaResumen,
+)
+
+router = APIRouter(tags=["Async"])
+
+
+# -------- Catálogo --------
+
+def _construir_snapshot():
+    db = SessionLocal()
+    try:
+        return catalogo.obtener(db)
+    finally:
+        db.close()
+
+
+async def _snapshot():
+    # catalogo.obtener consulta la BD con un threading.Lock cogido. Con run_sync
+    # correría en el hilo del event loop: otra corrutina que esperase el lock
+    # bloquearía el loop, y el que lo tiene ya no podría acabar su consulta.
+    # En el threadpool, con una sesión síncrona, solo esperan los hilos.
+    return catalogo.vigente() or await run_in_threadpool(_construir_snapshot)
+
+
+@router.get("/api/categorias/{categoria_id}", response_model=CategoriaOut)
+async def leer_categoria(
+    categoria_id: int,
+    request: Request,
+    usuario = Depends(get_current_user_async)
+):
+    snapshot = await _snapshot()
+    cuerpo = snapshot.categoria_por_id.get(categoria_id)
+    if cuerpo is None:
+        raise HTTPException(status_code=404, detail="Categoría no encontrada")
+    return catalogo.responder(request, cuerpo, snapshot)
+
+
+@router.get("/api/categorias", response_model=List[CategoriaOut])
+async def leer_categorias(
+    request: Request,
+    usuario = Depends(get_current_user_async)
+):
+    snapshot = await _snapshot()
+    return catalogo.responder(request, snapshot.categorias, snapshot)
+
+
+@router.get("/api/ejercicios", response_model=List[EjercicioResumen])
+async def leer_ejercicios(
+    request: Request,
+    usuario = Depends(get_current_user_async)
+):
+    snapshot = await _snapshot()
+    return catalogo.responder(request, snapshot.ejercicios, snapshot)
+
+
+# :int para no tapar /api/ejercicios/buscar, que está en main.py detrás de este router
+@router.get("/api/ejercicios/{ejercicio_id:int}", response_model=EjercicioDetalle, response_model_exclude_unset=True)
+async def leer_ejercicio(
+    ejercicio_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    usuario = Depends(get_current_user_async)
+):
+    ejercicio = await db.run_sync(lambda s: catalogo.detalle(s, ejercicio_id, con_solucion=usuario.rol == "admin"))
+    if ejercicio is None:
+        raise HTTPException(status_code=404, detail="Ejercicio no encontrado")
+    return ejercicio
+
+
+# -------- Auth --------
+
+@router.post("/api/login", response_model=LoginOut)
+async def login(request: LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    usuario = (await db.execute(
+        select(models.Usuario).where(models.Usuario.nombre == request.nombre)
+    )).scalars().first()
+
+    if not usuario:
+        raise HTTPException(status_code=401, detail="Credenciales inválidas")
+
+    valido, nuevo_hash = await hashing.verify_and_update_async(request.password, usuario.hashed_password)
+    if not valido:
+        raise HTTPException(status_code=401, detail="Credenciales inválidas")
+
+    # Rehash si ha cambiado el coste de bcrypt configurado (va en el commit de la sesión)
+    if nuevo_hash:
+        usuario.hashed_password = nuevo_hash
+
+    refresh_token = await db.run_sync(lambda s: sesiones.emitir(s, usuario.id))
+    await db.commit()
+    return sesiones.respuesta(usuario, refresh_token)
+
+
+@router.post("/api/usuarios", response_model=UsuarioCreado)
+async def crear_usuario(usuario: UsuarioCreate, db: AsyncSession = Depends(get_async_db)):
+    # Evitar duplicados por nombre
+    existente = (await db.execute(
+        select(models.Usuario.id).where(models.Usuario.nombre == usuario.nombre)
+    )).first()
+    if existente:
+        raise HTTPException(status_code=400, detail="El nombre de usuario ya existe")
+
+    nuevo_usuario = models.Usuario(
+        email=usuario.email,
+        nombre=usuario.nombre,
+        hashed_password=await hashing.hash_password_async(usuario.password),
+        rol="alumno"
+    )
+
+    db.add(nuevo_usuario)
+    await db.run_sync(lambda s: estadisticas.sumar(s, usuarios=1, alumnos=1))
+    await db.commit()
+
+    return {"mensaje": "Usuario creado", "usuario": {"id": nuevo_usuario.id, "nombre": nuevo_usuario.nombre}}
+
+
+# -------- Entregas --------
+
+@router.post("/api/entregas", response_model=EntregaRecibida, response_model_exclude_none=True)
+async def crear_entrega(
+    entrega: EntregaCreate,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    usuario = Depends(get_current_user_async)
+):
+    if ingesta.INGESTA_DIFERIDA:
+        if entrega.ejercicio_id not in (await _snapshot()).ids_ejercicios and not await db.run_sync(
+            lambda s: catalogo.existe_en_bd(s, entrega.ejercicio_id)
+        ):
+            raise HTTPException(status_code=404, detail="Ejercicio no encontrado")
+        # encolar hace fsync del spool: fuera del event loop
+        ticket = await run_in_threadpool(
+            ingesta.encolar, usuario.id, entrega.ejercicio_id, entrega.codigo, datetime.utcnow()
+        )
+        response.status_code = 202
+        return {"mensaje": "Entrega recibida", "ticket": ticket}
+
+    nueva = models.Entrega(
+        usuario_id=usuario.id,
+        ejercicio_id=entrega.ejercicio_id,
+        codigo_hash=await db.run_sync(lambda s: codigos.guardar(s, entrega.codigo)),
+        fecha_envio=datetime.utcnow()
+    )
+    db.add(nueva)
+    await db.flush()
+    fila = (nueva.usuario_id, nueva.ejercicio_id, nueva.fecha_envio, nueva.id)
+    await db.run_sync(lambda s: (progreso.registrar(s, [fila]), estadisticas.sumar(s, entregas=1)))
+    await db.commit()
+    corrector.encolar(nueva.id, entrega.ejercicio_id, entrega.codigo)
+    return {"mensaje": "Entrega guardada", "entrega_id": nueva.id}
+
+
+@router.get("/api/entregas", response_model=List[EntregaResumen])
+async def listar_entregas(
+    usuario_id: Optional[int] = None,
+    ejercicio_id: Optional[int] = None,
+    categoria_id: Optional[int] = None,
+    resultado: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+    usuario = Depends(get_current_user_async)
+):
+    def consultar(s):
+        q = filtrar_entregas(
+            consulta_entregas(s),
+            usuario_id, ejercicio_id, categoria_id, resultado, desde, hasta
+        )
+        # Sin limit ni cursor se mantiene el listado completo de siempre
+        if limit is None and cursor is None:
+            return q.order_by(models.Entrega.id).all(), None
+        return paginar_entregas(q, cursor, limit or 100)
+
+    filas, siguiente = await db.run_sync(consultar)
+
+    return respuesta_lista([
+        {
+            "id": f.id,
+            "usuario": f.usuario,
+            "ejercicio": f.ejercicio,
+            "fecha_envio": f.fecha_envio,
+        }
+        for f in filas
+    ], siguiente)
@@ -0,0 +1,187 @@
+# backend/arranque.py
+"""
+Arranque en frío y sondas de vida / disponibilidad.
+
+El hosting gratuito duerme el proceso y lo vuelve a levantar con el primer
+request, así que importar main.py no toca la BD:
+
+- El esquema se crea con crear_esquema.py en el despliegue. CREAR_ESQUEMA=1
+  lo crea además en el arranque (por defecto solo con SQLite, en local).
+- El motor de la BD se crea al primer uso (database.get_engine).
+- El resto (contadores, progreso, snapshot del catálogo e índice del
+  buscador) se calienta en un hilo tras el arranque.
+
+GET /api/ping (vida) contesta en cuanto el proceso sirve requests.
+GET /api/ready (disponibilidad) da 503 hasta que el calentamiento ha
+terminado y mientras la BD no responda a un SELECT 1; su resultado se
+guarda LISTO_CACHE_S segundos para que las sondas no despierten la BD a
+cada llamada. Con INGESTA_DIFERIDA también da 503 si el hilo escritor de
+la ingesta no está vivo.
+"""
+import logging
+import os
+import threading
+import time
+from sqlalchemy import text
+import database
+import catalogo
+import buscador
+import estadisticas
+import ingesta
+import progreso
+
+logger = logging.getLogger(__name__)
+
+# Referencia de importado_s y calentado_s: main.py la fija a su primera línea
+# con marcar_importado (aquí ya se han importado fastapi, SQLAlchemy y los modelos)
+INICIO = time.perf_counter()
+
+CREAR_ESQUEMA = os.getenv("CREAR_ESQUEMA", "1" if database.ES_SQLITE else "0") == "1"
+LISTO_CACHE_S = float(os.getenv("LISTO_CACHE_S", "5"))
+# Espera máxima entre reintentos si la BD no responde al calentar
+CALENTAR_REINTENTO_MAX_S = float(os.getenv("CALENTAR_REINTENTO_MAX_S", "30"))
+
+_lock = threading.Lock()
+_estado = {
+    "importado_s": None,
+    "calentado_s": None,
+    "pasos": {},
+    "intentos": 0,
+    "error": None,
+}
+_calentado = threading.Event()
+_parar = threading.Event()
+_hilo = None
+
+# (monotonic, ok, detalle) de la última comprobación de la BD
+_ultima_comprobacion = None
+
+
+# =========================================================
+# Arranque
+# =========================================================
+
+def marcar_importado(inicio: float = None):
+    # Al final de main.py (la app ya está montada), con el perf_counter de su primera línea
+    global INICIO
+    if inicio is not None:
+        INICIO = inicio
+    _estado["importado_s"] = round(time.perf_counter() - INICIO, 4)
+
+
+def preparar_esquema():
+    if CREAR_ESQUEMA:
+        from crear_esquema import crear
+        crear(database.get_engine())
+
+
+def _calentar_una_vez():
+    db = database.SessionLocal()
+    try:
+        pasos = [
+            ("progreso", progreso.recalcular_si_vacio),
+            ("catalogo", catalogo.obtener),
+            ("buscador", buscador.obtener),
+        ]
+        if estadisticas.CONTADORES_ACTIVOS:
+            # Por si hubo escrituras fuera de la API
+            pasos.insert(0, ("contadores", estadisticas.recalcular))
+
+        for nombre, paso in pasos:
+            inicio = time.perf_counter()
+            paso(db)
+            _estado["pasos"][nombre] = round(time.perf_counter() - inicio, 4)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _calentar():
+    espera = 1.0
+    while not _parar.is_set():
+        _estado["intentos"] += 1
+        try:
+            _calentar_una_vez()
+        except Exception as e:
+            # Típicamente la BD aún despertando: se reintenta con espera creciente
+            _estado["error"] = f"{type(e).__name__}: {e}"
+            logger.warning("Calentamiento fallido (intento %s): %s", _estado["intentos"], e)
+            _parar.wait(espera)
+            espera = min(espera * 2, CALENTAR_REINTENTO_MAX_S)
+            continue
+        _estado["error"] = None
+        _estado["calentado_s"] = round(time.perf_counter() - INICIO, 4)
+        _calentado.set()
+        return
+
+
+def calentar():
+    """
+    Lanza el calentamiento en segundo plano (una sola vez por proceso).
+    """
+    global _hilo
+    with _lock:
+        if _hilo is None:
+            _parar.clear()
+            _hilo = threading.Thread(target=_calentar, name="calentamiento", daemon=True)
+            _hilo.start()
+
+
+def parar():
+    _parar.set()
+
+
+# =========================================================
+# Disponibilidad
+# =========================================================
+
+def _comprobar_bd() -> tuple:
+    global _ultima_comprobacion
+    ultima = _ultima_comprobacion
+    if ultima is not None and time.monotonic() - ultima[0] < LISTO_CACHE_S:
+        return ultima[1], ultima[2]
+
+    try:
+        with database.get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+        ok, detalle = True, None
+    except Exception as e:
+        ok, detalle = False, f"{type(e).__name__}: {e}"
+    _ultima_comprobacion = (time.monotonic(), ok, detalle)
+    return ok, detalle
+
+
+def estado() -> tuple:
+    """
+    (listo, cuerpo) para /api/ready.
+    """
+    cuerpo = {
+        "calentado": _calentado.is_set(),
+        "importado_s": _estado["importado_s"],
+        "calentado_s": _estado["calentado_s"],
+        "pasos": dict(_estado["pasos"]),
+        "intentos": _estado["intentos"],
+    }
+    if not _calentado.is_set():
+        cuerpo["status"] = "calentando"
+        if _estado["error"]:
+            cuerpo["error"] = _estado["error"]
+        return False, cuerpo
+
+    ok, detalle = _comprobar_bd()
+    cuerpo["bd"] = ok
+    if not ok:
+        cuerpo["status"] = "sin_bd"
+        cuerpo["error"] = detalle
+        return False, cuerpo
+
+    if ingesta.INGESTA_DIFERIDA:
+        cuerpo["ingesta"] = ingesta.vivo()
+        if not cuerpo["ingesta"]:
+            cuerpo["status"] = "sin_ingesta"
+            return False, cuerpo
+
+    cuerpo["status"] = "ok"
+    return True, cuerpo
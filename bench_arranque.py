@@ -0,0 +1,151 @@
+# backend/bench_arranque.py
+"""
+Mide el arranque en frío: cada repetición es un proceso Python nuevo que
+importa main.py, ejecuta los hooks de startup y pide /api/ping y /api/ready
+(httpx + ASGI, sin servidor). Se reporta, desde el inicio del proceso hijo:
+
+- import:  importar main.py
+- startup: hooks de arranque terminados
+- ping:    primera respuesta de /api/ping (lo que espera el primer request)
+- ready:   /api/ready da 200 (calentamiento terminado)
+
+    python bench_arranque.py                         # SQLite temporal con datos sintéticos
+    python bench_arranque.py --latencia-ms 40        # simula una BD remota (40 ms por sentencia)
+    python bench_arranque.py --crear-esquema         # como antes: create_all en cada arranque
+    python bench_arranque.py --url postgresql://...  # contra una BD real (ya creada)
+
+--latencia-ms añade un sleep antes de cada sentencia SQL y de cada conexión
+nueva: con SQLite local el esquema se crea en microsegundos y no se ve lo
+que cuesta con Neon.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+INICIO = time.perf_counter()
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(DIRECTORIO)
+
+FASES = ["import", "startup", "ping", "ready"]
+
+
+# =========================================================
+# Proceso hijo: un arranque
+# =========================================================
+
+def _simular_latencia(segundos: float):
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    def esperar(*_):
+        time.sleep(segundos)
+
+    event.listen(Engine, "connect", esperar)
+    event.listen(Engine, "before_cursor_execute", esperar)
+
+
+async def _arrancar(limite_s: float) -> dict:
+    import httpx
+
+    tiempos = {}
+    import main
+    tiempos["import"] = time.perf_counter() - INICIO
+
+    await main.app.router.startup()
+    tiempos["startup"] = time.perf_counter() - INICIO
+    try:
+        transporte = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://arranque") as cliente:
+            r = await cliente.get("/api/ping")
+            r.raise_for_status()
+            tiempos["ping"] = time.perf_counter() - INICIO
+
+            while True:
+                r = await cliente.get("/api/ready")
+                if r.status_code == 200:
+                    tiempos["ready"] = time.perf_counter() - INICIO
+                    tiempos["pasos"] = r.json()["pasos"]
+                    break
+                if time.perf_counter() - INICIO > limite_s:
+                    raise RuntimeError(f"/api/ready sigue en {r.status_code}: {r.text}")
+                time.sleep(0.005)
+    finally:
+        await main.app.router.shutdown()
+    return tiempos
+
+
+def hijo(args):
+    import asyncio
+
+    if args.latencia_ms:
+        _simular_latencia(args.latencia_ms / 1000)
+    print(json.dumps(asyncio.run(_arrancar(args.limite))))
+
+
+# =========================================================
+# Proceso padre: repeticiones y resumen
+# =========================================================
+
+def _preparar_dataset(args) -> str:
+    ruta = os.path.join(tempfile.mkdtemp(), "arranque.db")
+    url = f"sqlite:///{ruta}"
+    print(f"Generando dataset en {ruta}...")
+    subprocess.run([
+        sys.executable, os.path.join(DIRECTORIO, "generar_datos.py"), "--url", url,
+        "--usuarios", "50", "--ejercicios", str(args.ejercicios), "--entregas", str(args.entregas),
+    ], check=True, stdout=subprocess.DEVNULL)
+    return url
+
+
+def padre(args):
+    url = args.url or _preparar_dataset(args)
+
+    entorno = dict(os.environ)
+    entorno["DATABASE_URL"] = url
+    entorno.setdefault("SECRET_KEY", "arranque")
+    entorno["CREAR_ESQUEMA"] = "1" if args.crear_esquema else "0"
+
+    comando = [sys.executable, os.path.abspath(__file__), "--hijo", "--limite", str(args.limite)]
+    if args.latencia_ms:
+        comando += ["--latencia-ms", str(args.latencia_ms)]
+
+    medidas = []
+    for i in range(args.repeticiones):
+        salida = subprocess.run(comando, env=entorno, cwd=DIRECTORIO, check=True,
+                                capture_output=True, text=True).stdout
+        medida = json.loads(salida.strip().splitlines()[-1])
+        medidas.append(medida)
+        print(f"  #{i + 1}: " + "   ".join(f"{f} {medida[f] * 1000:7.1f} ms" for f in FASES))
+
+    print(f"\nMediana de {args.repeticiones} arranques (CREAR_ESQUEMA={entorno['CREAR_ESQUEMA']}, "
+          f"latencia simulada {args.latencia_ms} ms):")
+    for fase in FASES:
+        valores = [m[fase] * 1000 for m in medidas]
+        print(f"  {fase:<8} {statistics.median(valores):8.1f} ms   (min {min(valores):.1f}, max {max(valores):.1f})")
+    pasos = medidas[-1].get("pasos", {})
+    if pasos:
+        print("  calentamiento: " + ", ".join(f"{k} {v * 1000:.1f} ms" for k, v in pasos.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="DATABASE_URL (por defecto un SQLite temporal)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--latencia-ms", type=float, default=0)
+    parser.add_argument("--crear-esquema", action="store_true", help="CREAR_ESQUEMA=1 en cada arranque")
+    parser.add_argument("--ejercicios", type=int, default=1000)
+    parser.add_argument("--entregas", type=int, default=20000)
+    parser.add_argument("--limite", type=float, default=120, help="segundos máximos hasta /api/ready")
+    parser.add_argument("--hijo", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.hijo:
+        hijo(args)
+    else:
+        padre(args)
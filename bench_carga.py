@@ -0,0 +1,254 @@
+# backend/bench_carga.py
+"""
+Prueba de carga en proceso: genera un dataset sintético en un SQLite temporal
+(generar_datos.py), levanta la app de main.py sin servidor (httpx + ASGI) y
+mide latencia p50/p95/p99 y throughput de los endpoints principales.
+
+    python bench_carga.py                                  # resultados por pantalla
+    python bench_carga.py --salida base.json               # guardar para comparar
+    python bench_carga.py --comparar base.json             # falla (exit 1) si hay regresión
+
+El JSON de salida tiene claves ordenadas y valores redondeados para que se
+pueda versionar y comparar con diff entre commits. Con --comparar una
+regresión es un p95 que empeora más de --tolerancia o un throughput que cae
+más de --tolerancia. Entre dos ejecuciones iguales en la misma máquina hay
+un 10-25% de ruido con 300 peticiones: compara siempre en la misma máquina y
+sube --peticiones si hace falta afinar más.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import secrets
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Contraseña de los usuarios sintéticos; solo vive en el SQLite temporal
+PASSWORD = secrets.token_urlsafe(12)
+
+ESCENARIOS = ["login", "catalogo", "entrega_crear", "entregas_listar", "admin_estadisticas"]
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--usuarios", type=int, default=500)
+parser.add_argument("--categorias", type=int, default=12)
+parser.add_argument("--ejercicios", type=int, default=1000)
+parser.add_argument("--entregas", type=int, default=50000)
+parser.add_argument("--semilla", type=int, default=1)
+parser.add_argument("--peticiones", type=int, default=300, help="peticiones medidas por escenario")
+parser.add_argument("--calentamiento", type=int, default=20, help="peticiones previas sin medir")
+parser.add_argument("--concurrencia", type=int, default=8)
+parser.add_argument("--escenarios", default=",".join(ESCENARIOS))
+parser.add_argument("--salida", default=None, help="guardar resultados en este JSON")
+parser.add_argument("--comparar", default=None, help="JSON de una ejecución anterior")
+parser.add_argument("--tolerancia", type=float, default=0.3)
+args = parser.parse_args()
+
+ruta_db = os.path.join(tempfile.mkdtemp(), "carga.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{ruta_db}"
+# La carga se mide con la configuración del entorno; estas solo si no vienen dadas
+os.environ.setdefault("SECRET_KEY", "carga")
+os.environ.setdefault("ESTADISTICAS_CONTADORES", "1")
+# Todas las peticiones vienen de la misma IP: con el límite activo el login daría 429
+os.environ.setdefault("LIMITES_ACTIVOS", "0")
+
+import logging
+import httpx
+import database
+import models
+import generar_datos
+
+
+# =========================================================
+# Escenarios
+# =========================================================
+
+class Contexto:
+    def __init__(self, cliente, tokens: list, token_admin: str, ids_ejercicios: list):
+        self.cliente = cliente
+        self.tokens = tokens
+        self.token_admin = token_admin
+        self.ids_ejercicios = ids_ejercicios
+        self.rnd = random.Random(args.semilla)
+
+    def cabeceras(self) -> dict:
+        return {"Authorization": f"Bearer {self.rnd.choice(self.tokens)}"}
+
+
+async def login(ctx):
+    return await ctx.cliente.post("/api/login", json={
+        "nombre": f"alumno{ctx.rnd.randrange(args.usuarios)}",
+        "password": PASSWORD,
+    })
+
+
+async def catalogo(ctx):
+    return await ctx.cliente.get("/api/ejercicios", headers=ctx.cabeceras())
+
+
+async def entrega_crear(ctx):
+    return await ctx.cliente.post("/api/entregas", headers=ctx.cabeceras(), json={
+        "usuario_id": 0,
+        "ejercicio_id": ctx.rnd.choice(ctx.ids_ejercicios),
+        "codigo": generar_datos.codigo(ctx.rnd),
+    })
+
+
+async def entregas_listar(ctx):
+    return await ctx.cliente.get("/api/entregas", headers=ctx.cabeceras(), params={"limit": 100})
+
+
+async def admin_estadisticas(ctx):
+    return await ctx.cliente.get(
+        "/api/admin/estadisticas", headers={"Authorization": f"Bearer {ctx.token_admin}"}
+    )
+
+
+# =========================================================
+# Medición
+# =========================================================
+
+def percentil(ordenados: list, p: float) -> float:
+    # nearest-rank
+    if not ordenados:
+        return 0.0
+    k = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[k]
+
+
+async def ejecutar(ctx, escenario, total: int) -> dict:
+    pendientes = iter(range(total))
+    latencias = []
+    errores = 0
+
+    async def trabajador():
+        nonlocal errores
+        for _ in pendientes:
+            t0 = time.perf_counter()
+            r = await escenario(ctx)
+            latencias.append(time.perf_counter() - t0)
+            if r.status_code >= 400:
+                errores += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*[trabajador() for _ in range(args.concurrencia)])
+    duracion = time.perf_counter() - inicio
+
+    latencias.sort()
+    return {
+        "peticiones": total,
+        "errores": errores,
+        "p50_ms": round(percentil(latencias, 50) * 1000, 2),
+        "p95_ms": round(percentil(latencias, 95) * 1000, 2),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 2),
+        "media_ms": round(sum(latencias) / len(latencias) * 1000, 2) if latencias else 0.0,
+        "rps": round(total / duracion, 1) if duracion else 0.0,
+    }
+
+
+async def principal(escenarios: list) -> dict:
+    import main
+
+    await main.app.router.startup()
+    try:
+        transporte = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://carga", timeout=60) as cliente:
+            # Que el calentamiento en segundo plano (arranque.py) no caiga dentro de las medidas
+            while (await cliente.get("/api/ready")).status_code != 200:
+                await asyncio.sleep(0.05)
+
+            async def token(nombre):
+                r = await cliente.post("/api/login", json={"nombre": nombre, "password": PASSWORD})
+                r.raise_for_status()
+                return r.json()["access_token"]
+
+            tokens = [await token(f"alumno{i}") for i in range(min(20, args.usuarios))]
+            token_admin = await token(generar_datos.ADMIN)
+
+            db = database.SessionLocal()
+            ids_ejercicios = [i for (i,) in db.query(models.Ejercicio.id)]
+            db.close()
+
+            ctx = Contexto(cliente, tokens, token_admin, ids_ejercicios)
+            resultados = {}
+            for nombre in escenarios:
+                escenario = globals()[nombre]
+                await ejecutar(ctx, escenario, args.calentamiento)
+                resultados[nombre] = await ejecutar(ctx, escenario, args.peticiones)
+                r = resultados[nombre]
+                print(
+                    f"{nombre:<20} p50 {r['p50_ms']:8.2f} ms   p95 {r['p95_ms']:8.2f} ms   "
+                    f"p99 {r['p99_ms']:8.2f} ms   {r['rps']:8.1f} req/s   errores {r['errores']}"
+                )
+            return resultados
+    finally:
+        await main.app.router.shutdown()
+
+
+def comparar(base: dict, actual: dict, tolerancia: float) -> list:
+    regresiones = []
+    print(f"\n{'escenario':<20} {'p95 base':>10} {'p95 ahora':>10} {'rps base':>10} {'rps ahora':>10}")
+    for nombre, r in actual["escenarios"].items():
+        b = base.get("escenarios", {}).get(nombre)
+        if b is None:
+            continue
+        marca = ""
+        if r["p95_ms"] > b["p95_ms"] * (1 + tolerancia):
+            marca += "  <- p95 peor"
+            regresiones.append(f"{nombre}: p95 {b['p95_ms']} -> {r['p95_ms']} ms")
+        if r["rps"] < b["rps"] * (1 - tolerancia):
+            marca += "  <- rps peor"
+            regresiones.append(f"{nombre}: rps {b['rps']} -> {r['rps']}")
+        print(f"{nombre:<20} {b['p95_ms']:>10} {r['p95_ms']:>10} {b['rps']:>10} {r['rps']:>10}{marca}")
+    return regresiones
+
+
+if __name__ == "__main__":
+    escenarios = [e.strip() for e in args.escenarios.split(",") if e.strip()]
+    desconocidos = set(escenarios) - set(ESCENARIOS)
+    if desconocidos:
+        parser.error(f"escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+    # Con concurrencia casi todo supera METRICAS_LENTO_MS: sin el aviso por request
+    logging.getLogger("metricas").setLevel(logging.ERROR)
+
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    print(f"Generando dataset en {ruta_db}...")
+    t0 = time.perf_counter()
+    dataset = generar_datos.generar(
+        db, args.usuarios, args.categorias, args.ejercicios, args.entregas, PASSWORD, args.semilla
+    )
+    db.close()
+    print(f"  {dataset} en {time.perf_counter() - t0:.1f} s\n")
+
+    resultados = {
+        "entorno": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "concurrencia": args.concurrencia,
+            "peticiones": args.peticiones,
+            "dataset": dataset,
+        },
+        "escenarios": asyncio.run(principal(escenarios)),
+    }
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2, sort_keys=True, ensure_ascii=False)
+            f.write("\n")
+        print(f"\nResultados guardados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        regresiones = comparar(base, resultados, args.tolerancia)
+        if regresiones:
+            print("\nRegresiones:\n  " + "\n  ".join(regresiones))
+            sys.exit(1)
+        print("\nSin regresiones")
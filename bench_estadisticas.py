@@ -0,0 +1,138 @@
+# backend/bench_estadisticas.py
+"""
+Compara el cálculo antiguo de /api/admin/estadisticas (6 COUNT + últimas 5
+con lazy loads) con la query agregada y con los contadores materializados.
+
+Uso:
+    python bench_estadisticas.py --entregas 200000
+    python bench_estadisticas.py --url postgresql://...   # BD de pruebas, se llena de datos
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--url", default=None, help="DATABASE_URL (por defecto un SQLite temporal)")
+parser.add_argument("--usuarios", type=int, default=500)
+parser.add_argument("--ejercicios", type=int, default=1000)
+parser.add_argument("--entregas", type=int, default=200000)
+parser.add_argument("--repeticiones", type=int, default=20)
+args = parser.parse_args()
+
+if args.url:
+    os.environ["DATABASE_URL"] = args.url
+else:
+    ruta = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{ruta}"
+
+from sqlalchemy import event, insert
+import database
+import models
+import estadisticas
+from consultas import consulta_entregas
+
+
+def poblar(db):
+    db.add(models.Categoria(nombre="Bench"))
+    db.flush()
+    categoria_id = db.query(models.Categoria.id).scalar()
+
+    db.execute(insert(models.Usuario), [
+        {"email": f"u{i}@bench", "nombre": f"bench{i}", "hashed_password": "x",
+         "rol": "admin" if i % 50 == 0 else "alumno"}
+        for i in range(args.usuarios)
+    ])
+    db.execute(insert(models.Ejercicio), [
+        {"titulo": f"Ejercicio {i}", "enunciado": "...", "solucion": "...",
+         "dificultad": "fácil", "lenguaje": "Python", "categoria_id": categoria_id}
+        for i in range(args.ejercicios)
+    ])
+
+    inicio = datetime(2025, 9, 1)
+    lote = 10000
+    for desde in range(0, args.entregas, lote):
+        db.execute(insert(models.Entrega), [
+            {"usuario_id": 1 + i % args.usuarios, "ejercicio_id": 1 + i % args.ejercicios,
+             "codigo": "print('hola')", "fecha_envio": inicio + timedelta(seconds=i)}
+            for i in range(desde, min(desde + lote, args.entregas))
+        ])
+    db.commit()
+
+
+def ruta_antigua(db):
+    totales = {
+        "usuarios": db.query(models.Usuario).count(),
+        "admins": db.query(models.Usuario).filter(models.Usuario.rol == "admin").count(),
+        "alumnos": db.query(models.Usuario).filter(models.Usuario.rol == "alumno").count(),
+        "categorias": db.query(models.Categoria).count(),
+        "ejercicios": db.query(models.Ejercicio).count(),
+        "entregas": db.query(models.Entrega).count(),
+    }
+    entregas = db.query(models.Entrega)\
+        .order_by(models.Entrega.fecha_envio.desc())\
+        .limit(5)\
+        .all()
+    ultimas = [(e.usuario.nombre, e.ejercicio.titulo) for e in entregas]
+    return totales, ultimas
+
+
+def ruta_nueva(db):
+    totales = estadisticas.leer_totales(db)
+    ultimas = consulta_entregas(db)\
+        .order_by(models.Entrega.fecha_envio.desc())\
+        .limit(5)\
+        .all()
+    return totales, [(e.usuario, e.ejercicio) for e in ultimas]
+
+
+def medir(nombre, funcion):
+    sentencias = [0]
+
+    def contar(*_):
+        sentencias[0] += 1
+
+    event.listen(database.engine, "before_cursor_execute", contar)
+    tiempos = []
+    resultado = None
+    for _ in range(args.repeticiones):
+        # sesión nueva en cada vuelta: sin identity map caliente, como en un request real
+        db = database.SessionLocal()
+        t0 = time.perf_counter()
+        resultado = funcion(db)
+        tiempos.append(time.perf_counter() - t0)
+        db.close()
+    event.remove(database.engine, "before_cursor_execute", contar)
+
+    tiempos.sort()
+    print(
+        f"{nombre:<24} mediana {tiempos[len(tiempos) // 2] * 1000:8.2f} ms   "
+        f"min {tiempos[0] * 1000:8.2f} ms   "
+        f"sentencias/request {sentencias[0] / args.repeticiones:.0f}"
+    )
+    return resultado
+
+
+if __name__ == "__main__":
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    print(f"Poblando {args.usuarios} usuarios, {args.ejercicios} ejercicios, {args.entregas} entregas...")
+    poblar(db)
+    db.close()
+
+    antiguo = medir("antiguo (6 COUNT + lazy)", ruta_antigua)
+
+    estadisticas.CONTADORES_ACTIVOS = False
+    agregado = medir("query agregada", ruta_nueva)
+
+    estadisticas.CONTADORES_ACTIVOS = True
+    db = database.SessionLocal()
+    estadisticas.recalcular(db)
+    db.close()
+    contadores = medir("contadores", ruta_nueva)
+
+    assert antiguo[0] == agregado[0] == contadores[0], "Los totales no coinciden"
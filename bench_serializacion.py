@@ -0,0 +1,122 @@
+# backend/bench_serializacion.py
+"""
+Compara cómo se serializa un listado grande de ejercicios:
+- antiguo: objetos ORM + jsonable_encoder + json.dumps (lo que hacía FastAPI sin response_model)
+- response_model: objetos ORM validados con pydantic + RespuestaJSON
+- filas: tuplas de columnas -> dicts -> RespuestaJSON (lo que hacen ahora los listados)
+
+Uso:
+    python bench_serializacion.py --ejercicios 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--url", default=None, help="DATABASE_URL (por defecto un SQLite temporal)")
+parser.add_argument("--ejercicios", type=int, default=10000)
+parser.add_argument("--repeticiones", type=int, default=10)
+args = parser.parse_args()
+
+if args.url:
+    os.environ["DATABASE_URL"] = args.url
+else:
+    ruta = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{ruta}"
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+import database
+import models
+import respuestas
+from schemas import EjercicioDetalle
+
+COLUMNAS = [
+    models.Ejercicio.id,
+    models.Ejercicio.titulo,
+    models.Ejercicio.enunciado,
+    models.Ejercicio.solucion,
+    models.Ejercicio.dificultad,
+    models.Ejercicio.lenguaje,
+    models.Ejercicio.categoria_id,
+    models.Ejercicio.subcategoria,
+]
+
+adaptador = TypeAdapter(List[EjercicioDetalle])
+
+
+def poblar(db):
+    db.add(models.Categoria(nombre="Bench"))
+    db.flush()
+    categoria_id = db.query(models.Categoria.id).scalar()
+    db.execute(insert(models.Ejercicio), [
+        {"titulo": f"Ejercicio {i}", "enunciado": "Escriu un programa que " * 20,
+         "solucion": "for i in range(10):\n    print(i)\n" * 5,
+         "dificultad": "fácil", "lenguaje": "Python", "categoria_id": categoria_id,
+         "subcategoria": "for"}
+        for i in range(args.ejercicios)
+    ])
+    db.commit()
+
+
+def ruta_antigua(db):
+    ejercicios = db.query(models.Ejercicio).all()
+    t0 = time.perf_counter()
+    cuerpo = JSONResponse(content=jsonable_encoder(ejercicios)).body
+    return cuerpo, time.perf_counter() - t0
+
+
+def ruta_response_model(db):
+    ejercicios = db.query(models.Ejercicio).all()
+    t0 = time.perf_counter()
+    datos = adaptador.dump_python(adaptador.validate_python(ejercicios, from_attributes=True), mode="json")
+    cuerpo = respuestas.RespuestaJSON(content=datos).body
+    return cuerpo, time.perf_counter() - t0
+
+
+def ruta_filas(db):
+    filas = db.query(*COLUMNAS).all()
+    t0 = time.perf_counter()
+    cuerpo = respuestas.respuesta_lista([f._asdict() for f in filas]).body
+    return cuerpo, time.perf_counter() - t0
+
+
+def medir(nombre, funcion):
+    totales, serializacion = [], []
+    cuerpo = b""
+    for _ in range(args.repeticiones):
+        db = database.SessionLocal()
+        t0 = time.perf_counter()
+        cuerpo, t_serializar = funcion(db)
+        totales.append(time.perf_counter() - t0)
+        serializacion.append(t_serializar)
+        db.close()
+
+    totales.sort()
+    serializacion.sort()
+    print(
+        f"{nombre:<16} serializar {serializacion[len(serializacion) // 2] * 1000:8.2f} ms   "
+        f"query+serializar {totales[len(totales) // 2] * 1000:8.2f} ms   "
+        f"{len(cuerpo) / 1024:8.0f} KB"
+    )
+    return cuerpo
+
+
+if __name__ == "__main__":
+    models.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    print(f"Poblando {args.ejercicios} ejercicios...")
+    poblar(db)
+    db.close()
+
+    print("orjson:", "sí" if respuestas.orjson is not None else "no (json de la stdlib)")
+    medir("antiguo", ruta_antigua)
+    medir("response_model", ruta_response_model)
+    medir("filas", ruta_filas)
@@ -0,0 +1,436 @@
+# backend/buscador.py
+"""
+Índice invertido en memoria para /api/ejercicios/buscar.
+
+- Normaliza sin tildes ni mayúsculas (y la ela geminada "l·l" del catalán),
+  así "leccio" encuentra "lecció" y "funcion" encuentra "Funció".
+- Deben aparecer todos los términos; ranking BM25 y el título pesa más que el enunciado.
+  Las normas por longitud usan la longitud media de todo el índice y se
+  recalculan en bloque cuando la media se desvía más de BUSCADOR_DERIVA_MEDIA,
+  así la puntuación no depende del orden en que se indexaron los ejercicios.
+- Con muchos resultados solo se puntúan los "campeones" de cada término (sus
+  CAMPEONES ejercicios de mayor impacto): el total y las facetas siguen siendo
+  exactos, el orden es aproximado en la cola de términos muy comunes.
+- El último término se busca también como prefijo (búsqueda mientras se escribe).
+- Facetas por categoría y dificultad sobre los resultados.
+
+Se construye desde la BD en la primera búsqueda y admin_ejercicios lo actualiza
+ejercicio a ejercicio. Como los otros workers no ven esas llamadas, pasado
+BUSCADOR_TTL se reconstruye en segundo plano mientras se sigue sirviendo el actual;
+los cambios que llegan durante la reconstrucción se reaplican al índice nuevo.
+"""
+import heapq
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from operator import itemgetter
+from sqlalchemy.orm import Session
+import models
+from database import SessionLocal
+
+BUSCADOR_TTL = float(os.getenv("BUSCADOR_TTL", "300"))
+# Desviación relativa de la longitud media que obliga a recalcular las normas
+BUSCADOR_DERIVA_MEDIA = float(os.getenv("BUSCADOR_DERIVA_MEDIA", "0.05"))
+
+PESO_TITULO = 3
+K1 = 1.2
+B = 0.75
+
+# El prefijo del último término se expande a como mucho estas palabras
+MIN_PREFIJO = 3
+MAX_VARIANTES_PREFIJO = 50
+
+# Con menos candidatos se puntúan todos; con más, solo los campeones de cada término
+MAX_CANDIDATOS_DIRECTO = 2000
+CAMPEONES = int(os.getenv("BUSCADOR_CAMPEONES", "500"))
+# Expansiones de prefijo y búsquedas recientes (búsqueda mientras se escribe);
+# se vacían con cualquier cambio en el índice
+MAX_PREFIJOS_CACHE = 1000
+MAX_RESULTADOS_CACHE = 1000
+# A partir de aquí las facetas se cuentan intersecando conjuntos
+MAX_RESULTADOS_CONTEO = 5000
+
+CAMPOS = ["titulo", "dificultad", "lenguaje", "categoria_id", "subcategoria"]
+
+_TOKEN = re.compile(r"\w+")
+
+
+def normalizar(texto: str) -> str:
+    texto = texto.lower().replace("·", "")
+    texto = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+def tokenizar(texto: str) -> list:
+    if not texto:
+        return []
+    return _TOKEN.findall(normalizar(texto))
+
+
+class IndiceEjercicios:
+    def __init__(self):
+        self._lock = threading.RLock()
+        # token -> {ejercicio_id: impacto BM25 ya calculado (tf + normalización por longitud)}
+        self.postings = defaultdict(dict)
+        self.tokens_de = {}                    # ejercicio_id -> {token: tf} (para quitarlo y recalcular)
+        self.longitud_de = {}
+        self.meta = {}                         # ejercicio_id -> campos devueltos en resultados
+        self.categoria_de = {}
+        self.dificultad_de = {}
+        # conjuntos por faceta: los filtros son intersecciones de sets (en C)
+        self.ids_por_categoria = defaultdict(set)
+        self.ids_por_dificultad = defaultdict(set)
+        # dificultad normalizada -> cuántas veces aparece cada grafía original
+        self.etiquetas_dificultad = defaultdict(Counter)
+        self.longitud_total = 0
+        self.media_normas = None               # longitud media con la que están calculados los impactos
+        self._vocabulario = None               # lista ordenada para prefijos, se rehace si cambia
+        self._campeones = {}                   # token -> ids de mayor impacto, bajo demanda
+        self._prefijos = {}                    # prefijo -> (lista fusionada, campeones)
+        self._resultados = {}                  # (términos, filtros, limit) -> respuesta
+
+    def _media(self) -> float:
+        return self.longitud_total / len(self.meta) if self.meta else 1.0
+
+    def indexar(self, ejercicio_id: int, datos: dict):
+        with self._lock:
+            self._anadir(ejercicio_id, datos)
+            deriva = abs(self._media() - self.media_normas) if self.media_normas else None
+            if deriva is None or deriva > BUSCADOR_DERIVA_MEDIA * self.media_normas:
+                self.recalcular_normas()
+            else:
+                self._impactos(ejercicio_id)
+                for t in self.tokens_de[ejercicio_id]:
+                    self._campeones.pop(t, None)
+                self._cambiado()
+
+    def cargar(self, filas):
+        """
+        Carga inicial de (ejercicio_id, datos): las normas se calculan una vez al final.
+        """
+        with self._lock:
+            for ejercicio_id, datos in filas:
+                self._anadir(ejercicio_id, datos)
+            self.recalcular_normas()
+
+    def recalcular_normas(self):
+        with self._lock:
+            self.media_normas = self._media() or 1.0
+            self._campeones.clear()
+            self._cambiado()
+            for ejercicio_id in self.tokens_de:
+                self._impactos(ejercicio_id)
+
+    def _impactos(self, ejercicio_id: int):
+        norma = K1 * (1 - B + B * self.longitud_de[ejercicio_id] / self.media_normas)
+        for t, tf in self.tokens_de[ejercicio_id].items():
+            if t not in self.postings:
+                self._vocabulario = None
+            self.postings[t][ejercicio_id] = tf * (K1 + 1) / (tf + norma)
+
+    def _anadir(self, ejercicio_id: int, datos: dict):
+        tokens = Counter()
+        for t in tokenizar(datos.get("titulo")):
+            tokens[t] += PESO_TITULO
+        for t in tokenizar(datos.get("enunciado")):
+            tokens[t] += 1
+
+        meta = {c: datos.get(c) for c in CAMPOS}
+        dificultad = normalizar(meta["dificultad"] or "")
+
+        # las postings las pone _impactos, con la media ya actualizada
+        self._quitar(ejercicio_id)
+        longitud = sum(tokens.values())
+        self.longitud_total += longitud
+        self.tokens_de[ejercicio_id] = dict(tokens)
+        self.longitud_de[ejercicio_id] = longitud
+        self.meta[ejercicio_id] = meta
+        self.categoria_de[ejercicio_id] = meta["categoria_id"]
+        self.dificultad_de[ejercicio_id] = dificultad
+        self.ids_por_categoria[meta["categoria_id"]].add(ejercicio_id)
+        self.ids_por_dificultad[dificultad].add(ejercicio_id)
+        self.etiquetas_dificultad[dificultad][meta["dificultad"]] += 1
+
+    def eliminar(self, ejercicio_id: int):
+        with self._lock:
+            self._quitar(ejercicio_id)
+
+    def _quitar(self, ejercicio_id: int):
+        tokens = self.tokens_de.pop(ejercicio_id, None)
+        if tokens is None:
+            return
+        self.longitud_total -= self.longitud_de.pop(ejercicio_id)
+        etiqueta = self.meta.pop(ejercicio_id)["dificultad"]
+        dificultad = self.dificultad_de.pop(ejercicio_id)
+        self.ids_por_categoria[self.categoria_de.pop(ejercicio_id)].discard(ejercicio_id)
+        self.ids_por_dificultad[dificultad].discard(ejercicio_id)
+        etiquetas = self.etiquetas_dificultad[dificultad]
+        etiquetas[etiqueta] -= 1
+        if etiquetas[etiqueta] <= 0:
+            del etiquetas[etiqueta]
+        if not etiquetas:
+            del self.etiquetas_dificultad[dificultad]
+        self._cambiado()
+        for t in tokens:
+            self._campeones.pop(t, None)
+            lista = self.postings.get(t)
+            if lista is not None:
+                lista.pop(ejercicio_id, None)
+                if not lista:
+                    del self.postings[t]
+                    self._vocabulario = None
+
+    def _cambiado(self):
+        self._prefijos.clear()
+        self._resultados.clear()
+
+    def _campeones_de(self, token: str) -> frozenset:
+        campeones = self._campeones.get(token)
+        if campeones is None:
+            lista = self.postings[token]
+            if len(lista) <= CAMPEONES:
+                campeones = frozenset(lista)
+            else:
+                campeones = frozenset(i for i, _ in heapq.nlargest(CAMPEONES, lista.items(), key=itemgetter(1)))
+            self._campeones[token] = campeones
+        return campeones
+
+    def _lista_prefijo(self, prefijo: str) -> tuple:
+        """
+        (lista fusionada de las variantes del prefijo, sus campeones).
+        """
+        cacheado = self._prefijos.get(prefijo)
+        if cacheado is not None:
+            return cacheado
+
+        if self._vocabulario is None:
+            self._vocabulario = sorted(self.postings)
+        vocab = self._vocabulario
+        i = bisect_left(vocab, prefijo)
+        variantes = []
+        while i < len(vocab) and vocab[i].startswith(prefijo) and len(variantes) < MAX_VARIANTES_PREFIJO:
+            variantes.append(vocab[i])
+            i += 1
+
+        if len(variantes) == 1:
+            fusion = self.postings[variantes[0]]
+        else:
+            fusion = {}
+            for variante in variantes:
+                for ejercicio_id, impacto in self.postings[variante].items():
+                    if impacto > fusion.get(ejercicio_id, 0):
+                        fusion[ejercicio_id] = impacto
+        campeones = frozenset().union(*(self._campeones_de(v) for v in variantes))
+        if len(campeones) > CAMPEONES:
+            campeones = frozenset(heapq.nlargest(CAMPEONES, campeones, key=fusion.__getitem__))
+
+        if len(self._prefijos) >= MAX_PREFIJOS_CACHE:
+            self._prefijos.clear()
+        self._prefijos[prefijo] = (fusion, campeones)
+        return fusion, campeones
+
+    def buscar(self, q: str, categoria_id: int = None, dificultad: str = None, limit: int = 20) -> dict:
+        """
+        Todos los términos deben aparecer (AND); el último vale también como prefijo.
+        """
+        terminos = tuple(dict.fromkeys(tokenizar(q)))
+        clave_cache = (terminos, categoria_id, normalizar(dificultad) if dificultad else None, limit)
+        with self._lock:
+            respuesta = self._resultados.get(clave_cache)
+            if respuesta is None:
+                respuesta = self._buscar(terminos, categoria_id, dificultad, limit)
+                if len(self._resultados) >= MAX_RESULTADOS_CACHE:
+                    self._resultados.clear()
+                self._resultados[clave_cache] = respuesta
+            return respuesta
+
+    def _buscar(self, terminos: tuple, categoria_id: int, dificultad: str, limit: int) -> dict:
+        vacio = {"total": 0, "resultados": [], "facetas": {"categoria_id": {}, "dificultad": {}}}
+
+        n = len(self.meta)
+        if not terminos or n == 0:
+            return vacio
+
+        listas = []
+        campeones = []
+        for posicion, termino in enumerate(terminos):
+            if posicion == len(terminos) - 1 and len(termino) >= MIN_PREFIJO:
+                lista, campeones_termino = self._lista_prefijo(termino)
+            else:
+                lista = self.postings.get(termino)
+                campeones_termino = self._campeones_de(termino) if lista else None
+            if not lista:
+                return vacio
+            listas.append(lista)
+            campeones.append(campeones_termino)
+
+        # Intersección empezando por la lista más corta
+        por_tamano = sorted(listas, key=len)
+        ids = por_tamano[0].keys()
+        for lista in por_tamano[1:]:
+            ids = ids & lista.keys()
+        if len(ids) > MAX_RESULTADOS_CONTEO:
+            ids = set(ids)
+
+        facetas = {
+            "categoria_id": dict(Counter(map(self.categoria_de.__getitem__, ids)))
+                if len(ids) <= MAX_RESULTADOS_CONTEO else self._facetas_categoria(ids),
+            "dificultad": {
+                self._etiqueta_dificultad(d): n for d, n in Counter(map(self.dificultad_de.__getitem__, ids)).items()
+            } if len(ids) <= MAX_RESULTADOS_CONTEO else self._facetas_dificultad(ids),
+        }
+
+        if categoria_id:
+            ids = self.ids_por_categoria.get(categoria_id, set()) & ids
+        if dificultad:
+            ids = self.ids_por_dificultad.get(normalizar(dificultad), set()) & ids
+
+        if len(listas) == 1:
+            clave = listas[0].__getitem__
+        else:
+            idfs = [math.log(1 + (n - len(l) + 0.5) / (len(l) + 0.5)) for l in listas]
+            pares = list(zip(idfs, listas))
+            clave = lambda i: sum(idf * l[i] for idf, l in pares)
+
+        candidatos = ids
+        if len(ids) > MAX_CANDIDATOS_DIRECTO:
+            # Un buen resultado tiene un impacto alto en alguno de sus términos
+            candidatos = frozenset().union(*campeones) & ids
+            if len(candidatos) < limit:
+                candidatos = ids
+        mejores = heapq.nlargest(limit, candidatos, key=clave)
+
+        return {
+            "total": len(ids),
+            "resultados": [
+                {"id": i, **self.meta[i], "puntuacion": round(clave(i), 4)}
+                for i in mejores
+            ],
+            "facetas": facetas,
+        }
+
+    def _facetas_categoria(self, ids) -> dict:
+        facetas = {}
+        for categoria, ids_categoria in self.ids_por_categoria.items():
+            comunes = len(ids_categoria & ids)
+            if comunes:
+                facetas[categoria] = comunes
+        return facetas
+
+    def _facetas_dificultad(self, ids) -> dict:
+        # Con muchos resultados es más barato intersecar con cada conjunto de dificultad
+        facetas = {}
+        for dificultad, ids_dificultad in self.ids_por_dificultad.items():
+            comunes = len(ids_dificultad & ids)
+            if comunes:
+                facetas[self._etiqueta_dificultad(dificultad)] = comunes
+        return facetas
+
+    def _etiqueta_dificultad(self, dificultad: str):
+        # La grafía más usada en todo el índice (a igualdad, la primera en orden):
+        # no depende de qué ejercicios haya en el resultado ni del camino de conteo
+        etiquetas = self.etiquetas_dificultad[dificultad]
+        return min(etiquetas.items(), key=lambda e: (-e[1], str(e[0])))[0]
+
+
+# =========================================================
+# Índice global del proceso
+# =========================================================
+
+_indice = None
+_construido_en = 0.0
+_lock = threading.Lock()
+_reconstruyendo = False
+# Cambios de admin_ejercicios durante una reconstrucción, para reaplicarlos al índice nuevo
+_cambios = None
+
+
+def _construir(db: Session) -> IndiceEjercicios:
+    indice = IndiceEjercicios()
+    indice.cargar(
+        (e.id, e._asdict())
+        for e in db.query(
+            models.Ejercicio.id,
+            models.Ejercicio.titulo,
+            models.Ejercicio.enunciado,
+            models.Ejercicio.dificultad,
+            models.Ejercicio.lenguaje,
+            models.Ejercicio.categoria_id,
+            models.Ejercicio.subcategoria,
+        ).yield_per(1000)
+    )
+    return indice
+
+
+def _reconstruir_en_segundo_plano():
+    global _indice, _construido_en, _reconstruyendo, _cambios
+    db = SessionLocal()
+    try:
+        nuevo = _construir(db)
+        with _lock:
+            # Lo que se indexó o borró mientras tanto puede no estar en lo leído de la BD
+            for ejercicio_id, datos in _cambios:
+                if datos is None:
+                    nuevo.eliminar(ejercicio_id)
+                else:
+                    nuevo.indexar(ejercicio_id, datos)
+            _indice, _construido_en = nuevo, time.monotonic()
+    finally:
+        with _lock:
+            _reconstruyendo = False
+            _cambios = None
+        db.close()
+
+
+def obtener(db: Session) -> IndiceEjercicios:
+    global _indice, _construido_en, _reconstruyendo, _cambios
+    if _indice is None:
+        with _lock:
+            if _indice is None:
+                _indice, _construido_en = _construir(db), time.monotonic()
+    elif time.monotonic() - _construido_en > BUSCADOR_TTL and not _reconstruyendo:
+        with _lock:
+            if not _reconstruyendo:
+                _reconstruyendo = True
+                _cambios = []
+                threading.Thread(target=_reconstruir_en_segundo_plano, daemon=True).start()
+    return _indice
+
+
+def datos_de(e) -> dict:
+    return {
+        "titulo": e.titulo,
+        "enunciado": e.enunciado,
+        "dificultad": e.dificultad,
+        "lenguaje": e.lenguaje,
+        "categoria_id": e.categoria_id,
+        "subcategoria": e.subcategoria,
+    }
+
+
+def _aplicar(ejercicio_id: int, datos):
+    with _lock:
+        if _indice is None:
+            return
+        if datos is None:
+            _indice.eliminar(ejercicio_id)
+        else:
+            _indice.indexar(ejercicio_id, datos)
+        if _cambios is not None:
+            _cambios.append((ejercicio_id, datos))
+
+
+def indexar(ejercicio_id: int, datos: dict):
+    """
+    Llamar tras crear/editar un ejercicio. No hace nada si aún no hay índice.
+    """
+    _aplicar(ejercicio_id, datos)
+
+
+def eliminar(ejercicio_id: int):
+    _aplicar(ejercicio_id, None)
@@ -0,0 +1,61 @@
+# backend/cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheTTL:
+    """
+    Caché en memoria acotada (LRU) con caducidad por entrada (TTL).
+    Es segura entre hilos, porque los endpoints sync corren en el threadpool.
+    Cada worker de uvicorn tiene la suya: las invalidaciones solo afectan
+    al proceso actual y el TTL limita cuánto puede durar un dato obsoleto
+    en los demás.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, clave):
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[1] <= ahora:
+                if entrada is not None:
+                    del self._datos[clave]
+                self.misses += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.hits += 1
+            return entrada[0]
+
+    def set(self, clave, valor, ttl: float = None):
+        caduca = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+        with self._lock:
+            self._datos[clave] = (valor, caduca)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maxsize:
+                self._datos.popitem(last=False)
+
+    def delete(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entradas": len(self._datos),
+                "max": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
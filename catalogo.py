@@ -0,0 +1,203 @@
+# backend/catalogo.py
+import hashlib
+import json
+import os
+import threading
+import time
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+import models
+import compresion
+from respuestas import codificar
+
+# =========================================================
+# Snapshot en memoria del catálogo (categorías + ejercicios)
+# =========================================================
+#
+# El catálogo solo cambia desde admin_ejercicios o seed.py, así que se
+# serializa una vez y se sirve ya codificado. Cada mutación llama a
+# invalidar() y sube la versión. Como seed.py y los otros workers no
+# comparten memoria, el snapshot además caduca a los CATALOGO_TTL segundos;
+# el ETag es un hash del contenido, así que si nada ha cambiado sigue igual.
+
+CATALOGO_TTL = float(os.getenv("CATALOGO_TTL", "60"))
+
+# Columnas de los listados de ejercicios; los Text grandes quedan fuera
+COLUMNAS_RESUMEN = (
+    models.Ejercicio.id,
+    models.Ejercicio.titulo,
+    models.Ejercicio.dificultad,
+    models.Ejercicio.lenguaje,
+    models.Ejercicio.categoria_id,
+    models.Ejercicio.subcategoria,
+)
+
+_lock = threading.Lock()
+_version = 0
+_snapshot = None
+
+
+class Snapshot:
+    def __init__(self, version: int, categorias: list, ejercicios: list):
+        self.version = version
+        self.creado = time.monotonic()
+
+        self.categorias = codificar(categorias)
+        self.ejercicios = codificar(ejercicios)
+        self.categoria_por_id = {c["id"]: codificar(c) for c in categorias}
+        self.ids_ejercicios = frozenset(e["id"] for e in ejercicios)
+
+        digest = hashlib.sha256(self.categorias + b"\n" + self.ejercicios).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+
+        # (cuerpo, codificación) -> cuerpo comprimido; se rellena al primer uso
+        self._comprimidos = {}
+        self._lock_compresion = threading.Lock()
+
+    def vigente(self) -> bool:
+        return self.version == _version and time.monotonic() - self.creado < CATALOGO_TTL
+
+    def variante(self, cuerpo: bytes, codificacion: str) -> bytes:
+        """
+        Cuerpo precomprimido (gzip 9 / brotli COMPRESION_NIVEL_BR_MAXIMO), una
+        sola vez por versión del catálogo: el coste de CPU no crece con el
+        número de requests.
+        """
+        clave = (cuerpo, codificacion)
+        comprimido = self._comprimidos.get(clave)
+        if comprimido is None:
+            # Con el lock, los requests que llegan a la vez esperan en lugar de comprimir cada uno
+            with self._lock_compresion:
+                comprimido = self._comprimidos.get(clave)
+                if comprimido is None:
+                    comprimido = compresion.comprimir(cuerpo, codificacion, maximo=True)
+                    self._comprimidos[clave] = comprimido
+        return comprimido
+
+
+def _construir(db: Session, version: int) -> Snapshot:
+    categorias = [
+        {"id": c.id, "nombre": c.nombre}
+        for c in db.query(models.Categoria.id, models.Categoria.nombre)
+            .order_by(models.Categoria.id)
+    ]
+
+    # Solo el resumen: enunciado y solución se piden por ejercicio (detalle)
+    ejercicios = [
+        e._asdict()
+        for e in db.query(*COLUMNAS_RESUMEN).order_by(models.Ejercicio.id)
+    ]
+
+    return Snapshot(version, categorias, ejercicios)
+
+
+def vigente():
+    """
+    Devuelve el snapshot actual si sigue siendo válido, sin tocar la BD.
+    """
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.vigente():
+        return snapshot
+    return None
+
+
+def obtener(db: Session) -> Snapshot:
+    global _snapshot
+    snapshot = vigente()
+    if snapshot is not None:
+        return snapshot
+
+    with _lock:
+        # Otro hilo puede haberlo reconstruido mientras esperábamos
+        snapshot = vigente()
+        if snapshot is None:
+            snapshot = _construir(db, _version)
+            _snapshot = snapshot
+        return snapshot
+
+
+def existe_en_bd(db: Session, ejercicio_id: int) -> bool:
+    return db.query(models.Ejercicio.id).filter(models.Ejercicio.id == ejercicio_id).first() is not None
+
+
+def existe(db: Session, ejercicio_id: int) -> bool:
+    """
+    Casi siempre contesta el snapshot. Si el ejercicio no está se confirma en
+    la BD: puede haberlo creado otro worker y aquí el snapshot aún no caduca.
+    """
+    return ejercicio_id in obtener(db).ids_ejercicios or existe_en_bd(db, ejercicio_id)
+
+
+def detalle(db: Session, ejercicio_id: int, con_solucion: bool = False):
+    """
+    Ejercicio con su enunciado, o None si no existe. La solución solo con
+    con_solucion (administradores); si no, ni se lee ni aparece la clave.
+    """
+    columnas = COLUMNAS_RESUMEN + (models.Ejercicio.enunciado,)
+    if con_solucion:
+        columnas += (models.Ejercicio.solucion,)
+    e = db.query(*columnas).filter(models.Ejercicio.id == ejercicio_id).first()
+    if e is None:
+        return None
+    return e._asdict()
+
+
+def invalidar():
+    """
+    Marca el catálogo como modificado. Llamar tras cada commit que toque
+    categorías o ejercicios.
+    """
+    global _version
+    with _lock:
+        _version += 1
+
+
+def version() -> int:
+    return _version
+
+
+# =========================================================
+# Respuestas con ETag / If-None-Match
+# =========================================================
+
+def etag_coincide(request: Request, etag: str) -> bool:
+    cabecera = request.headers.get("if-none-match")
+    if not cabecera:
+        return False
+    # Las variantes comprimidas llevan sufijo (-gzip/-br) pero son la misma versión
+    base = etag.strip('"')
+    candidatos = [
+        c.strip().removeprefix("W/").strip('"').removesuffix("-gzip").removesuffix("-br")
+        for c in cabecera.split(",")
+    ]
+    return "*" in candidatos or base in candidatos
+
+
+def responder(request: Request, cuerpo: bytes, snapshot: Snapshot) -> Response:
+    """
+    Sirve el cuerpo ya codificado, o un 304 vacío si el cliente ya tiene esa versión.
+    Por encima de COMPRESION_MINIMO se sirve la variante precomprimida que acepte el cliente.
+    """
+    codificacion = None
+    if len(cuerpo) >= compresion.COMPRESION_MINIMO:
+        codificacion = compresion.elegir_codificacion(request.headers.get("accept-encoding", ""))
+
+    cabeceras = _cabeceras(snapshot.etag, codificacion)
+    if etag_coincide(request, snapshot.etag):
+        return Response(status_code=304, headers=cabeceras)
+
+    if codificacion:
+        cuerpo = snapshot.variante(cuerpo, codificacion)
+    return Response(content=cuerpo, media_type="application/json", headers=cabeceras)
+
+
+def _cabeceras(etag: str, codificacion: str = None) -> dict:
+    # private: el catálogo requiere login; no-cache: revalidar siempre con el ETag
+    cabeceras = {"Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if codificacion:
+        # Cada representación necesita su propio ETag fuerte
+        cabeceras["ETag"] = etag[:-1] + f'-{codificacion}"'
+        cabeceras["Content-Encoding"] = codificacion
+    else:
+        cabeceras["ETag"] = etag
+    return cabeceras
@@ -0,0 +1,191 @@
+# backend/codigos.py
+"""
+Almacén del código de las entregas por contenido.
+
+El código se guarda una sola vez en la tabla `codigos`, comprimido y con el
+sha256 del texto como clave; cada entrega apunta a él con codigo_hash. Un
+alumno que reenvía el mismo código (o dos alumnos con la misma solución)
+no ocupa más espacio.
+
+- Los listados no leen la tabla: solo se resuelve el código cuando se pide,
+  y siempre en bloque (resolver) con una consulta IN por página.
+- Las entregas anteriores a este cambio siguen con el texto en
+  Entrega.codigo (codigo_hash NULL) hasta que se migran con migrar_codigos.py;
+  las nuevas dejan Entrega.codigo vacío.
+
+Borrar blobs huérfanos (migrar_codigos.limpiar) excluye a quien está
+guardando entregas: guardar_muchos toma un cerrojo compartido hasta el commit
+de su transacción (pg_advisory_xact_lock_shared en PostgreSQL; en SQLite el
+cerrojo de escritura) y limpiar el exclusivo, así que un blob que se acaba de
+ver como existente no desaparece antes de que se guarde la entrega que lo usa.
+
+Por defecto se comprime con zlib. CODIGO_COMPRESION=zstd usa el paquete
+zstandard (opcional); a partir de ahí todos los workers que lean entregas
+necesitan tenerlo instalado.
+"""
+import hashlib
+import logging
+import os
+import zlib
+from sqlalchemy import inspect, insert, text
+from sqlalchemy.exc import IntegrityError
+import models
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CODIGO_COMPRESION = os.getenv("CODIGO_COMPRESION", "zlib")
+CODIGO_NIVEL = int(os.getenv("CODIGO_NIVEL", "9"))
+
+# Hashes por consulta IN al resolver
+_BLOQUE_IN = 500
+
+# Clave del advisory lock entre guardar_muchos y limpiar (PostgreSQL)
+_CERROJO_LIMPIEZA = 0x636F6469  # "codi"
+
+logger = logging.getLogger("codigos")
+
+
+# =========================================================
+# Compresión
+# =========================================================
+
+def hash_de(codigo: str) -> str:
+    return hashlib.sha256(codigo.encode("utf-8")).hexdigest()
+
+
+def comprimir(codigo: str) -> tuple:
+    """
+    Devuelve (compresion, datos). Si comprimir no ahorra nada se guarda tal cual.
+    """
+    crudo = codigo.encode("utf-8")
+    if CODIGO_COMPRESION == "zstd" and zstandard is not None:
+        compresion, datos = "zstd", zstandard.ZstdCompressor(level=CODIGO_NIVEL).compress(crudo)
+    else:
+        compresion, datos = "zlib", zlib.compress(crudo, CODIGO_NIVEL)
+    if len(datos) >= len(crudo):
+        return "nada", crudo
+    return compresion, datos
+
+
+def descomprimir(compresion: str, datos: bytes) -> str:
+    if compresion == "zstd":
+        # Un blob zstd exige el paquete aunque ahora esté configurado zlib
+        if zstandard is None:
+            raise RuntimeError("Hay código comprimido con zstd y el paquete zstandard no está instalado")
+        return zstandard.ZstdDecompressor().decompress(datos).decode("utf-8")
+    if compresion == "zlib":
+        return zlib.decompress(datos).decode("utf-8")
+    return bytes(datos).decode("utf-8")
+
+
+# =========================================================
+# Escritura
+# =========================================================
+
+def excluir_limpieza(db, exclusivo: bool = False):
+    """
+    Cerrojo entre guardar blobs y borrarlos, hasta el commit de la transacción.
+    """
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "postgresql":
+        funcion = "pg_advisory_xact_lock" if exclusivo else "pg_advisory_xact_lock_shared"
+        db.execute(text(f"SELECT {funcion}(:clave)"), {"clave": _CERROJO_LIMPIEZA})
+    elif dialecto == "sqlite":
+        # Una escritura vacía: abre la transacción con el cerrojo de escritura ya
+        # tomado (con pysqlite un SELECT suelto no abriría ninguna)
+        db.execute(text("DELETE FROM codigos WHERE 0"))
+
+
+def _existentes(db, hashes) -> set:
+    hashes = list(hashes)
+    encontrados = set()
+    for i in range(0, len(hashes), _BLOQUE_IN):
+        encontrados.update(
+            h for (h,) in db.query(models.Codigo.hash).filter(models.Codigo.hash.in_(hashes[i:i + _BLOQUE_IN]))
+        )
+    return encontrados
+
+
+def guardar_muchos(db, textos: list) -> list:
+    """
+    Guarda los códigos que aún no existan y devuelve sus hashes en el mismo
+    orden. No hace commit: va en la transacción de quien inserta las entregas.
+    """
+    hashes = [hash_de(t) for t in textos]
+    nuevos = dict(zip(hashes, textos))
+    excluir_limpieza(db)
+
+    # Si otro proceso inserta el mismo código a la vez, el INSERT choca con la PK:
+    # se vuelve a mirar qué falta y se reintenta
+    for _ in range(3):
+        for h in _existentes(db, nuevos):
+            del nuevos[h]
+        if not nuevos:
+            break
+
+        filas = []
+        for h, t in nuevos.items():
+            compresion, datos = comprimir(t)
+            filas.append({"hash": h, "compresion": compresion, "tamano": len(t), "datos": datos})
+        try:
+            with db.begin_nested():
+                db.execute(insert(models.Codigo), filas)
+            break
+        except IntegrityError:
+            continue
+    else:
+        raise RuntimeError("No se pudo guardar el código de las entregas")
+
+    return hashes
+
+
+def guardar(db, codigo: str) -> str:
+    return guardar_muchos(db, [codigo])[0]
+
+
+# =========================================================
+# Lectura
+# =========================================================
+
+def leer(db, hashes) -> dict:
+    """
+    {hash: código} para los hashes dados, en consultas IN de _BLOQUE_IN.
+    """
+    hashes = list({h for h in hashes if h})
+    textos = {}
+    for i in range(0, len(hashes), _BLOQUE_IN):
+        for fila in db.query(models.Codigo.hash, models.Codigo.compresion, models.Codigo.datos)\
+                .filter(models.Codigo.hash.in_(hashes[i:i + _BLOQUE_IN])):
+            textos[fila.hash] = descomprimir(fila.compresion, fila.datos)
+    return textos
+
+
+def resolver(db, filas) -> list:
+    """
+    Código de cada fila (con columnas codigo y codigo_hash), en el mismo orden.
+    Las filas sin migrar llevan el texto en codigo. Si falta un blob se avisa
+    en el log y la fila sale con código vacío.
+    """
+    textos = leer(db, (f.codigo_hash for f in filas))
+    perdidos = {f.codigo_hash for f in filas if f.codigo_hash and f.codigo_hash not in textos}
+    if perdidos:
+        logger.error("Faltan %d blobs de código en la tabla codigos: %s", len(perdidos), sorted(perdidos))
+    return [textos.get(f.codigo_hash, "") if f.codigo_hash else f.codigo for f in filas]
+
+
+# =========================================================
+# Esquema
+# =========================================================
+
+def asegurar_esquema(motor):
+    """
+    create_all no añade columnas a tablas existentes: en una BD anterior a
+    este cambio hay que añadir entregas.codigo_hash a mano.
+    """
+    columnas = {c["name"] for c in inspect(motor).get_columns("entregas")}
+    if "codigo_hash" not in columnas:
+        with motor.begin() as conn:
+            conn.execute(text("ALTER TABLE entregas ADD COLUMN codigo_hash VARCHAR(64) REFERENCES codigos(hash)"))
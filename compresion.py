@@ -0,0 +1,174 @@
+# backend/compresion.py
+"""
+Compresión de respuestas: negociación gzip / brotli según Accept-Encoding.
+
+- CompresionMiddleware comprime al vuelo las respuestas dinámicas que superan
+  COMPRESION_MINIMO bytes (también las de streaming, trozo a trozo).
+- El catálogo no pasa por aquí: catalogo.responder sirve variantes ya
+  comprimidas una vez por versión (Snapshot.variante) y marca Content-Encoding,
+  así que el middleware las deja tal cual.
+
+brotli es opcional: si el paquete no está instalado solo se ofrece gzip.
+"""
+import os
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESION_MINIMO = int(os.getenv("COMPRESION_MINIMO", "1024"))
+# Niveles para lo que se comprime en cada request
+COMPRESION_NIVEL_GZIP = int(os.getenv("COMPRESION_NIVEL_GZIP", "6"))
+COMPRESION_NIVEL_BR = int(os.getenv("COMPRESION_NIVEL_BR", "4"))
+# Lo precomprimido (catálogo) usa gzip 9 y este nivel de brotli: 11 comprime ~10%
+# más que 9 pero es ~20 veces más lento (300 ms con 1000 ejercicios, a cada versión)
+COMPRESION_NIVEL_BR_MAXIMO = int(os.getenv("COMPRESION_NIVEL_BR_MAXIMO", "9"))
+
+# Tipos que ya vienen comprimidos (p.ej. la exportación .gz)
+_YA_COMPRIMIDOS = ("application/gzip", "application/zip", "image/", "video/", "audio/")
+
+
+def codificaciones_disponibles() -> list:
+    # Por orden de preferencia del servidor
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def elegir_codificacion(accept_encoding: str):
+    """
+    Devuelve "br", "gzip" o None según lo que acepta el cliente (respeta q=0).
+    """
+    if not accept_encoding:
+        return None
+
+    aceptadas = {}
+    for parte in accept_encoding.split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        calidad = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                calidad = float(parametros[2:])
+            except ValueError:
+                calidad = 0.0
+        aceptadas[nombre.strip().lower()] = calidad
+
+    comodin = aceptadas.get("*", 0.0)
+    candidatas = [
+        (aceptadas.get(c, comodin), -i, c)
+        for i, c in enumerate(codificaciones_disponibles())
+    ]
+    calidad, _, codificacion = max(candidatas)
+    return codificacion if calidad > 0 else None
+
+
+def comprimir(datos: bytes, codificacion: str, maximo: bool = False) -> bytes:
+    if codificacion == "br":
+        return brotli.compress(datos, quality=COMPRESION_NIVEL_BR_MAXIMO if maximo else COMPRESION_NIVEL_BR)
+    compresor = zlib.compressobj(9 if maximo else COMPRESION_NIVEL_GZIP, zlib.DEFLATED, 31)
+    return compresor.compress(datos) + compresor.flush()
+
+
+class _Compresor:
+    """
+    Compresor incremental para respuestas en streaming.
+    """
+
+    def __init__(self, codificacion: str):
+        if codificacion == "br":
+            self._br = brotli.Compressor(quality=COMPRESION_NIVEL_BR)
+            self._gz = None
+        else:
+            self._br = None
+            self._gz = zlib.compressobj(COMPRESION_NIVEL_GZIP, zlib.DEFLATED, 31)
+
+    def trozo(self, datos: bytes) -> bytes:
+        # flush por trozo: el cliente recibe cada trozo sin esperar al final
+        if self._br is not None:
+            return self._br.process(datos) + self._br.flush()
+        return self._gz.compress(datos) + self._gz.flush(zlib.Z_SYNC_FLUSH)
+
+    def final(self) -> bytes:
+        if self._br is not None:
+            return self._br.finish()
+        return self._gz.flush()
+
+
+# =========================================================
+# Middleware ASGI
+# =========================================================
+
+class CompresionMiddleware:
+    def __init__(self, app, minimo: int = COMPRESION_MINIMO):
+        self.app = app
+        self.minimo = minimo
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        codificacion = elegir_codificacion(Headers(scope=scope).get("accept-encoding", ""))
+        if codificacion is None:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None
+        compresor = None
+        pasar = False
+
+        async def enviar(mensaje):
+            nonlocal inicio, compresor, pasar
+
+            if mensaje["type"] == "http.response.start":
+                # Se retiene hasta ver el primer trozo del cuerpo
+                inicio = mensaje
+                cabeceras = Headers(raw=mensaje["headers"])
+                tipo = cabeceras.get("content-type", "")
+                pasar = "content-encoding" in cabeceras or tipo.startswith(_YA_COMPRIMIDOS)
+                return
+
+            if mensaje["type"] != "http.response.body":
+                await send(mensaje)
+                return
+
+            cuerpo = mensaje.get("body", b"")
+            mas = mensaje.get("more_body", False)
+
+            if inicio is not None:
+                primero, inicio = inicio, None
+
+                if pasar or (not mas and len(cuerpo) < self.minimo):
+                    await send(primero)
+                    await send(mensaje)
+                    pasar = True
+                    return
+
+                cabeceras = MutableHeaders(raw=primero["headers"])
+                cabeceras["Content-Encoding"] = codificacion
+                cabeceras.add_vary_header("Accept-Encoding")
+                if "content-length" in cabeceras:
+                    del cabeceras["Content-Length"]
+
+                if not mas:
+                    cuerpo = comprimir(cuerpo, codificacion)
+                    cabeceras["Content-Length"] = str(len(cuerpo))
+                    await send(primero)
+                    await send({"type": "http.response.body", "body": cuerpo})
+                    return
+
+                compresor = _Compresor(codificacion)
+                await send(primero)
+
+            if pasar:
+                await send(mensaje)
+                return
+
+            datos = compresor.trozo(cuerpo)
+            if not mas:
+                datos += compresor.final()
+            await send({"type": "http.response.body", "body": datos, "more_body": mas})
+
+        await self.app(scope, receive, enviar)
@@ -0,0 +1,120 @@
+# backend/consultas.py
+import base64
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+import models
+
+# =========================================================
+# Consultas de proyección (una sola query con JOIN)
+# =========================================================
+
+def consulta_entregas(db: Session, detalle: bool = False):
+    """
+    Devuelve una query de filas (no objetos ORM) con las entregas ya unidas
+    a usuario y ejercicio, seleccionando solo las columnas necesarias.
+    Así un listado cuesta una única sentencia SQL sin importar cuántas filas haya.
+
+    - detalle=False: id, usuario, ejercicio, fecha_envio
+    - detalle=True: además codigo/codigo_hash, resultado y categoria_id (vista admin);
+      el texto del código se obtiene luego con codigos.resolver
+    """
+    columnas = [
+        models.Entrega.id,
+        models.Usuario.nombre.label("usuario"),
+        models.Ejercicio.titulo.label("ejercicio"),
+        models.Entrega.fecha_envio,
+    ]
+
+    if detalle:
+        columnas += [
+            models.Entrega.codigo,
+            models.Entrega.codigo_hash,
+            models.Entrega.resultado,
+            models.Ejercicio.categoria_id,
+        ]
+
+    # outerjoin: si el usuario o el ejercicio se han borrado la entrega se sigue listando
+    return db.query(*columnas)\
+        .outerjoin(models.Usuario, models.Entrega.usuario_id == models.Usuario.id)\
+        .outerjoin(models.Ejercicio, models.Entrega.ejercicio_id == models.Ejercicio.id)
+
+
+def filtrar_entregas(
+    q,
+    usuario_id: Optional[int] = None,
+    ejercicio_id: Optional[int] = None,
+    categoria_id: Optional[int] = None,
+    resultado: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+):
+    """
+    Aplica en servidor los filtros de los listados de entregas.
+    Cada filtro está respaldado por un índice compuesto de models.Entrega.
+    La query debe venir de consulta_entregas (ya incluye el JOIN con ejercicios).
+    """
+    if usuario_id:
+        q = q.filter(models.Entrega.usuario_id == usuario_id)
+
+    if ejercicio_id:
+        q = q.filter(models.Entrega.ejercicio_id == ejercicio_id)
+
+    if categoria_id:
+        q = q.filter(models.Ejercicio.categoria_id == categoria_id)
+
+    if resultado:
+        q = q.filter(models.Entrega.resultado == resultado)
+
+    if desde:
+        q = q.filter(models.Entrega.fecha_envio >= desde)
+
+    if hasta:
+        q = q.filter(models.Entrega.fecha_envio < hasta)
+
+    return q
+
+
+# =========================================================
+# Paginación por cursor (keyset) sobre (fecha_envio, id)
+# =========================================================
+
+def codificar_cursor(fecha_envio: datetime, entrega_id: int) -> str:
+    crudo = f"{fecha_envio.isoformat()}|{entrega_id}"
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str):
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        crudo = base64.urlsafe_b64decode(cursor + relleno).decode()
+        fecha, entrega_id = crudo.split("|")
+        return datetime.fromisoformat(fecha), int(entrega_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def paginar_entregas(q, cursor: Optional[str], limit: int):
+    """
+    Devuelve (filas, siguiente_cursor) ordenando de más nueva a más antigua.
+    En lugar de OFFSET se filtra por (fecha_envio, id) < cursor, así cada página
+    es un rango de índice y cuesta lo mismo sea la primera o la número 10.000.
+    """
+    if cursor:
+        fecha, entrega_id = decodificar_cursor(cursor)
+        q = q.filter(
+            tuple_(models.Entrega.fecha_envio, models.Entrega.id) < tuple_(fecha, entrega_id)
+        )
+
+    filas = q.order_by(models.Entrega.fecha_envio.desc(), models.Entrega.id.desc())\
+        .limit(limit + 1)\
+        .all()
+
+    siguiente = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        siguiente = codificar_cursor(filas[-1].fecha_envio, filas[-1].id)
+
+    return filas, siguiente
@@ -0,0 +1,607 @@
+# backend/corrector.py
+"""
+Corrección automática de entregas (CORRECCION_AUTOMATICA=1).
+
+Cada ejercicio puede tener casos de prueba (tabla casos_prueba): una entrada
+que se le da al programa por input() y la salida que debe imprimir. Al
+guardarse una entrega se encola su corrección y, cuando acaba, se rellena
+Entrega.resultado con "correcto", "incorrecto", "error" o "tiempo" (solo si
+nadie la ha revisado antes a mano).
+
+Aislamiento: cada caso corre en un intérprete nuevo (python -I -S) dentro
+de namespaces propios creados con unshare:
+
+- red propia sin interfaces (sin salida a la red, ni a la BD),
+- PID propio con su /proc: no ve los procesos de la API ni su entorno,
+- montajes propios: el directorio del backend, el temporal, /home, /root y
+  los de secretos quedan tapados por un tmpfs vacío (CORRECTOR_OCULTAR
+  añade más); el intérprete se monta de solo lectura aparte,
+- un uid/gid sin privilegios distinto por hueco de ejecución
+  (CORRECTOR_UID_BASE + n), sin grupos ni capacidades (no_new_privs),
+- límites de CPU, memoria, procesos, archivos abiertos y tamaño de archivo
+  (resource.setrlimit) y un tiempo de pared máximo.
+
+input() no muestra el prompt, para que la salida se compare limpia. Crear
+los namespaces y cambiar de uid exige que la API corra como root (o con
+CAP_SYS_ADMIN y CAP_SETUID); al arrancar se prueba el aislamiento y, si no
+está disponible, con CORRECCION_AUTOMATICA=1 la API no arranca.
+
+Ráfagas: CORRECTOR_WORKERS casos en paralelo como máximo y una cola acotada
+(CORRECTOR_COLA_MAX); lo que no cabe se queda sin resultado y se puede
+recuperar con POST /api/admin/corrector/pendientes. El resultado se memoriza
+por (ejercicio, sha256 del código, sha256 de los casos) en memoria y en la
+tabla correcciones, así que reenviar el mismo código no ejecuta nada, y si
+varias entregas idénticas llegan a la vez solo se ejecuta una.
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from sqlalchemy.exc import IntegrityError
+import models
+import codigos
+import progreso
+from cache import CacheTTL
+from database import SessionLocal
+
+CORRECCION_AUTOMATICA = os.getenv("CORRECCION_AUTOMATICA", "0") == "1"
+CORRECTOR_WORKERS = int(os.getenv("CORRECTOR_WORKERS", str(os.cpu_count() or 2)))
+CORRECTOR_COLA_MAX = int(os.getenv("CORRECTOR_COLA_MAX", "5000"))
+# Límites por caso
+CORRECTOR_CPU_S = int(os.getenv("CORRECTOR_CPU_S", "2"))
+CORRECTOR_TIEMPO_S = float(os.getenv("CORRECTOR_TIEMPO_S", "5"))
+CORRECTOR_MEMORIA_MB = int(os.getenv("CORRECTOR_MEMORIA_MB", "256"))
+CORRECTOR_SALIDA_MAX = int(os.getenv("CORRECTOR_SALIDA_MAX", "65536"))
+# Bytes de stderr que se leen como mucho (del error solo se guarda el final)
+CORRECTOR_ERROR_MAX = int(os.getenv("CORRECTOR_ERROR_MAX", "65536"))
+# RLIMIT_NPROC por uid: 1 = no puede lanzar procesos
+CORRECTOR_PROCESOS = int(os.getenv("CORRECTOR_PROCESOS", "1"))
+# Cada hueco de ejecución usa su propio uid/gid: CORRECTOR_UID_BASE + n
+CORRECTOR_UID_BASE = int(os.getenv("CORRECTOR_UID_BASE", "61000"))
+CORRECTOR_OCULTAR = [r for r in os.getenv("CORRECTOR_OCULTAR", "").split(os.pathsep) if r]
+
+_DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+_TEMPORAL = tempfile.gettempdir()
+# Tapados con un tmpfs vacío dentro del sandbox (los que existan)
+_OCULTOS = [_DIRECTORIO, _TEMPORAL, "/var/tmp", "/dev/shm", "/home", "/root", "/run/secrets"] + CORRECTOR_OCULTAR
+
+logger = logging.getLogger("corrector")
+
+# Primera etapa, como root dentro de los namespaces nuevos: tapa los directorios
+# sensibles, monta el intérprete de solo lectura y lanza el lanzador en un
+# proceso hijo sin privilegios. argv: json con uid, gid, prefijo, ejecutable, ocultos y lanzador
+_AISLAR = r"""
+import ctypes, json, os, sys
+cfg = json.loads(sys.argv[1])
+libc = ctypes.CDLL(None, use_errno=True)
+MS_RDONLY, MS_NOSUID, MS_NODEV, MS_REMOUNT, MS_BIND, MS_REC = 1, 2, 4, 32, 4096, 16384
+
+def montar(fuente, destino, tipo, flags, datos=None):
+    if libc.mount(fuente.encode(), destino.encode(), tipo.encode() if tipo else None,
+                  flags, datos.encode() if datos else None) != 0:
+        e = ctypes.get_errno()
+        raise OSError(e, os.strerror(e), destino)
+
+# El directorio del caso ya es el cwd: sigue accesible aunque se tape el temporal
+raiz = cfg["raiz"]
+montar("tmpfs", raiz, "tmpfs", MS_NOSUID | MS_NODEV, "mode=755,size=64k")
+python = os.path.join(raiz, "python")
+os.mkdir(python)
+montar(cfg["prefijo"], python, None, MS_BIND | MS_REC)
+montar("none", python, None, MS_BIND | MS_REMOUNT | MS_RDONLY | MS_NOSUID | MS_NODEV)
+for ruta in cfg["ocultos"]:
+    montar("tmpfs", ruta, "tmpfs", MS_RDONLY | MS_NOSUID | MS_NODEV, "mode=755,size=4k")
+
+PR_SET_NO_NEW_PRIVS = 38
+ejecutable = os.path.join(python, cfg["ejecutable"])
+pid = os.fork()
+if pid == 0:
+    try:
+        if libc.prctl(PR_SET_NO_NEW_PRIVS, 1, 0, 0, 0) != 0:
+            raise OSError(ctypes.get_errno(), "prctl")
+        os.setgroups([])
+        os.setgid(cfg["gid"])
+        os.setuid(cfg["uid"])
+        if os.getuid() == 0 or os.geteuid() == 0:
+            raise OSError("no se pudieron dejar los privilegios")
+        os.execv(ejecutable, [ejecutable, "-I", "-S", "-c", cfg["lanzador"]] + cfg["argumentos"])
+    except BaseException as e:
+        os.write(2, f"sandbox: {e}\n".encode())
+    os._exit(127)
+
+# Esta etapa se queda como PID 1 del sandbox; la muerte por señal se devuelve como 128 + señal
+_, estado = os.waitpid(pid, 0)
+sys.exit(128 + os.WTERMSIG(estado) if os.WIFSIGNALED(estado) else os.WEXITSTATUS(estado))
+"""
+
+# Segunda etapa, ya sin privilegios: se pone límites y ejecuta solucion.py.
+# argv: cpu_s, memoria_mb, salida_max, procesos
+_LANZADOR = r"""
+import builtins, resource, signal, sys
+cpu, memoria, salida_max, procesos = int(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+resource.setrlimit(resource.RLIMIT_NPROC, (procesos, procesos))
+resource.setrlimit(resource.RLIMIT_AS, (memoria << 20, memoria << 20))
+resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+resource.setrlimit(resource.RLIMIT_NOFILE, (16, 16))
+resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+# Sin esto escribir un archivo mata el proceso sin mensaje; así es un OSError normal
+signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+with open("solucion.py", encoding="utf-8") as f:
+    fuente = f.read()
+
+class _Salida:
+    def __init__(self, destino):
+        self.destino, self.escrito = destino, 0
+    def write(self, texto):
+        self.escrito += len(texto)
+        if self.escrito > salida_max:
+            sys.stderr.write("__SALIDA_EXCEDIDA__\n")
+            raise SystemExit(3)
+        return self.destino.write(texto)
+    def flush(self):
+        self.destino.flush()
+
+sys.stdout = _Salida(sys.stdout)
+
+def _input(prompt=""):
+    linea = sys.stdin.readline()
+    if not linea:
+        raise EOFError("EOF when reading a line")
+    return linea.rstrip("\n")
+
+builtins.input = _input
+exec(compile(fuente, "solucion.py", "exec"), {"__name__": "__main__", "__builtins__": builtins})
+"""
+
+_ENTORNO = {"PATH": "/usr/bin:/bin", "PYTHONIOENCODING": "utf-8", "LANG": "C.UTF-8"}
+
+_UNSHARE = ["unshare", "--net", "--pid", "--ipc", "--uts", "--mount",
+            "--propagation", "private", "--fork", "--mount-proc", "--kill-child", "--"]
+
+# uids libres; uno por caso en ejecución (los workers y la prueba de arranque)
+_uids = queue.Queue()
+for _n in range(CORRECTOR_WORKERS + 1):
+    _uids.put(CORRECTOR_UID_BASE + _n)
+
+
+def _interprete() -> tuple:
+    """
+    (prefijo, ejecutable relativo): el prefijo de Python se monta entero en el
+    sandbox, así el uid sin privilegios lo lee aunque esté bajo /root.
+    """
+    prefijo = os.path.realpath(sys.base_prefix)
+    ejecutable = os.path.realpath(sys.executable)
+    if not ejecutable.startswith(prefijo + os.sep):
+        raise RuntimeError(f"El intérprete {ejecutable} no está bajo {prefijo}")
+    return prefijo, os.path.relpath(ejecutable, prefijo)
+
+
+def _comando(uid: int) -> list:
+    prefijo, ejecutable = _interprete()
+    ocultos = [r for r in dict.fromkeys(_OCULTOS) if r != _TEMPORAL and os.path.isdir(r)]
+    cfg = {
+        "uid": uid,
+        "gid": uid,
+        "raiz": _TEMPORAL,
+        "prefijo": prefijo,
+        "ejecutable": ejecutable,
+        "ocultos": ocultos,
+        "lanzador": _LANZADOR,
+        "argumentos": [str(CORRECTOR_CPU_S), str(CORRECTOR_MEMORIA_MB),
+                       str(CORRECTOR_SALIDA_MAX), str(CORRECTOR_PROCESOS)],
+    }
+    return _UNSHARE + [sys.executable, "-I", "-S", "-c", _AISLAR, json.dumps(cfg)]
+
+
+# =========================================================
+# Ejecución de un caso
+# =========================================================
+
+def _matar(p):
+    # Al grupo entero: al morir el PID 1 del sandbox muere todo lo que lanzó
+    try:
+        os.killpg(p.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _leer_acotado(tubo, maximo: int, destino: bytearray, excedido: threading.Event, p):
+    # El envoltorio de sys.stdout se salta con os.write(1, ...): el tope de
+    # verdad está aquí, antes de que la salida llegue a memoria de la API
+    fd = tubo.fileno()
+    while True:
+        trozo = os.read(fd, 65536)
+        if not trozo:
+            return
+        if len(destino) + len(trozo) > maximo:
+            destino += trozo[:maximo - len(destino)]
+            excedido.set()
+            _matar(p)
+            return
+        destino += trozo
+
+
+def _escribir(tubo, datos: bytes):
+    try:
+        tubo.write(datos)
+    except (BrokenPipeError, OSError):
+        pass  # el programa terminó sin leer toda la entrada
+    finally:
+        try:
+            tubo.close()
+        except OSError:
+            pass
+
+
+def _comunicar(p, entrada: bytes) -> tuple:
+    """
+    Como p.communicate() pero leyendo como mucho lo que se va a usar: si el
+    programa escribe más, se le mata. Devuelve (stdout, stderr, excedido);
+    excedido es None si se acabó el tiempo de pared.
+    """
+    stdout, stderr = bytearray(), bytearray()
+    excedido = threading.Event()
+    # El envoltorio cuenta caracteres; en UTF-8 son hasta 4 bytes cada uno
+    hilos = [
+        threading.Thread(target=_escribir, args=(p.stdin, entrada), daemon=True),
+        threading.Thread(target=_leer_acotado, args=(p.stdout, 4 * CORRECTOR_SALIDA_MAX + 1024, stdout, excedido, p),
+                         daemon=True),
+        threading.Thread(target=_leer_acotado, args=(p.stderr, CORRECTOR_ERROR_MAX, stderr, excedido, p),
+                         daemon=True),
+    ]
+    for hilo in hilos:
+        hilo.start()
+    try:
+        p.wait(timeout=CORRECTOR_TIEMPO_S)
+        agotado = False
+    except subprocess.TimeoutExpired:
+        _matar(p)
+        p.wait()
+        agotado = True
+    for hilo in hilos:
+        hilo.join(timeout=5)
+    for tubo in (p.stdout, p.stderr):
+        tubo.close()
+    if agotado and not excedido.is_set():
+        return bytes(stdout), bytes(stderr), None
+    return bytes(stdout), bytes(stderr), excedido.is_set()
+
+
+def ejecutar_caso(codigo: str, entrada: str) -> dict:
+    """
+    Ejecuta el código con la entrada dada. Devuelve {"estado", "salida", "error"}
+    con estado "ok", "error", "tiempo" o "memoria".
+    """
+    uid = _uids.get()
+    try:
+        with tempfile.TemporaryDirectory(prefix="corrector-", dir=_TEMPORAL) as directorio:
+            ruta = os.path.join(directorio, "solucion.py")
+            with open(ruta, "w", encoding="utf-8") as f:
+                f.write(codigo)
+            # Solo el uid del caso entra en su directorio
+            os.chown(ruta, uid, uid)
+            os.chown(directorio, uid, uid)
+            os.chmod(directorio, 0o700)
+
+            p = subprocess.Popen(
+                _comando(uid),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                cwd=directorio,
+                env=_ENTORNO,
+                start_new_session=True,
+            )
+            stdout, stderr, excedido = _comunicar(p, entrada.encode("utf-8"))
+            if excedido is None:
+                return {"estado": "tiempo", "salida": "", "error": "Tiempo de ejecución excedido"}
+    finally:
+        _uids.put(uid)
+
+    salida = stdout[:CORRECTOR_SALIDA_MAX].decode("utf-8", "replace")
+    error = stderr[-2000:].decode("utf-8", "replace")
+
+    if excedido:
+        return {"estado": "error", "salida": salida, "error": "Salida demasiado larga"}
+    if p.returncode == 0:
+        return {"estado": "ok", "salida": salida, "error": ""}
+    # SIGXCPU / SIGKILL al pasarse de CPU (la primera etapa los devuelve como 128 + señal)
+    if p.returncode in (128 + signal.SIGXCPU, 128 + signal.SIGKILL):
+        return {"estado": "tiempo", "salida": salida, "error": "Tiempo de CPU excedido"}
+    if "MemoryError" in error:
+        return {"estado": "memoria", "salida": salida, "error": "Memoria excedida"}
+    if "__SALIDA_EXCEDIDA__" in error:
+        return {"estado": "error", "salida": salida, "error": "Salida demasiado larga"}
+    return {"estado": "error", "salida": salida, "error": error}
+
+
+# Lo que debe ver un caso aislado; comprobar_aislamiento() lo verifica al arrancar
+_SONDA = r"""
+import json, os, socket
+r = {"uid": os.getuid(), "gid": os.getgid(),
+     "ns_pid": os.readlink("/proc/self/ns/pid"), "ns_red": os.readlink("/proc/self/ns/net")}
+try:
+    r["backend"] = os.listdir(input())
+except OSError:
+    r["backend"] = []
+try:
+    socket.create_connection(("1.1.1.1", 53), timeout=1).close()
+    r["red"] = True
+except OSError:
+    r["red"] = False
+print(json.dumps(r))
+"""
+
+
+def comprobar_aislamiento():
+    """
+    Ejecuta una sonda en el sandbox y lanza RuntimeError si no queda aislada:
+    mejor no corregir nada que ejecutar código de alumnos junto a los secretos.
+    """
+    if shutil.which("unshare") is None:
+        raise RuntimeError("Corrector: falta unshare (util-linux) para aislar los casos")
+    r = ejecutar_caso(_SONDA, _DIRECTORIO + "\n")
+    if r["estado"] != "ok":
+        raise RuntimeError(f"Corrector: no se pudo crear el sandbox ({r['error'].strip()[-500:]})")
+    datos = json.loads(r["salida"])
+    fallos = []
+    if datos["uid"] < CORRECTOR_UID_BASE or datos["gid"] < CORRECTOR_UID_BASE:
+        fallos.append(f"corre como uid {datos['uid']}")
+    if datos["ns_pid"] == os.readlink("/proc/self/ns/pid"):
+        fallos.append("ve los procesos de la API")
+    if datos["ns_red"] == os.readlink("/proc/self/ns/net"):
+        fallos.append("comparte la red de la API")
+    if datos["backend"]:
+        fallos.append("ve el directorio del backend")
+    if datos["red"]:
+        fallos.append("tiene red")
+    if fallos:
+        raise RuntimeError("Corrector: sandbox sin aislar: " + ", ".join(fallos))
+
+
+def _normalizar(texto: str) -> list:
+    # Se ignoran los espacios al final de cada línea y las líneas vacías del final
+    lineas = [l.rstrip() for l in texto.replace("\r\n", "\n").split("\n")]
+    while lineas and not lineas[-1]:
+        lineas.pop()
+    return lineas
+
+
+def salida_correcta(salida: str, esperada: str) -> bool:
+    return _normalizar(salida) == _normalizar(esperada)
+
+
+def corregir(codigo: str, casos: list) -> tuple:
+    """
+    Ejecuta todos los casos [(entrada, salida_esperada), ...] y devuelve
+    (resultado, detalle). Tras un caso que agota el tiempo no se ejecutan los
+    demás: casi seguro que también lo agotan y son los más caros.
+    """
+    detalle = []
+    resultado = "correcto"
+    for entrada, esperada in casos:
+        if resultado == "tiempo":
+            detalle.append({"estado": "no_ejecutado"})
+            continue
+
+        r = ejecutar_caso(codigo, entrada)
+        if r["estado"] == "ok":
+            r["estado"] = "correcto" if salida_correcta(r["salida"], esperada) else "incorrecto"
+        detalle.append(r)
+
+        if r["estado"] == "tiempo":
+            resultado = "tiempo"
+        elif r["estado"] in ("error", "memoria") and resultado != "tiempo":
+            resultado = "error"
+        elif r["estado"] == "incorrecto" and resultado == "correcto":
+            resultado = "incorrecto"
+
+    return resultado, detalle
+
+
+# =========================================================
+# Casos y memo
+# =========================================================
+
+def hash_casos(casos: list) -> str:
+    return hashlib.sha256(json.dumps(casos, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class Corrector:
+    def __init__(self):
+        comprobar_aislamiento()
+        self._executor = ThreadPoolExecutor(max_workers=CORRECTOR_WORKERS, thread_name_prefix="corrector")
+        self._pendientes = threading.BoundedSemaphore(CORRECTOR_COLA_MAX)
+        self._lock = threading.Lock()
+        self._en_curso = {}  # clave -> Future con (resultado, detalle)
+        self.casos = CacheTTL(maxsize=5000, ttl=60)
+        self.memo = CacheTTL(maxsize=20000, ttl=3600)
+        self.ejecutadas = 0
+        self.memorizadas = 0
+        self.rechazadas = 0
+
+    def casos_de(self, db, ejercicio_id: int) -> tuple:
+        """
+        (hash, [(entrada, salida_esperada), ...]) del ejercicio; lista vacía si no tiene.
+        """
+        datos = self.casos.get(ejercicio_id)
+        if datos is None:
+            casos = [
+                (c.entrada, c.salida_esperada)
+                for c in db.query(models.CasoPrueba.entrada, models.CasoPrueba.salida_esperada)
+                .filter(models.CasoPrueba.ejercicio_id == ejercicio_id)
+                .order_by(models.CasoPrueba.orden, models.CasoPrueba.id)
+            ]
+            datos = (hash_casos(casos), casos)
+            self.casos.set(ejercicio_id, datos)
+        return datos
+
+    def invalidar_casos(self, ejercicio_id: int):
+        self.casos.delete(ejercicio_id)
+
+    def encolar(self, entrega_id: int, ejercicio_id: int, codigo: str) -> bool:
+        """
+        No bloquea: con la cola llena la entrega se queda sin corregir.
+        """
+        if not self._pendientes.acquire(blocking=False):
+            with self._lock:
+                self.rechazadas += 1
+            logger.warning("Cola del corrector llena: entrega %s sin corregir", entrega_id)
+            return False
+        try:
+            futuro = self._executor.submit(self._procesar, entrega_id, ejercicio_id, codigo)
+        except RuntimeError:
+            self._pendientes.release()
+            return False
+        futuro.add_done_callback(lambda _: self._pendientes.release())
+        return True
+
+    def _procesar(self, entrega_id: int, ejercicio_id: int, codigo: str):
+        db = SessionLocal()
+        try:
+            h_casos, casos = self.casos_de(db, ejercicio_id)
+            if not casos:
+                return
+            resultado, _ = self.resultado(db, ejercicio_id, codigo, h_casos, casos)
+            # Una revisión manual hecha mientras tanto manda
+            actualizadas = db.query(models.Entrega).filter(
+                models.Entrega.id == entrega_id,
+                models.Entrega.resultado.is_(None),
+            ).update({models.Entrega.resultado: resultado}, synchronize_session=False)
+            if actualizadas:
+                usuario_id = db.query(models.Entrega.usuario_id).filter(models.Entrega.id == entrega_id).scalar()
+                progreso.actualizar_resultado(db, entrega_id, usuario_id, ejercicio_id, resultado)
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Error corrigiendo la entrega %s", entrega_id)
+        finally:
+            db.close()
+
+    def resultado(self, db, ejercicio_id: int, codigo: str, h_casos: str, casos: list) -> tuple:
+        clave = (ejercicio_id, codigos.hash_de(codigo), h_casos)
+
+        memorizado = self.memo.get(clave)
+        if memorizado is not None:
+            with self._lock:
+                self.memorizadas += 1
+            return memorizado
+
+        fila = db.query(models.Correccion.resultado, models.Correccion.detalle).filter(
+            models.Correccion.ejercicio_id == clave[0],
+            models.Correccion.hash_codigo == clave[1],
+            models.Correccion.hash_casos == clave[2],
+        ).first()
+        if fila is not None:
+            memorizado = (fila.resultado, json.loads(fila.detalle or "[]"))
+            self.memo.set(clave, memorizado)
+            with self._lock:
+                self.memorizadas += 1
+            return memorizado
+
+        # Entregas idénticas a la vez (ráfaga de clase): la primera ejecuta, el resto espera
+        with self._lock:
+            futuro = self._en_curso.get(clave)
+            propio = futuro is None
+            if propio:
+                futuro = self._en_curso[clave] = Future()
+        if not propio:
+            with self._lock:
+                self.memorizadas += 1
+            return futuro.result()
+
+        try:
+            calculado = corregir(codigo, casos)
+            with self._lock:
+                self.ejecutadas += 1
+            self.memo.set(clave, calculado)
+            self._guardar(db, clave, calculado)
+            futuro.set_result(calculado)
+            return calculado
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._en_curso.pop(clave, None)
+
+    def _guardar(self, db, clave: tuple, calculado: tuple):
+        try:
+            with db.begin_nested():
+                db.add(models.Correccion(
+                    ejercicio_id=clave[0],
+                    hash_codigo=clave[1],
+                    hash_casos=clave[2],
+                    resultado=calculado[0],
+                    detalle=json.dumps(calculado[1], ensure_ascii=False),
+                ))
+        except IntegrityError:
+            pass  # otro worker de uvicorn la guardó antes
+
+    def estado(self) -> dict:
+        with self._lock:
+            return {
+                "workers": CORRECTOR_WORKERS,
+                "en_curso": len(self._en_curso),
+                "ejecutadas": self.ejecutadas,
+                "memorizadas": self.memorizadas,
+                "rechazadas": self.rechazadas,
+                "memo": self.memo.stats(),
+            }
+
+    def parar(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_corrector = None
+_corrector_lock = threading.Lock()
+
+
+def obtener() -> Corrector:
+    # Se crea al primer uso, como el pool de hashing
+    global _corrector
+    if _corrector is None:
+        with _corrector_lock:
+            if _corrector is None:
+                _corrector = Corrector()
+    return _corrector
+
+
+def arrancar():
+    # Con la corrección activa, sin sandbox no se arranca (Corrector comprueba el aislamiento)
+    if CORRECCION_AUTOMATICA:
+        obtener()
+
+
+def estado() -> dict:
+    # Sin la corrección activa no se crea el Corrector (ni se prueba el sandbox)
+    if not CORRECCION_AUTOMATICA:
+        return {"activo": False}
+    return {"activo": True, **obtener().estado()}
+
+
+def encolar(entrega_id: int, ejercicio_id: int, codigo: str) -> bool:
+    if not CORRECCION_AUTOMATICA:
+        return False
+    return obtener().encolar(entrega_id, ejercicio_id, codigo)
+
+
+def invalidar_casos(ejercicio_id: int):
+    if _corrector is not None:
+        _corrector.invalidar_casos(ejercicio_id)
+
+
+def parar():
+    global _corrector
+    if _corrector is not None:
+        _corrector.parar()
+        _corrector = None
@@ -0,0 +1,62 @@
+# backend/crear_esquema.py
+"""
+Crea o pone al día el esquema de la BD: tablas, columnas añadidas después
+(codigos.asegurar_esquema) e índices nuevos en tablas que ya existían.
+
+Se lanza en cada despliegue, antes de arrancar la API:
+
+    python crear_esquema.py
+    python crear_esquema.py --url sqlite:///otra.db
+
+main.py ya no lo hace al importarse (con Neon son varias idas y vueltas por
+tabla en cada arranque en frío). En local con SQLite sí lo hace en el
+arranque, salvo CREAR_ESQUEMA=0; ver arranque.py.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def crear(motor):
+    import models
+    import codigos
+
+    models.Base.metadata.create_all(bind=motor)
+    codigos.asegurar_esquema(motor)
+
+    # create_all no añade índices nuevos a tablas que ya existían
+    for tabla in models.Base.metadata.sorted_tables:
+        for indice in tabla.indexes:
+            indice.create(bind=motor, checkfirst=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="DATABASE_URL (por defecto la del .env)")
+    parser.add_argument("--sin-progreso", action="store_true",
+                        help="no rellenar la tabla de progreso si está vacía")
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ["DATABASE_URL"] = args.url
+
+    import database
+    import progreso
+
+    inicio = time.perf_counter()
+    crear(database.engine)
+    print(f"Esquema al día en {time.perf_counter() - inicio:.2f} s")
+
+    if not args.sin_progreso:
+        db = database.SessionLocal()
+        try:
+            progreso.recalcular_si_vacio(db)
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    main()
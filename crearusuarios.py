@@ -1,18 +1,22 @@
 from database import SessionLocal
 from models import Usuario
 from passlib.context import CryptContext
+import estadisticas
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-def crear_usuario(email, nombre, contraseña):
+def crear_usuario(email, nombre, contraseña, rol="alumno"):
     db = SessionLocal()
     try:
         usuario = Usuario(
             email=email,
             nombre=nombre,
-            hashed_password=pwd_context.hash(contraseña)
+            hashed_password=pwd_context.hash(contraseña),
+            rol=rol
         )
         db.add(usuario)
+        # Como los endpoints: los contadores del panel, en la misma transacción
+        estadisticas.sumar(db, usuarios=1, **estadisticas.delta_rol(rol))
         db.commit()
         print(f"Usuario '{nombre}' creado correctamente.")
     except Exception as e:
@@ -22,9 +26,10 @@ def crear_usuario(email, nombre, contraseña):
         db.close()
 
 
-# EJEMPLO: modifica estos datos según necesites
-crear_usuario(
-    email="profesor@webclases.com",
-    nombre="admin",
-    contraseña="admin"  
-)
+if __name__ == "__main__":
+    # EJEMPLO: modifica estos datos según necesites
+    crear_usuario(
+        email="profesor@webclases.com",
+        nombre="admin",
+        contraseña="admin"
+    )
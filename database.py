@@ -1,8 +1,14 @@
 # backend/database.py
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import threading
+import time
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from dotenv import load_dotenv
+import metricas
+import depuracion
 
 # Cargar variables de entorno (solo necesario en local)
 load_dotenv()
@@ -10,14 +16,311 @@ load_dotenv()
 # Leer DATABASE_URL desde variables de entorno
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-# Crear motor de PostgreSQL (Neon)
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,  # mantiene la conexión activa y evita fallos
-)
+# ------------------ Configuración del pool ------------------
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Neon cierra conexiones inactivas: se reciclan antes de que eso pase
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Estrategia de pre-ping:
+# - "siempre": SELECT 1 en cada checkout (lo que se hacía antes)
+# - "inactivas": solo si la conexión lleva más de DB_PRE_PING_INACTIVIDAD segundos sin usarse
+# - "nunca": sin ping, se confía en DB_POOL_RECYCLE
+DB_PRE_PING = os.getenv("DB_PRE_PING", "inactivas")
+DB_PRE_PING_INACTIVIDAD = float(os.getenv("DB_PRE_PING_INACTIVIDAD", "60"))
+
+ES_SQLITE = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+ES_SQLITE_MEMORIA = ES_SQLITE and make_url(DATABASE_URL).database in (None, "", ":memory:")
+
+
+# ------------------ Métricas del pool ------------------
+# Límites superiores (ms) del histograma de espera al pedir una conexión
+BUCKETS_ESPERA_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000]
+
+
+class MetricasPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.conexiones_creadas = 0
+        self.invalidadas = 0
+        self.timeouts = 0
+        self.pings = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.histograma = [0] * (len(BUCKETS_ESPERA_MS) + 1)
+
+    def registrar_espera(self, segundos: float):
+        ms = segundos * 1000
+        i = 0
+        while i < len(BUCKETS_ESPERA_MS) and ms > BUCKETS_ESPERA_MS[i]:
+            i += 1
+        with self._lock:
+            self.checkouts += 1
+            self.espera_total += segundos
+            self.espera_max = max(self.espera_max, segundos)
+            self.histograma[i] += 1
+
+    def sumar(self, campo: str):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def resumen(self) -> dict:
+        with self._lock:
+            etiquetas = [f"<={b}ms" for b in BUCKETS_ESPERA_MS] + [f">{BUCKETS_ESPERA_MS[-1]}ms"]
+            return {
+                "checkouts": self.checkouts,
+                "conexiones_creadas": self.conexiones_creadas,
+                "invalidadas": self.invalidadas,
+                "timeouts": self.timeouts,
+                "pings": self.pings,
+                "espera_media_ms": round(self.espera_total / self.checkouts * 1000, 3) if self.checkouts else 0,
+                "espera_max_ms": round(self.espera_max * 1000, 3),
+                "histograma_espera": dict(zip(etiquetas, self.histograma)),
+            }
+
+
+metricas_pool = MetricasPool()
+# Las del motor async (DB_ASYNC=1) van aparte: es otro pool con sus propias conexiones
+metricas_pool_async = MetricasPool()
+
+
+class _EsperaMedida:
+    """
+    Mide cuánto se espera por una conexión (incluye abrirla si hace falta).
+    """
+    metricas = metricas_pool
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.metricas.sumar("timeouts")
+            raise
+        finally:
+            self.metricas.registrar_espera(time.perf_counter() - inicio)
+
+
+class PoolMedido(_EsperaMedida, QueuePool):
+    pass
+
+
+class PoolMedidoAsync(_EsperaMedida, AsyncAdaptedQueuePool):
+    metricas = metricas_pool_async
+
+
+def _opciones_pool() -> dict:
+    opciones = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_PRE_PING == "siempre",
+    }
+    if ES_SQLITE:
+        # Varios hilos del threadpool comparten el pool de conexiones
+        opciones["connect_args"] = {"check_same_thread": False}
+    return opciones
+
+
+def _al_conectar(metricas_motor, dbapi_connection, connection_record):
+    metricas_motor.sumar("conexiones_creadas")
+    if ES_SQLITE:
+        # WAL: lectores y escritor no se bloquean entre sí
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.execute("PRAGMA cache_size=-20000")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+
+def _al_devolver(dbapi_connection, connection_record):
+    connection_record.info["devuelta"] = time.monotonic()
+
+
+def _al_sacar(metricas_motor, dbapi_connection, connection_record, connection_proxy):
+    if DB_PRE_PING != "inactivas":
+        return
+
+    devuelta = connection_record.info.get("devuelta")
+    if devuelta is None or time.monotonic() - devuelta < DB_PRE_PING_INACTIVIDAD:
+        return
+
+    metricas_motor.sumar("pings")
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("SELECT 1")
+    except Exception:
+        # El pool descarta esta conexión y reintenta con otra
+        raise exc.DisconnectionError()
+    finally:
+        cursor.close()
+
+
+def _al_invalidar(metricas_motor, dbapi_connection, connection_record, exception):
+    metricas_motor.sumar("invalidadas")
+
+
+def _antes_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    # Un solo valor: una conexión no ejecuta dos sentencias a la vez
+    conn.info["inicio_sentencia"] = time.perf_counter()
+
+
+def _despues_de_ejecutar(conn, cursor, statement, parameters, context, executemany):
+    # Sentencias y tiempo en BD del request actual (ver metricas.py)
+    inicio = conn.info.pop("inicio_sentencia", None)
+    if inicio is not None:
+        metricas.registrar_sentencia(time.perf_counter() - inicio)
+
+
+def _al_fallar(contexto):
+    # Si la sentencia lanza no hay after_cursor_execute: que no quede el inicio
+    if contexto.connection is not None:
+        contexto.connection.info.pop("inicio_sentencia", None)
+
+
+def _instrumentar(motor, metricas_motor=metricas_pool):
+    event.listen(motor, "connect", lambda c, r: _al_conectar(metricas_motor, c, r))
+    event.listen(motor, "checkin", _al_devolver)
+    event.listen(motor, "checkout", lambda c, r, p: _al_sacar(metricas_motor, c, r, p))
+    event.listen(motor, "invalidate", lambda c, r, e: _al_invalidar(metricas_motor, c, r, e))
+    event.listen(motor, "before_cursor_execute", _antes_de_ejecutar)
+    event.listen(motor, "after_cursor_execute", _despues_de_ejecutar)
+    event.listen(motor, "handle_error", _al_fallar)
+    if depuracion.SQL_DEBUG:
+        depuracion.instrumentar(motor)
+
+
+# ------------------ Motor (perezoso) ------------------
+# El motor se crea al primer uso y no al importar: importar main.py no carga
+# el driver ni toca la BD, y el proceso puede contestar a /api/ping enseguida.
+_engine = None
+_lock_motor = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _lock_motor:
+            if _engine is None:
+                # PostgreSQL (Neon) o SQLite en local
+                if ES_SQLITE_MEMORIA:
+                    # Una BD en memoria no se puede repartir entre varias conexiones de un pool
+                    motor = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+                else:
+                    motor = create_engine(DATABASE_URL, poolclass=PoolMedido, **_opciones_pool())
+                _instrumentar(motor)
+                _engine = motor
+    return _engine
+
+
+def __getattr__(nombre):
+    # database.engine y `from database import engine` siguen funcionando
+    if nombre == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+
+def _resumen_pool(pool, metricas_motor: MetricasPool) -> dict:
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__, **metricas_motor.resumen()}
+    return {
+        "tamano": pool.size(),
+        "en_uso": pool.checkedout(),
+        "libres": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pre_ping": DB_PRE_PING,
+        **metricas_motor.resumen(),
+    }
+
+
+def estadisticas_pool() -> dict:
+    """
+    Pool del motor sync y, si ya se ha creado (DB_ASYNC=1), el del async en "async".
+    """
+    resumen = _resumen_pool(get_engine().pool, metricas_pool)
+    if _async_engine is not None:
+        resumen["async"] = _resumen_pool(_async_engine.sync_engine.pool, metricas_pool_async)
+    return resumen
+
+
+class _SesionPerezosa(Session):
+    # Sin bind explícito, la sesión usa el motor (y lo crea si aún no existe)
+    def __init__(self, bind=None, **kwargs):
+        super().__init__(bind=bind if bind is not None else get_engine(), **kwargs)
+
 
 # Crear sesión
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=_SesionPerezosa, autocommit=False, autoflush=False)
 
 # Base para los modelos
 Base = declarative_base()
+
+
+# ------------------ Modo async (opcional) ------------------
+# Con DB_ASYNC=1 los endpoints calientes (login, catálogo, entregas) usan
+# AsyncSession: un worker puede tener cientos de requests esperando a la BD
+# sin ocupar un hilo por cada una. Requiere asyncpg (Postgres) o aiosqlite (local).
+DB_ASYNC = os.getenv("DB_ASYNC", "0") == "1"
+
+_async_engine = None
+_AsyncSessionLocal = None
+
+
+def async_url(url: str):
+    """
+    Traduce DATABASE_URL al driver async equivalente.
+    asyncpg no entiende sslmode/channel_binding en la URL: el SSL va en connect_args.
+    """
+    url = make_url(url)
+    connect_args = {}
+
+    if url.drivername in ("postgresql", "postgresql+psycopg2", "postgres"):
+        query = dict(url.query)
+        sslmode = query.pop("sslmode", None)
+        query.pop("channel_binding", None)
+        if sslmode and sslmode != "disable":
+            connect_args["ssl"] = "require"
+        url = url.set(drivername="postgresql+asyncpg", query=query)
+    elif url.drivername in ("sqlite", "sqlite+pysqlite"):
+        url = url.set(drivername="sqlite+aiosqlite")
+
+    return url, connect_args
+
+
+def get_async_sessionmaker():
+    # Se crea al primer uso, así el modo sync no necesita los drivers async
+    global _async_engine, _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        url = os.getenv("ASYNC_DATABASE_URL")
+        connect_args = {}
+        if not url:
+            url, connect_args = async_url(DATABASE_URL)
+
+        if ES_SQLITE_MEMORIA:
+            opciones = {}
+        else:
+            # aiosqlite usa NullPool por defecto; se fuerza el mismo pool configurable
+            opciones = {"poolclass": PoolMedidoAsync, **_opciones_pool()}
+        opciones["connect_args"] = connect_args
+        _async_engine = create_async_engine(url, **opciones)
+        _instrumentar(_async_engine.sync_engine, metricas_pool_async)
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine, autoflush=False, expire_on_commit=False
+        )
+    return _AsyncSessionLocal
+
+
+async def dispose_async_engine():
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
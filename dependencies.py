@@ -1,22 +1,31 @@
 # dependencies.py
 from fastapi import Depends, HTTPException
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import Usuario
-from database import SessionLocal
-from passlib.context import CryptContext
+from database import SessionLocal, get_async_sessionmaker
 import os
 from jose import jwt, JWTError
 from fastapi.security import OAuth2PasswordBearer
 from datetime import datetime, timedelta
+from dataclasses import dataclass
+import time
+from cache import CacheTTL
+import hashing
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
 
+# Caché de autenticación: tokens ya decodificados y usuarios ya resueltos
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_MAX = int(os.getenv("AUTH_CACHE_MAX", "1024"))
+
+tokens_cache = CacheTTL(maxsize=AUTH_CACHE_MAX, ttl=AUTH_CACHE_TTL)
+principales_cache = CacheTTL(maxsize=AUTH_CACHE_MAX, ttl=AUTH_CACHE_TTL)
+
 
 # --- DB session ---
 def get_db():
@@ -27,14 +36,20 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    # Solo en modo DB_ASYNC (ver database.py)
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
 # --- Password utils ---
+# Versiones síncronas; los endpoints usan las async de hashing (pool acotado)
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing.verify_password(plain_password, hashed_password)
 
 
 def get_password_hash(password):
-    password = password[:72]
-    return pwd_context.hash(password)
+    return hashing.hash_password(password)
 
 
 # --- JWT token ---
@@ -47,33 +62,104 @@ def create_access_token(data: dict):
 
 # --- Auth ---
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
-    credentials_exception = HTTPException(
+@dataclass(frozen=True)
+class Principal:
+    """
+    Usuario autenticado, desacoplado de la sesión de BD para poder cachearlo.
+    """
+    id: int
+    nombre: str
+    email: str
+    rol: str
+
+
+def invalidar_usuario(usuario_id: int):
+    """
+    Olvida el usuario cacheado. Llamar tras borrarlo, cambiarle el rol o la contraseña.
+    """
+    principales_cache.delete(int(usuario_id))
+
+
+def estadisticas_auth_cache() -> dict:
+    return {
+        "tokens": tokens_cache.stats(),
+        "principales": principales_cache.stats(),
+    }
+
+
+def _credentials_exception():
+    return HTTPException(
         status_code=401,
         detail="Token inválido o expirado",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def _user_id_desde_token(token: str) -> int:
+    user_id = tokens_cache.get(token)
+    if user_id is not None:
+        return user_id
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+
+    user_id = int(user_id)
+    # el token no puede seguir en caché más allá de su expiración
+    restante = payload.get("exp", 0) - time.time()
+    if restante > 0:
+        tokens_cache.set(token, user_id, ttl=restante)
+    return user_id
+
+
+def _cachear_principal(usuario: Usuario) -> Principal:
+    principal = Principal(
+        id=usuario.id,
+        nombre=usuario.nombre,
+        email=usuario.email,
+        rol=usuario.rol,
+    )
+    principales_cache.set(usuario.id, principal)
+    return principal
 
-    usuario = db.query(Usuario).filter(Usuario.id == int(user_id)).first()
-    if usuario is None:
-        raise credentials_exception
 
-    return usuario
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+):
+    user_id = _user_id_desde_token(token)
+
+    # La sesión solo abre conexión si hay que consultar: un hit no toca la BD
+    principal = principales_cache.get(user_id)
+    if principal is None:
+        usuario = db.query(Usuario).filter(Usuario.id == user_id).first()
+        if usuario is None:
+            raise _credentials_exception()
+        principal = _cachear_principal(usuario)
+
+    return principal
 
-def require_admin(usuario: Usuario = Depends(get_current_user)):
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+):
+    user_id = _user_id_desde_token(token)
+
+    principal = principales_cache.get(user_id)
+    if principal is None:
+        usuario = await db.get(Usuario, user_id)
+        if usuario is None:
+            raise _credentials_exception()
+        principal = _cachear_principal(usuario)
+
+    return principal
+
+def require_admin(usuario: Principal = Depends(get_current_user)):
     if usuario.rol != "admin":
         raise HTTPException(status_code=403, detail="No autorizado")
     return usuario
-
-
@@ -0,0 +1,188 @@
+# backend/depuracion.py
+"""
+Detector de N+1 y de consultas lentas para desarrollo (SQL_DEBUG=1).
+
+Vigila las sentencias SQL de cada request con los eventos del engine:
+- Si la misma forma de sentencia (mismo SQL, con las listas IN y los literales
+  numéricos colapsados) se ejecuta más de SQL_DEBUG_REPETICIONES veces en un
+  request, avisa con el endpoint y la sentencia: es el patrón de un N+1.
+- Si una SELECT tarda más de SQL_DEBUG_LENTO_MS, guarda su EXPLAIN y lo saca por el log.
+- Con SQL_DEBUG_ESTRICTO=1 cada violación lanza ViolacionSQL en lugar de avisar,
+  así que un TestClient (que relanza las excepciones del servidor) falla.
+
+Desde un test también se puede usar sin variables de entorno:
+
+    with depuracion.vigilar(repeticiones=3, estricto=True):
+        client.get("/api/admin/entregas", headers=...)
+"""
+import contextvars
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from sqlalchemy import event
+
+SQL_DEBUG = os.getenv("SQL_DEBUG", "0") == "1"
+SQL_DEBUG_REPETICIONES = int(os.getenv("SQL_DEBUG_REPETICIONES", "5"))
+SQL_DEBUG_LENTO_MS = float(os.getenv("SQL_DEBUG_LENTO_MS", "100"))
+SQL_DEBUG_ESTRICTO = os.getenv("SQL_DEBUG_ESTRICTO", "0") == "1"
+
+logger = logging.getLogger("depuracion")
+
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|\$\d+|:\w+|-?\d+(?:\.\d+)?)"
+_LISTA_IN = re.compile(r"\(\s*" + _PLACEHOLDER + r"(?:\s*,\s*" + _PLACEHOLDER + r")+\s*\)")
+_NUMERO = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?\b")
+_ESPACIOS = re.compile(r"\s+")
+
+
+class ViolacionSQL(AssertionError):
+    pass
+
+
+def forma(sentencia: str) -> str:
+    """
+    Normaliza una sentencia para agrupar las que solo cambian en los valores.
+    """
+    sentencia = _ESPACIOS.sub(" ", sentencia).strip()
+    sentencia = _LISTA_IN.sub("(?)", sentencia)
+    return _NUMERO.sub("?", sentencia)
+
+
+class Vigilancia:
+    def __init__(self, repeticiones: int, lento_ms: float, estricto: bool, scope: dict = None):
+        self.repeticiones = repeticiones
+        self.lento_ms = lento_ms
+        self.estricto = estricto
+        self.scope = scope
+        self.formas = Counter()
+        self.violaciones = []
+
+    def origen(self) -> str:
+        if self.scope is None:
+            return "fuera de request"
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {getattr(route, 'path', None) or self.scope['path']}"
+
+    def _violacion(self, mensaje: str, **datos):
+        self.violaciones.append({"mensaje": mensaje, **datos})
+        if self.estricto:
+            raise ViolacionSQL(mensaje)
+        logger.warning(mensaje)
+
+    def registrar(self, cursor, sentencia: str, parametros, executemany: bool, dialecto: str, segundos: float):
+        f = forma(sentencia)
+        self.formas[f] += 1
+        if self.formas[f] == self.repeticiones + 1:
+            self._violacion(
+                f"Posible N+1 en {self.origen()}: más de {self.repeticiones} ejecuciones de: {f}",
+                tipo="n+1", sentencia=f,
+            )
+
+        ms = segundos * 1000
+        if ms >= self.lento_ms and not executemany and f.upper().startswith(("SELECT", "WITH")):
+            plan = _explain(cursor, sentencia, parametros, dialecto)
+            self._violacion(
+                f"Consulta lenta en {self.origen()} ({ms:.0f} ms): {f}\n{plan}",
+                tipo="lenta", sentencia=f, ms=ms, plan=plan,
+            )
+
+    def resumen(self):
+        # Al acabar el request: cuántas veces se repitió al final cada forma sospechosa
+        for f, veces in self.formas.items():
+            if veces > self.repeticiones:
+                logger.warning("N+1 en %s: %d ejecuciones de: %s", self.origen(), veces, f)
+
+
+_vigilancia = contextvars.ContextVar("vigilancia_sql", default=None)
+
+
+def _explain(cursor, sentencia: str, parametros, dialecto: str) -> str:
+    prefijo = "EXPLAIN QUERY PLAN " if dialecto == "sqlite" else "EXPLAIN "
+    try:
+        c = cursor.connection.cursor()
+        try:
+            c.execute(prefijo + sentencia, parametros)
+            return "\n".join(" | ".join(str(v) for v in fila) for fila in c.fetchall())
+        finally:
+            c.close()
+    except Exception as e:
+        return f"(no se pudo obtener el EXPLAIN: {e})"
+
+
+# =========================================================
+# Eventos del engine
+# =========================================================
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    if _vigilancia.get() is not None:
+        conn.info["depuracion_inicio"] = time.perf_counter()
+
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    vigilancia = _vigilancia.get()
+    # Un solo valor, como en database.py: si la sentencia lanza no queda nada colgando
+    inicio = conn.info.pop("depuracion_inicio", None)
+    if vigilancia is None or inicio is None:
+        return
+    segundos = time.perf_counter() - inicio
+    vigilancia.registrar(cursor, statement, parameters, executemany, conn.dialect.name, segundos)
+
+
+def instrumentar(motor):
+    if not event.contains(motor, "after_cursor_execute", _despues):
+        event.listen(motor, "before_cursor_execute", _antes)
+        event.listen(motor, "after_cursor_execute", _despues)
+
+
+@contextmanager
+def vigilar(repeticiones: int = None, lento_ms: float = None, estricto: bool = True):
+    """
+    Vigila las sentencias del bloque (para tests). Con estricto, cualquier
+    violación lanza ViolacionSQL.
+    """
+    import database
+    instrumentar(database.engine)
+
+    vigilancia = Vigilancia(
+        SQL_DEBUG_REPETICIONES if repeticiones is None else repeticiones,
+        SQL_DEBUG_LENTO_MS if lento_ms is None else lento_ms,
+        estricto,
+    )
+    token = _vigilancia.set(vigilancia)
+    try:
+        yield vigilancia
+    finally:
+        _vigilancia.reset(token)
+
+
+# =========================================================
+# Middleware ASGI
+# =========================================================
+
+class DepuracionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        existente = _vigilancia.get()
+        if existente is not None:
+            # Dentro de vigilar() manda la vigilancia del test: se le dice qué endpoint es
+            # y las repeticiones se cuentan por request
+            existente.scope = scope
+            existente.formas = Counter()
+            await self.app(scope, receive, send)
+            return
+
+        vigilancia = Vigilancia(SQL_DEBUG_REPETICIONES, SQL_DEBUG_LENTO_MS, SQL_DEBUG_ESTRICTO, scope)
+        token = _vigilancia.set(vigilancia)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _vigilancia.reset(token)
+            vigilancia.resumen()
@@ -0,0 +1,98 @@
+# backend/estadisticas.py
+import os
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+import models
+
+# Con ESTADISTICAS_CONTADORES=1 los totales se leen de la tabla `contadores`,
+# que los endpoints de escritura mantienen al día dentro de su misma transacción.
+CONTADORES_ACTIVOS = os.getenv("ESTADISTICAS_CONTADORES", "0") == "1"
+
+CLAVES = ["usuarios", "admins", "alumnos", "categorias", "ejercicios", "entregas"]
+
+
+# =========================================================
+# Agregado en una sola query
+# =========================================================
+
+def contar_totales(db: Session) -> dict:
+    """
+    Todos los totales del panel en un único round-trip:
+    conteos condicionales sobre usuarios + subconsultas escalares para el resto.
+    """
+    usuarios = select(
+        func.count().label("usuarios"),
+        func.count(case((models.Usuario.rol == "admin", 1))).label("admins"),
+        func.count(case((models.Usuario.rol == "alumno", 1))).label("alumnos"),
+    ).subquery()
+
+    fila = db.query(
+        usuarios.c.usuarios,
+        usuarios.c.admins,
+        usuarios.c.alumnos,
+        select(func.count()).select_from(models.Categoria).scalar_subquery().label("categorias"),
+        select(func.count()).select_from(models.Ejercicio).scalar_subquery().label("ejercicios"),
+        select(func.count()).select_from(models.Entrega).scalar_subquery().label("entregas"),
+    ).one()
+
+    return dict(fila._mapping)
+
+
+# =========================================================
+# Contadores materializados
+# =========================================================
+
+def sumar(db: Session, **deltas):
+    """
+    Suma los deltas a los contadores (p.ej. sumar(db, usuarios=1, alumnos=1)).
+    Se ejecuta antes del commit del endpoint, así va en la misma transacción.
+    No hace nada si los contadores están desactivados.
+    """
+    if not CONTADORES_ACTIVOS:
+        return
+
+    for nombre, delta in deltas.items():
+        if delta:
+            db.query(models.Contador)\
+                .filter(models.Contador.nombre == nombre)\
+                .update({models.Contador.valor: models.Contador.valor + delta}, synchronize_session=False)
+
+
+def delta_rol(rol: str, signo: int = 1) -> dict:
+    """
+    Delta de admins/alumnos para un usuario con ese rol.
+    """
+    if rol == "admin":
+        return {"admins": signo}
+    if rol == "alumno":
+        return {"alumnos": signo}
+    return {}
+
+
+def recalcular(db: Session) -> dict:
+    """
+    Rehace los contadores desde las tablas reales (arranque, seed.py o reparación).
+    """
+    totales = contar_totales(db)
+
+    existentes = {c.nombre: c for c in db.query(models.Contador).all()}
+    for nombre in CLAVES:
+        contador = existentes.get(nombre)
+        if contador is None:
+            db.add(models.Contador(nombre=nombre, valor=totales[nombre]))
+        else:
+            contador.valor = totales[nombre]
+
+    db.commit()
+    return totales
+
+
+def leer_totales(db: Session) -> dict:
+    if not CONTADORES_ACTIVOS:
+        return contar_totales(db)
+
+    totales = {c.nombre: c.valor for c in db.query(models.Contador.nombre, models.Contador.valor)}
+    if any(nombre not in totales for nombre in CLAVES):
+        return recalcular(db)
+
+    return {nombre: totales[nombre] for nombre in CLAVES}
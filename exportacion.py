@@ -0,0 +1,94 @@
+# backend/exportacion.py
+import csv
+import io
+import json
+import zlib
+from itertools import islice
+import models
+import codigos
+from consultas import consulta_entregas, filtrar_entregas
+from database import SessionLocal
+
+# Filas que trae el cursor de servidor en cada viaje
+EXPORTAR_YIELD_PER = 1000
+
+# Tamaño aproximado de cada trozo enviado al cliente
+EXPORTAR_TROZO = 64 * 1024
+
+COLUMNAS = ["id", "usuario", "ejercicio", "categoria_id", "fecha_envio", "resultado", "codigo"]
+
+
+def _fila(f, codigo: str) -> dict:
+    return {
+        "id": f.id,
+        "usuario": f.usuario,
+        "ejercicio": f.ejercicio,
+        "categoria_id": f.categoria_id,
+        "fecha_envio": f.fecha_envio.isoformat() if f.fecha_envio else None,
+        "resultado": f.resultado,
+        "codigo": codigo,
+    }
+
+
+def _con_codigo(db, filas):
+    # Los blobs se leen por bloques del tamaño del cursor, no fila a fila
+    filas = iter(filas)
+    while True:
+        bloque = list(islice(filas, EXPORTAR_YIELD_PER))
+        if not bloque:
+            return
+        yield from zip(bloque, codigos.resolver(db, bloque))
+
+
+def _lineas(formato: str, filas):
+    if formato == "csv":
+        buffer = io.StringIO()
+        escritor = csv.DictWriter(buffer, fieldnames=COLUMNAS)
+        escritor.writeheader()
+        for f, codigo in filas:
+            escritor.writerow(_fila(f, codigo))
+            if buffer.tell() >= EXPORTAR_TROZO:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        trozo = []
+        tamano = 0
+        for f, codigo in filas:
+            linea = json.dumps(_fila(f, codigo), ensure_ascii=False) + "\n"
+            trozo.append(linea)
+            tamano += len(linea)
+            if tamano >= EXPORTAR_TROZO:
+                yield "".join(trozo)
+                trozo, tamano = [], 0
+        yield "".join(trozo)
+
+
+def generar(formato: str, comprimir: bool, filtros: tuple):
+    """
+    Generador para StreamingResponse. Abre su propia sesión porque la de
+    get_db se cierra antes de que empiece a enviarse el cuerpo, y recorre
+    las entregas con un cursor de servidor (yield_per): la memoria no depende
+    de cuántas filas se exporten.
+    """
+    db = SessionLocal()
+    try:
+        q = filtrar_entregas(consulta_entregas(db, detalle=True), *filtros)\
+            .order_by(models.Entrega.id)\
+            .yield_per(EXPORTAR_YIELD_PER)
+
+        # wbits=31: formato gzip (cabecera + CRC), se puede abrir con gunzip
+        compresor = zlib.compressobj(6, zlib.DEFLATED, 31) if comprimir else None
+
+        for texto in _lineas(formato, _con_codigo(db, q)):
+            datos = texto.encode("utf-8")
+            if compresor:
+                datos = compresor.compress(datos)
+            if datos:
+                yield datos
+
+        if compresor:
+            yield compresor.flush()
+    finally:
+        db.close()
@@ -0,0 +1,211 @@
+# backend/generar_datos.py
+"""
+Genera un dataset sintético para pruebas de carga: usuarios, categorías,
+ejercicios y entregas con tamaños de código realistas.
+
+    python generar_datos.py --url sqlite:///carga.db --usuarios 2000 --entregas 200000
+    python generar_datos.py --url sqlite:///carga.db --semilla 7
+
+--url es obligatorio (nunca se usa la DATABASE_URL del .env) y solo se
+escribe en una BD SQLite vacía; para otra cosa hace falta --forzar.
+
+Todos los usuarios comparten una contraseña (se hashea una sola vez): la de
+--password o una aleatoria que se muestra al acabar. Los nombres son
+alumno0..alumnoN y hay un admin "admin_carga".
+Con la misma semilla se genera siempre el mismo dataset.
+"""
+import argparse
+import json
+import os
+import random
+import secrets
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN = "admin_carga"
+LOTE = 5000
+EJERCICIOS_JSON = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exercices.json")
+
+DIFICULTADES = ["fácil", "medio", "difícil"]
+SUBCATEGORIAS = [None, "for", "while", "ambos"]
+RESULTADOS = [None, None, "revisado", "correcto", "incorrecto"]
+
+# Trozos de código Python con los que se montan soluciones y entregas
+_LINEAS = [
+    "n = int(input('Introdueix un número: '))",
+    "for i in range(n):",
+    "    print(i * i)",
+    "while n > 0:",
+    "    n -= 1",
+    "if n % 2 == 0:",
+    "    print('parell')",
+    "else:",
+    "    print('senar')",
+    "def suma(llista):",
+    "    total = 0",
+    "    for x in llista:",
+    "        total += x",
+    "    return total",
+    "numeros = [int(x) for x in input().split()]",
+    "print(suma(numeros))",
+    "class Rectangle:",
+    "    def __init__(self, base, altura):",
+    "        self.base = base",
+    "        self.altura = altura",
+    "    def area(self):",
+    "        return self.base * self.altura",
+    "# comprovem el resultat",
+    "resultat = sorted(numeros, reverse=True)",
+    "print(f'El màxim és {max(numeros)}')",
+]
+
+
+def _vocabulario(archivo: str) -> list:
+    # Palabras reales de los enunciados, para que el buscador y la compresión se parezcan a producción
+    try:
+        with open(archivo, encoding="utf-8") as f:
+            datos = json.load(f)
+        palabras = " ".join(e.get("enunciado") or "" for e in datos).split()
+        if palabras:
+            return palabras
+    except OSError:
+        pass
+    return "Escriu un programa que demani un número i mostri el resultat per pantalla".split()
+
+
+def codigo(rnd: random.Random) -> str:
+    """
+    Código de tamaño log-normal: mediana ~500 caracteres, cola larga hasta ~8 KB.
+    """
+    objetivo = min(8000, max(40, int(rnd.lognormvariate(6.2, 0.8))))
+    lineas = []
+    tamano = 0
+    while tamano < objetivo:
+        linea = rnd.choice(_LINEAS)
+        lineas.append(linea)
+        tamano += len(linea) + 1
+    return "\n".join(lineas)
+
+
+def generar(db, usuarios: int, categorias: int, ejercicios: int, entregas: int, password: str,
+            semilla: int = 1, archivo: str = EJERCICIOS_JSON) -> dict:
+    from sqlalchemy import insert
+    import models
+    import hashing
+    import estadisticas
+    import codigos
+    import progreso
+
+    rnd = random.Random(semilla)
+    palabras = _vocabulario(archivo)
+    hashed = hashing.hash_password(password)
+
+    filas = [{"email": f"{ADMIN}@carga", "nombre": ADMIN, "hashed_password": hashed, "rol": "admin"}]
+    filas += [
+        {"email": f"alumno{i}@carga", "nombre": f"alumno{i}", "hashed_password": hashed, "rol": "alumno"}
+        for i in range(usuarios)
+    ]
+    # Ids en el orden de las filas (el admin es el primero) también en inserts por lotes
+    ids_usuarios = db.execute(
+        insert(models.Usuario).returning(models.Usuario.id, sort_by_parameter_order=True), filas
+    ).scalars().all()
+
+    ids_categorias = db.execute(
+        insert(models.Categoria).returning(models.Categoria.id, sort_by_parameter_order=True),
+        [{"nombre": f"Categoria {i}"} for i in range(categorias)]
+    ).scalars().all()
+
+    ids_ejercicios = []
+    for desde in range(0, ejercicios, LOTE):
+        ids_ejercicios += db.execute(
+            insert(models.Ejercicio).returning(models.Ejercicio.id, sort_by_parameter_order=True),
+            [
+                {
+                    "titulo": " ".join(rnd.choices(palabras, k=rnd.randint(2, 6))).capitalize(),
+                    "enunciado": " ".join(rnd.choices(palabras, k=rnd.randint(20, 150))),
+                    "solucion": codigo(rnd),
+                    "dificultad": rnd.choice(DIFICULTADES),
+                    "lenguaje": "Python",
+                    "categoria_id": rnd.choice(ids_categorias),
+                    "subcategoria": rnd.choice(SUBCATEGORIAS),
+                }
+                for _ in range(desde, min(desde + LOTE, ejercicios))
+            ]
+        ).scalars().all()
+
+    # Entregas repartidas en un curso (~9 meses); el 5% de alumnos más activos hace 1 de cada 5
+    ids_alumnos = ids_usuarios[1:] or ids_usuarios
+    activos = ids_alumnos[:max(1, len(ids_alumnos) // 20)]
+    inicio = datetime(2025, 9, 1)
+    segundos_curso = 270 * 24 * 3600
+    for desde in range(0, entregas, LOTE):
+        n = min(desde + LOTE, entregas) - desde
+        hashes = codigos.guardar_muchos(db, [codigo(rnd) for _ in range(n)])
+        db.execute(insert(models.Entrega), [
+            {
+                "usuario_id": rnd.choice(activos) if rnd.random() < 0.2 else rnd.choice(ids_alumnos),
+                "ejercicio_id": rnd.choice(ids_ejercicios),
+                "codigo_hash": h,
+                "fecha_envio": inicio + timedelta(seconds=rnd.randrange(segundos_curso)),
+                "resultado": rnd.choice(RESULTADOS),
+            }
+            for h in hashes
+        ])
+
+    progreso.recalcular(db)
+    # recalcular hace el commit de todo lo anterior
+    estadisticas.recalcular(db)
+
+    return {
+        "usuarios": len(ids_usuarios),
+        "categorias": len(ids_categorias),
+        "ejercicios": len(ids_ejercicios),
+        "entregas": entregas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", required=True, help="DATABASE_URL de la BD de pruebas (p.ej. sqlite:///carga.db)")
+    parser.add_argument("--forzar", action="store_true",
+                        help="escribir aunque la BD no sea SQLite o ya tenga usuarios")
+    parser.add_argument("--password", default=None, help="contraseña de todos los usuarios (por defecto aleatoria)")
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--categorias", type=int, default=12)
+    parser.add_argument("--ejercicios", type=int, default=1000)
+    parser.add_argument("--entregas", type=int, default=100000)
+    parser.add_argument("--semilla", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.url
+
+    import database
+    import models
+    from crear_esquema import crear
+
+    if not database.ES_SQLITE and not args.forzar:
+        parser.error("solo se genera en SQLite; para otra BD añade --forzar (¡nunca la de producción!)")
+
+    crear(database.engine)
+    db = database.SessionLocal()
+    try:
+        if db.query(models.Usuario.id).first() is not None and not args.forzar:
+            parser.error("la BD ya tiene usuarios; usa una vacía o añade --forzar")
+        password = args.password or secrets.token_urlsafe(12)
+        informe = generar(db, args.usuarios, args.categorias, args.ejercicios, args.entregas,
+                          password, args.semilla)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    print(f"Generados: {informe}")
+    if args.password is None:
+        print(f"Contraseña de todos los usuarios (admin: {ADMIN}): {password}")
+
+
+if __name__ == "__main__":
+    main()
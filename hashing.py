@@ -0,0 +1,108 @@
+# backend/hashing.py
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+# =========================================================
+# Configuración
+# =========================================================
+
+# Coste de bcrypt. Si cambia, los hashes antiguos se rehacen al hacer login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# "thread" (por defecto) o "process" para repartir bcrypt entre núcleos sin el GIL
+HASH_POOL_MODE = os.getenv("HASH_POOL_MODE", "thread")
+HASH_POOL_WORKERS = int(os.getenv("HASH_POOL_WORKERS", str(os.cpu_count() or 2)))
+
+# Máximo de operaciones en cola o en curso; por encima se responde 503
+HASH_POOL_MAX_PENDIENTES = int(os.getenv("HASH_POOL_MAX_PENDIENTES", "64"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+# =========================================================
+# Funciones que corren dentro del pool (deben ser picklables)
+# =========================================================
+
+def hash_password(password: str) -> str:
+    password = password[:72]
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str):
+    """
+    Devuelve (valido, nuevo_hash). nuevo_hash solo viene informado
+    si la contraseña es válida y el hash usa un coste distinto al configurado.
+    """
+    return pwd_context.verify_and_update(plain_password[:72], hashed_password)
+
+
+# =========================================================
+# Pool acotado
+# =========================================================
+
+_executor = None
+_executor_lock = threading.Lock()
+_pendientes = threading.BoundedSemaphore(HASH_POOL_MAX_PENDIENTES)
+
+
+def _get_executor():
+    # Se crea al primer uso: el pool de procesos no debe arrancar al importar
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if HASH_POOL_MODE == "process":
+                    _executor = ProcessPoolExecutor(max_workers=HASH_POOL_WORKERS)
+                else:
+                    _executor = ThreadPoolExecutor(
+                        max_workers=HASH_POOL_WORKERS,
+                        thread_name_prefix="bcrypt",
+                    )
+    return _executor
+
+
+async def _ejecutar(funcion, *args):
+    if not _pendientes.acquire(blocking=False):
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado, inténtalo de nuevo en unos segundos",
+            headers={"Retry-After": "1"},
+        )
+
+    try:
+        futuro = _get_executor().submit(funcion, *args)
+    except BaseException:
+        _pendientes.release()
+        raise
+
+    futuro.add_done_callback(lambda _: _pendientes.release())
+    return await asyncio.wrap_future(futuro)
+
+
+async def hash_password_async(password: str) -> str:
+    return await _ejecutar(hash_password, password)
+
+
+async def verify_and_update_async(plain_password: str, hashed_password: str):
+    return await _ejecutar(verify_and_update, plain_password, hashed_password)
+
+
+def apagar():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,478 @@
+# backend/ingesta.py
+"""
+Ingesta diferida de entregas (INGESTA_DIFERIDA=1).
+
+POST /api/entregas valida, apunta la entrega en un spool local (append-only,
+con fsync) y la encola; responde 202 con un ticket. Un hilo escritor la
+inserta junto con las demás de la cola en un único INSERT multi-fila, cuando
+se llena el lote (INGESTA_LOTE_MAX) o vence la latencia máxima
+(INGESTA_LATENCIA_MAX_MS).
+
+Durabilidad: cada lote guarda en la misma transacción el último número de
+secuencia aplicado (fila `ingesta:<spool>` de la tabla contadores). Al
+arrancar se reaplican los spools huérfanos (de procesos que murieron) saltando
+lo que ya estaba confirmado, así que ninguna entrega se pierde ni se duplica.
+Cada worker de uvicorn tiene su propio spool, bloqueado con flock mientras vive.
+
+Errores: los transitorios de la BD (conexión caída, timeout del pool) se
+reintentan sin límite; mientras tanto la cola se llena y se responde 503.
+Cualquier otro error en un lote se reintenta fila a fila y las filas que
+siguen fallando se apartan en INGESTA_SPOOL_DIR/descartadas.ndjson (con el
+error), para que una entrega mala no bloquee al escritor.
+
+Tickets: "<spool>.<aleatorio>". El lote apunta cada ticket en tickets_entrega
+en su misma transacción, así que el estado se lee de la BD desde cualquier
+worker. Un ticket que aún no está ahí sigue pendiente mientras exista su spool
+(el worker que lo aceptó está vivo o el spool espera a reaplicarse).
+"""
+import fcntl
+import glob
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, OperationalError, TimeoutError as PoolTimeoutError
+import models
+import estadisticas
+import corrector
+import codigos
+import progreso
+from database import SessionLocal
+
+INGESTA_DIFERIDA = os.getenv("INGESTA_DIFERIDA", "0") == "1"
+INGESTA_LOTE_MAX = int(os.getenv("INGESTA_LOTE_MAX", "200"))
+INGESTA_LATENCIA_MAX_MS = float(os.getenv("INGESTA_LATENCIA_MAX_MS", "200"))
+INGESTA_COLA_MAX = int(os.getenv("INGESTA_COLA_MAX", "5000"))
+INGESTA_SPOOL_DIR = os.getenv("INGESTA_SPOOL_DIR", "./spool")
+INGESTA_FSYNC = os.getenv("INGESTA_FSYNC", "1") == "1"
+# Espera máxima al escritor al parar; lo que no se guarde se reaplica al arrancar
+INGESTA_PARAR_TIMEOUT_S = float(os.getenv("INGESTA_PARAR_TIMEOUT_S", "30"))
+
+logger = logging.getLogger("ingesta")
+
+_lock_descartadas = threading.Lock()
+
+_FORMATO_TICKET = re.compile(r"^([0-9a-f]{32})\.[0-9a-f]{32}$")
+
+
+# =========================================================
+# Spool en disco
+# =========================================================
+
+def _bloquear(f) -> bool:
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _leer_spool(f) -> list:
+    f.seek(0)
+    registros = []
+    for linea in f:
+        try:
+            registros.append(json.loads(linea))
+        except ValueError:
+            # última línea a medio escribir si el proceso murió justo ahí
+            break
+    return registros
+
+
+def _ruta_spool(spool: str) -> str:
+    return os.path.join(INGESTA_SPOOL_DIR, f"entregas-{spool}.spool")
+
+
+def _clave_checkpoint(ruta: str) -> str:
+    return "ingesta:" + os.path.basename(ruta)
+
+
+def _leer_checkpoint(db, clave: str) -> int:
+    c = db.query(models.Contador).filter(models.Contador.nombre == clave).first()
+    return c.valor if c else 0
+
+
+def _guardar_checkpoint(db, clave: str, seq: int):
+    c = db.query(models.Contador).filter(models.Contador.nombre == clave).first()
+    if c is None:
+        db.add(models.Contador(nombre=clave, valor=seq))
+    else:
+        c.valor = seq
+
+
+def _borrar_checkpoint(db, clave: str):
+    db.query(models.Contador).filter(models.Contador.nombre == clave).delete()
+    db.commit()
+
+
+def _apuntar_tickets(db, registros: list, ids: list):
+    db.execute(insert(models.TicketEntrega), [
+        {"ticket": r["ticket"], "entrega_id": entrega_id} for r, entrega_id in zip(registros, ids)
+    ])
+
+
+def _transitorio(e: Exception) -> bool:
+    # La BD no está (o se ha caído la conexión): reintentar más tarde el lote entero
+    if isinstance(e, (OperationalError, PoolTimeoutError)):
+        return True
+    return isinstance(e, DBAPIError) and e.connection_invalidated
+
+
+def _insertar_filas(db, registros: list) -> list:
+    """
+    Un único INSERT multi-fila; devuelve las filas insertadas con su "id".
+    """
+    hashes = codigos.guardar_muchos(db, [r["codigo"] for r in registros])
+    filas = [
+        {
+            "usuario_id": r["usuario_id"],
+            "ejercicio_id": r["ejercicio_id"],
+            "codigo_hash": h,
+            "fecha_envio": datetime.fromisoformat(r["fecha_envio"]),
+        }
+        for r, h in zip(registros, hashes)
+    ]
+    stmt = insert(models.Entrega).returning(models.Entrega.id, sort_by_parameter_order=True)
+    for fila, entrega_id in zip(filas, db.execute(stmt, filas).scalars().all()):
+        fila["id"] = entrega_id
+    return filas
+
+
+def _insertar(db, registros: list, clave: str) -> tuple:
+    """
+    Inserta los registros y avanza el checkpoint del spool en la misma
+    transacción. Devuelve (ids en el mismo orden, [(registro, error), ...]).
+    Si el lote falla por algo que no es transitorio (p.ej. el ejercicio se
+    borró mientras estaba en cola, o una fecha ilegible) se repite fila a fila
+    con SAVEPOINT y las que fallan se descartan (id None).
+    """
+    # El checkpoint va primero: con pysqlite la transacción no empieza hasta el
+    # primer DML y, sin ella, cada SAVEPOINT liberado se confirmaría por su cuenta
+    _guardar_checkpoint(db, clave, registros[-1]["seq"])
+    db.flush()
+
+    descartadas = []
+    try:
+        with db.begin_nested():
+            filas = _insertar_filas(db, registros)
+    except Exception as e:
+        if _transitorio(e):
+            raise
+        filas = []
+        for registro in registros:
+            try:
+                with db.begin_nested():
+                    filas.extend(_insertar_filas(db, [registro]))
+            except Exception as e:
+                if _transitorio(e):
+                    raise
+                descartadas.append((registro, e))
+                filas.append(None)
+
+    ids = [f["id"] if f is not None else None for f in filas]
+    _apuntar_tickets(db, registros, ids)
+    progreso.registrar(db, [
+        (f["usuario_id"], f["ejercicio_id"], f["fecha_envio"], f["id"]) for f in filas if f is not None
+    ])
+    estadisticas.sumar(db, entregas=sum(1 for f in filas if f is not None))
+    db.commit()
+    _descartar(descartadas)
+    return ids, descartadas
+
+
+def _descartar(descartadas: list):
+    """
+    Aparta las entregas que no se pueden insertar (tras el commit del lote).
+    """
+    if not descartadas:
+        return
+    with _lock_descartadas:
+        with open(os.path.join(INGESTA_SPOOL_DIR, "descartadas.ndjson"), "a", encoding="utf-8") as f:
+            for registro, error in descartadas:
+                logger.error("Entrega descartada (ticket %s): %s", registro.get("ticket"), error)
+                f.write(json.dumps({**registro, "error": f"{type(error).__name__}: {error}"},
+                                   ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            if INGESTA_FSYNC:
+                os.fsync(f.fileno())
+
+
+def reaplicar_huerfanos():
+    """
+    Reaplica los spools que no tienen dueño vivo (flock libre) y los elimina.
+    """
+    for ruta in glob.glob(os.path.join(INGESTA_SPOOL_DIR, "*.spool")):
+        with open(ruta, "r+", encoding="utf-8") as f:
+            if not _bloquear(f):
+                continue  # otro worker vivo lo está usando
+
+            clave = _clave_checkpoint(ruta)
+            db = SessionLocal()
+            try:
+                hecho = _leer_checkpoint(db, clave)
+                pendientes = [r for r in _leer_spool(f) if r["seq"] > hecho]
+                for i in range(0, len(pendientes), INGESTA_LOTE_MAX):
+                    _insertar(db, pendientes[i:i + INGESTA_LOTE_MAX], clave)
+                if pendientes:
+                    logger.warning("Reaplicadas %d entregas del spool %s", len(pendientes), ruta)
+                # primero se borra el archivo; el checkpoint huérfano es inofensivo
+                os.remove(ruta)
+                _borrar_checkpoint(db, clave)
+            finally:
+                db.close()
+
+
+# =========================================================
+# Cola + escritor en lote
+# =========================================================
+
+class IngestaEntregas:
+    def __init__(self):
+        os.makedirs(INGESTA_SPOOL_DIR, exist_ok=True)
+        self.spool = uuid.uuid4().hex
+        self.ruta = _ruta_spool(self.spool)
+        self.clave = _clave_checkpoint(self.ruta)
+        # Se crea con otro nombre y se renombra ya bloqueado: reaplicar_huerfanos de
+        # otro worker nunca ve un spool nuevo con el flock libre
+        temporal = self.ruta + ".nuevo"
+        self._spool = open(temporal, "a+", encoding="utf-8")
+        if not _bloquear(self._spool):
+            self._spool.close()
+            raise RuntimeError(f"No se pudo bloquear el spool {temporal}")
+        os.rename(temporal, self.ruta)
+
+        self.cola = queue.Queue(maxsize=INGESTA_COLA_MAX)
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._pendientes = set()
+        # False tras un error inesperado: el spool ya no se trunca y lo que no
+        # llegara a la BD se reaplica en el próximo arranque
+        self._compactable = True
+        self._hilo = threading.Thread(target=self._bucle, name="ingesta-entregas", daemon=True)
+
+    def arrancar(self):
+        self._hilo.start()
+
+    def encolar(self, usuario_id: int, ejercicio_id: int, codigo: str, fecha_envio: datetime) -> str:
+        ticket = f"{self.spool}.{uuid.uuid4().hex}"
+
+        with self._lock:
+            if self.cola.full():
+                raise HTTPException(
+                    status_code=503,
+                    detail="Demasiadas entregas en cola, inténtalo de nuevo en unos segundos",
+                    headers={"Retry-After": "2"},
+                )
+
+            self._seq += 1
+            registro = {
+                "seq": self._seq,
+                "ticket": ticket,
+                "usuario_id": usuario_id,
+                "ejercicio_id": ejercicio_id,
+                "codigo": codigo,
+                "fecha_envio": fecha_envio.isoformat(),
+            }
+            # Primero a disco: si el proceso cae, se reaplica al arrancar
+            self._spool.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            self._spool.flush()
+            if INGESTA_FSYNC:
+                os.fsync(self._spool.fileno())
+
+            self._pendientes.add(ticket)
+            self.cola.put_nowait(registro)
+
+        return ticket
+
+    def _bucle(self):
+        parar = False
+        while not parar:
+            primero = self.cola.get()
+            if primero is None:
+                break
+
+            lote = [primero]
+            limite = time.monotonic() + INGESTA_LATENCIA_MAX_MS / 1000
+            while len(lote) < INGESTA_LOTE_MAX:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    registro = self.cola.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if registro is None:
+                    parar = True
+                    break
+                lote.append(registro)
+
+            try:
+                self._guardar(lote)
+                self._compactar()
+            except Exception:
+                # El hilo no puede morir: /api/ready lo vigila y sin él la cola solo crece
+                logger.exception("Error inesperado en el escritor con %d entregas", len(lote))
+                self._compactable = False
+
+    def _guardar(self, lote: list):
+        espera = 0.5
+        while True:
+            db = SessionLocal()
+            try:
+                ids, descartadas = _insertar(db, lote, self.clave)
+                break
+            except Exception as e:
+                db.rollback()
+                if not _transitorio(e):
+                    # Falla fuera de las filas (progreso, checkpoint...): reintentarlo no lo
+                    # arreglaría. Se aparta el lote entero; sigue en el spool hasta compactar.
+                    logger.exception("Error no transitorio guardando %d entregas", len(lote))
+                    descartadas = [(registro, e) for registro in lote]
+                    _descartar(descartadas)
+                    ids = [None] * len(lote)
+                    self._apuntar_descartadas(lote)
+                    break
+                logger.warning("BD no disponible guardando %d entregas, reintentando en %.1fs: %s",
+                               len(lote), espera, e)
+                time.sleep(espera)
+                espera = min(espera * 2, 30)
+            finally:
+                db.close()
+
+        with self._lock:
+            for registro in lote:
+                self._pendientes.discard(registro["ticket"])
+
+        for registro, entrega_id in zip(lote, ids):
+            if entrega_id is not None:
+                corrector.encolar(entrega_id, registro["ejercicio_id"], registro["codigo"])
+
+    def _apuntar_descartadas(self, lote: list):
+        # Fuera de la transacción que ha fallado; si tampoco se puede, el ticket
+        # acaba en 404 cuando se compacte el spool, pero queda en descartadas.ndjson
+        db = SessionLocal()
+        try:
+            _apuntar_tickets(db, lote, [None] * len(lote))
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("No se pudieron apuntar %d tickets descartados", len(lote))
+        finally:
+            db.close()
+
+    def _compactar(self):
+        # Con la cola vacía todo lo del spool ya está confirmado en la BD
+        with self._lock:
+            if self._compactable and self.cola.empty():
+                self._spool.truncate(0)
+
+    def parar(self):
+        """
+        Vacía la cola, espera al escritor y elimina el spool (ya confirmado).
+        Si el escritor no acaba en INGESTA_PARAR_TIMEOUT_S el spool se queda
+        en disco, bloqueado hasta que muera el proceso.
+        """
+        limite = time.monotonic() + INGESTA_PARAR_TIMEOUT_S
+        try:
+            self.cola.put(None, timeout=INGESTA_PARAR_TIMEOUT_S)
+        except queue.Full:
+            pass  # escritor muerto o atascado con la cola llena
+        if self._hilo.is_alive():
+            self._hilo.join(timeout=max(0.0, limite - time.monotonic()))
+        if self._hilo.is_alive():
+            # Sin cerrar el spool: liberaría el flock y otro worker lo reaplicaría
+            # mientras este hilo aún inserta
+            logger.error("El escritor no ha terminado en %.0fs; quedan %d entregas en el spool %s",
+                         INGESTA_PARAR_TIMEOUT_S, self.cola.qsize(), self.ruta)
+            return
+
+        with self._lock:
+            quedan = self.cola.qsize()
+        if quedan == 0 and self._compactable:
+            self._spool.close()
+            os.remove(self.ruta)
+            db = SessionLocal()
+            try:
+                _borrar_checkpoint(db, self.clave)
+            finally:
+                db.close()
+        else:
+            # Se queda en disco y se reaplicará en el próximo arranque
+            self._spool.close()
+
+
+_ingesta = None
+
+
+def arrancar():
+    global _ingesta
+    os.makedirs(INGESTA_SPOOL_DIR, exist_ok=True)
+    reaplicar_huerfanos()
+    _ingesta = IngestaEntregas()
+    _ingesta.arrancar()
+
+
+def parar():
+    global _ingesta
+    if _ingesta is not None:
+        _ingesta.parar()
+        _ingesta = None
+
+
+def vivo() -> bool:
+    """
+    Para /api/ready: el hilo escritor está arrancado y sigue vivo.
+    """
+    ingesta = _ingesta
+    return ingesta is not None and ingesta._hilo.is_alive()
+
+
+def encolar(usuario_id: int, ejercicio_id: int, codigo: str, fecha_envio: datetime) -> str:
+    ingesta = _ingesta
+    if ingesta is None:
+        # Sin arrancar (o ya parando): no hay escritor que la guarde
+        raise HTTPException(
+            status_code=503,
+            detail="La ingesta de entregas no está disponible, inténtalo de nuevo en unos segundos",
+            headers={"Retry-After": "2"},
+        )
+    return ingesta.encolar(usuario_id, ejercicio_id, codigo, fecha_envio)
+
+
+def _leer_ticket(db, ticket: str):
+    fila = db.query(models.TicketEntrega).filter(models.TicketEntrega.ticket == ticket).first()
+    if fila is None:
+        return None
+    if fila.entrega_id is None:
+        return {"estado": "descartada", "entrega_id": None}
+    return {"estado": "guardada", "entrega_id": fila.entrega_id}
+
+
+def estado(db, ticket: str):
+    """
+    Estado de un ticket de cualquier worker: guardada/descartada según
+    tickets_entrega, pendiente mientras su spool siga en disco, None si no existe.
+    """
+    formato = _FORMATO_TICKET.match(ticket)
+    if formato is None:
+        return None
+    fila = _leer_ticket(db, ticket)
+    if fila is not None:
+        return fila
+    propia = _ingesta
+    if propia is not None and propia.spool == formato.group(1):
+        if ticket in propia._pendientes:
+            return {"estado": "pendiente", "entrega_id": None}
+        # El lote puede haberse confirmado entre la consulta y ahora
+        return _leer_ticket(db, ticket)
+    # De otro worker: si su spool sigue en disco, el lote aún no se ha insertado
+    if os.path.exists(_ruta_spool(formato.group(1))):
+        return {"estado": "pendiente", "entrega_id": None}
+    return None
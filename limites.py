@@ -0,0 +1,359 @@
+# backend/limites.py
+"""
+Límite de peticiones por token bucket en las rutas caras (bcrypt).
+
+Cada regla es un cubo de `capacidad` fichas que se rellena a razón de
+capacidad/periodo por segundo; cada petición gasta una ficha y sin fichas
+se responde 429 con Retry-After. Las reglas se aplican por IP y, en el
+login, también por nombre de usuario (leído del cuerpo JSON), para que un
+script no pueda probar contraseñas de una cuenta desde muchas IPs ni una
+IP tumbar el servidor probando cuentas distintas. En esas rutas un cuerpo de
+más de 64 KB se rechaza con 413.
+
+Las reglas van por método + plantilla de ruta y se pueden cambiar con
+LIMITES_RUTAS (JSON), p.ej.:
+
+    LIMITES_RUTAS='{"POST /api/login": {"ip": "60/60", "usuario": "10/60"}, "POST /api/usuarios": null}'
+
+Backend de contadores (LIMITES_BACKEND):
+- "memoria" (por defecto): en el proceso, LRU acotado a LIMITES_MAX_CLAVES.
+  Con varios workers de uvicorn cada uno cuenta por su lado.
+- "sqlite": archivo compartido por todos los workers de la máquina
+  (LIMITES_SQLITE_RUTA); sirve también para pruebas locales.
+- "paquete.modulo:Clase": cualquier clase con el método consumir() de
+  Backend (p.ej. una sobre Redis para varias máquinas).
+
+Ojo con los NAT: una clase entera suele salir a internet con la misma IP,
+por eso los límites por IP son generosos y los estrictos son por usuario.
+"""
+import importlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from anyio import to_thread
+from starlette.datastructures import Headers
+from starlette.routing import compile_path
+from respuestas import RespuestaJSON
+
+LIMITES_ACTIVOS = os.getenv("LIMITES_ACTIVOS", "1") == "1"
+LIMITES_BACKEND = os.getenv("LIMITES_BACKEND", "memoria")
+LIMITES_MAX_CLAVES = int(os.getenv("LIMITES_MAX_CLAVES", "100000"))
+LIMITES_SQLITE_RUTA = os.getenv("LIMITES_SQLITE_RUTA", "./limites.db")
+# Proxies de confianza delante de la API (LIMITES_CONFIAR_PROXY=1 equivale a 1).
+# Cada uno añade al final de X-Forwarded-For la IP de quien le habla, así que la
+# del cliente es la n-ésima empezando por la derecha; lo de su izquierda lo
+# escribe el cliente y no vale para limitar
+LIMITES_PROXIES_CONFIANZA = int(os.getenv(
+    "LIMITES_PROXIES_CONFIANZA", "1" if os.getenv("LIMITES_CONFIAR_PROXY", "0") == "1" else "0"
+))
+
+# "capacidad/segundos": ráfaga máxima y cuánto tarda en rellenarse entera
+REGLAS_POR_DEFECTO = {
+    "POST /api/login": {"ip": "60/60", "usuario": "10/60"},
+    "POST /api/usuarios": {"ip": "40/600"},
+    "POST /api/admin/usuarios": {"ip": "30/60"},
+    "PUT /api/admin/usuarios/{usuario_id}/password": {"ip": "30/60"},
+}
+
+# Cuerpo máximo en las rutas con límite por usuario: por encima, 413
+_CUERPO_MAX = 64 * 1024
+
+logger = logging.getLogger("limites")
+
+
+class Regla:
+    __slots__ = ("tipo", "capacidad", "recarga")
+
+    def __init__(self, tipo: str, especificacion: str):
+        capacidad, _, periodo = especificacion.partition("/")
+        self.tipo = tipo
+        self.capacidad = float(capacidad)
+        self.recarga = self.capacidad / float(periodo or 1)  # fichas por segundo
+
+
+def cargar_reglas() -> list:
+    """
+    [(metodo, regex de la ruta, plantilla, [Regla, ...]), ...]
+    """
+    reglas = dict(REGLAS_POR_DEFECTO)
+    reglas.update(json.loads(os.getenv("LIMITES_RUTAS", "{}")))
+
+    cargadas = []
+    for clave, tipos in reglas.items():
+        if not tipos:
+            continue
+        metodo, _, plantilla = clave.partition(" ")
+        regex, _, _ = compile_path(plantilla)
+        cargadas.append((metodo.upper(), regex, plantilla, [Regla(t, e) for t, e in tipos.items()]))
+    return cargadas
+
+
+# =========================================================
+# Backends
+# =========================================================
+
+class Backend:
+    """
+    Interfaz: consumir() gasta una ficha del cubo `clave` y devuelve
+    (permitido, segundos hasta la próxima ficha).
+    """
+    # True si consumir() hace E/S: el middleware lo llama fuera del event loop
+    bloqueante = False
+
+    def consumir(self, clave: str, capacidad: float, recarga: float) -> tuple:
+        raise NotImplementedError
+
+    def estadisticas(self) -> dict:
+        return {}
+
+
+def _rellenar(fichas: float, ultimo: float, ahora: float, capacidad: float, recarga: float) -> float:
+    return min(capacidad, fichas + (ahora - ultimo) * recarga)
+
+
+class BackendMemoria(Backend):
+    def __init__(self, max_claves: int = LIMITES_MAX_CLAVES):
+        self.max_claves = max_claves
+        self._cubos = OrderedDict()  # clave -> [fichas, ultimo]
+        self._lock = threading.Lock()
+        self.expulsadas = 0
+
+    def consumir(self, clave: str, capacidad: float, recarga: float) -> tuple:
+        ahora = time.monotonic()
+        with self._lock:
+            cubo = self._cubos.get(clave)
+            if cubo is None:
+                cubo = self._cubos[clave] = [capacidad, ahora]
+                # El cubo más antiguo sin usar ya estará lleno o casi: perderlo cuesta poco
+                while len(self._cubos) > self.max_claves:
+                    self._cubos.popitem(last=False)
+                    self.expulsadas += 1
+            else:
+                self._cubos.move_to_end(clave)
+                cubo[0] = _rellenar(cubo[0], cubo[1], ahora, capacidad, recarga)
+                cubo[1] = ahora
+
+            if cubo[0] >= 1:
+                cubo[0] -= 1
+                return True, 0.0
+            return False, (1 - cubo[0]) / recarga
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {"claves": len(self._cubos), "max": self.max_claves, "expulsadas": self.expulsadas}
+
+
+class BackendSQLite(Backend):
+    """
+    Cubos en un archivo SQLite compartido entre procesos. Cada consumo es una
+    transacción BEGIN IMMEDIATE, así que dos workers no gastan la misma ficha.
+    """
+    bloqueante = True
+
+    # Cada cuántos consumos se borran los cubos que ya estarían llenos
+    LIMPIAR_CADA = 1000
+
+    def __init__(self, ruta: str = LIMITES_SQLITE_RUTA):
+        self.ruta = ruta
+        self._local = threading.local()
+        self._contador = 0
+        with self._conexion() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cubos ("
+                "clave TEXT PRIMARY KEY, fichas REAL NOT NULL, ultimo REAL NOT NULL, lleno REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cubos_lleno ON cubos (lleno)")
+
+    def _conexion(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.ruta, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def consumir(self, clave: str, capacidad: float, recarga: float) -> tuple:
+        # time.time y no monotonic: el reloj tiene que ser el mismo en todos los procesos
+        ahora = time.time()
+        conn = self._conexion()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            fila = conn.execute("SELECT fichas, ultimo FROM cubos WHERE clave = ?", (clave,)).fetchone()
+            fichas = capacidad if fila is None else _rellenar(fila[0], fila[1], ahora, capacidad, recarga)
+            permitido = fichas >= 1
+            if permitido:
+                fichas -= 1
+            # lleno: cuándo volverá a estar lleno; a partir de ahí la fila sobra
+            lleno = ahora + (capacidad - fichas) / recarga
+            conn.execute(
+                "INSERT INTO cubos (clave, fichas, ultimo, lleno) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (clave) DO UPDATE SET fichas = excluded.fichas, "
+                "ultimo = excluded.ultimo, lleno = excluded.lleno",
+                (clave, fichas, ahora, lleno),
+            )
+
+            self._contador += 1
+            if self._contador % self.LIMPIAR_CADA == 0:
+                conn.execute("DELETE FROM cubos WHERE lleno < ?", (ahora,))
+
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return (True, 0.0) if permitido else (False, (1 - fichas) / recarga)
+
+    def estadisticas(self) -> dict:
+        (claves,) = self._conexion().execute("SELECT count(*) FROM cubos").fetchone()
+        return {"claves": claves, "ruta": self.ruta}
+
+
+def crear_backend(nombre: str = LIMITES_BACKEND) -> Backend:
+    if nombre == "memoria":
+        return BackendMemoria()
+    if nombre == "sqlite":
+        return BackendSQLite()
+    modulo, _, clase = nombre.partition(":")
+    return getattr(importlib.import_module(modulo), clase)()
+
+
+# =========================================================
+# Middleware ASGI
+# =========================================================
+
+class LimitesMiddleware:
+    def __init__(self, app, backend: Backend = None, reglas: list = None):
+        self.app = app
+        self.backend = backend or crear_backend()
+        self.reglas = cargar_reglas() if reglas is None else reglas
+        self.rechazos = {}
+        self._lock = threading.Lock()
+
+        global middleware_actual
+        middleware_actual = self
+
+    def _reglas_de(self, metodo: str, ruta: str):
+        for m, regex, plantilla, reglas in self.reglas:
+            if m == metodo and regex.match(ruta):
+                return plantilla, reglas
+        return None, None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        plantilla, reglas = self._reglas_de(scope["method"], scope["path"])
+        if reglas is None:
+            await self.app(scope, receive, send)
+            return
+
+        if any(r.tipo == "usuario" for r in reglas):
+            cuerpo, receive = await _leer_cuerpo(receive)
+            if cuerpo is None:
+                # Ningún login legítimo ocupa tanto, y sin leerlo no hay nombre que limitar
+                respuesta = RespuestaJSON({"detail": "Cuerpo demasiado grande"}, status_code=413)
+                await respuesta(scope, receive, send)
+                return
+            # Sin nombre legible (la app lo rechazará con 422) el cubo de usuario va por IP
+            usuario = _nombre_usuario(cuerpo) or f"?{_ip(scope)}"
+        else:
+            usuario = None
+
+        for regla in reglas:
+            if regla.tipo == "ip":
+                valor = _ip(scope)
+            elif regla.tipo == "usuario":
+                valor = usuario
+            else:
+                continue
+            if valor is None:
+                continue
+
+            clave = f"{plantilla}|{regla.tipo}|{valor}"
+            if self.backend.bloqueante:
+                permitido, espera = await to_thread.run_sync(
+                    self.backend.consumir, clave, regla.capacidad, regla.recarga
+                )
+            else:
+                permitido, espera = self.backend.consumir(clave, regla.capacidad, regla.recarga)
+
+            if not permitido:
+                with self._lock:
+                    self.rechazos[(plantilla, regla.tipo)] = self.rechazos.get((plantilla, regla.tipo), 0) + 1
+                logger.info("429 en %s por %s=%s", plantilla, regla.tipo, valor)
+                respuesta = RespuestaJSON(
+                    {"detail": "Demasiados intentos, espera un poco antes de volver a probar"},
+                    status_code=429,
+                    headers={"Retry-After": str(max(1, int(espera + 0.999)))},
+                )
+                await respuesta(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            rechazos = {f"{p} ({t})": n for (p, t), n in sorted(self.rechazos.items())}
+        return {"backend": type(self.backend).__name__, **self.backend.estadisticas(), "rechazos": rechazos}
+
+
+def _ip(scope):
+    if LIMITES_PROXIES_CONFIANZA:
+        reenviada = Headers(scope=scope).get("x-forwarded-for")
+        saltos = [ip.strip() for ip in reenviada.split(",")] if reenviada else []
+        if len(saltos) >= LIMITES_PROXIES_CONFIANZA:
+            return saltos[-LIMITES_PROXIES_CONFIANZA]
+    cliente = scope.get("client")
+    return cliente[0] if cliente else None
+
+
+async def _leer_cuerpo(receive):
+    """
+    Lee el cuerpo entero y devuelve (cuerpo, receive) con un receive que lo
+    vuelve a entregar a la app. Por encima de _CUERPO_MAX devuelve cuerpo None.
+    """
+    mensajes = []
+    tamano = 0
+    while True:
+        mensaje = await receive()
+        mensajes.append(mensaje)
+        if mensaje["type"] != "http.request":
+            break
+        tamano += len(mensaje.get("body", b""))
+        if not mensaje.get("more_body", False) or tamano > _CUERPO_MAX:
+            break
+
+    completo = tamano <= _CUERPO_MAX and mensajes[-1].get("more_body", False) is False
+    cuerpo = b"".join(m.get("body", b"") for m in mensajes) if completo else None
+
+    async def repetir():
+        if mensajes:
+            return mensajes.pop(0)
+        return await receive()
+
+    return cuerpo, repetir
+
+
+def _nombre_usuario(cuerpo):
+    if not cuerpo:
+        return None
+    try:
+        nombre = json.loads(cuerpo).get("nombre")
+    except (ValueError, AttributeError):
+        return None
+    return nombre.strip().lower() if isinstance(nombre, str) and nombre.strip() else None
+
+
+# La instancia que usa la app, para el endpoint de administración
+middleware_actual = None
+
+
+def estadisticas() -> dict:
+    if middleware_actual is None:
+        return {"activo": False}
+    return {"activo": True, **middleware_actual.estadisticas()}
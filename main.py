@@ -1,31 +1,98 @@
 # backend/main.py
+import time
+
+# Antes de cualquier otro import: referencia de importado_s / calentado_s (ver arranque.py)
+INICIO = time.perf_counter()
+
 from datetime import datetime
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import os
 
+import arranque
 import models
 import database
+import catalogo
+import buscador
+import estadisticas
+import ingesta
+import corrector
+import codigos
+import progreso
+import sesiones
 
 # Importamos las dependencias ya desacopladas
 from dependencies import (
     get_db,
     get_current_user,
-    create_access_token,
     require_admin,
-    verify_password,
-    get_password_hash
 )
+import hashing
 
 # Importamos el router de administración
 from admin_router import router as admin_router
+from consultas import consulta_entregas, filtrar_entregas, paginar_entregas
+from respuestas import RespuestaJSON, respuesta_lista
+from compresion import CompresionMiddleware
+import metricas
+import depuracion
+import limites
+
+# El esquema ya no se crea al importar: crear_esquema.py en el despliegue
+# (o CREAR_ESQUEMA=1 en el arranque, ver arranque.py)
+
+# orjson por defecto (respuestas.py); las rutas con response_model validan antes
+app = FastAPI(default_response_class=RespuestaJSON)
+
+
+@app.on_event("startup")
+def arrancar():
+    arranque.preparar_esquema()
+    # Contadores, progreso, catálogo y buscador: en segundo plano, /api/ready espera a que acaben
+    arranque.calentar()
+
+
+@app.on_event("shutdown")
+def parar_calentamiento():
+    arranque.parar()
+
+
+@app.on_event("shutdown")
+def apagar_pool_hashing():
+    hashing.apagar()
+
+
+@app.on_event("startup")
+def arrancar_corrector():
+    corrector.arrancar()
+
+
+@app.on_event("shutdown")
+def parar_corrector():
+    corrector.parar()
+
+
+if ingesta.INGESTA_DIFERIDA:
+    @app.on_event("startup")
+    def arrancar_ingesta():
+        ingesta.arrancar()
+
+    @app.on_event("shutdown")
+    def parar_ingesta():
+        ingesta.parar()
 
-# Crear tablas si no existen
-models.Base.metadata.create_all(bind=database.engine)
 
-app = FastAPI()
+# Modo async: estas rutas se registran primero y tapan sus versiones sync
+if database.DB_ASYNC:
+    from api_async import router as api_async_router
+    app.include_router(api_async_router)
+
+    @app.on_event("shutdown")
+    async def cerrar_motor_async():
+        await database.dispose_async_engine()
 
 from admin_ejercicios import router as admin_ejercicios_router
 app.include_router(admin_ejercicios_router)
@@ -33,6 +100,20 @@ app.include_router(admin_ejercicios_router)
 # Añadir router de administración
 app.include_router(admin_router)
 
+# Token bucket por IP y por usuario en login/registro (bcrypt); ver limites.py
+if limites.LIMITES_ACTIVOS:
+    app.add_middleware(limites.LimitesMiddleware)
+
+# Compresión gzip/brotli de las respuestas dinámicas (el catálogo ya va precomprimido)
+app.add_middleware(CompresionMiddleware)
+
+# Latencia, estados y sentencias SQL por ruta (ver GET /metrics)
+app.add_middleware(metricas.MetricasMiddleware)
+
+# Solo en desarrollo: avisa de N+1 y consultas lentas (ver depuracion.py)
+if depuracion.SQL_DEBUG:
+    app.add_middleware(depuracion.DepuracionMiddleware)
+
 # Configuración CORS
 origins = [
     "https://classesrepasramon.netlify.app",
@@ -46,86 +127,126 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 # -------- Pydantic Models --------
 
-from pydantic import BaseModel
-
-class UsuarioCreate(BaseModel):
-    email: str
-    nombre: str
-    password: str
-
-class LoginRequest(BaseModel):
-    nombre: str
-    password: str
-
-class EntregaCreate(BaseModel):
-    usuario_id: int
-    ejercicio_id: int
-    codigo: str
+from schemas import (
+    UsuarioCreate, LoginRequest, RefreshRequest, EntregaCreate, Mensaje,
+    CategoriaOut, EjercicioResumen, EjercicioDetalle, Busqueda,
+    LoginOut, UsuarioCreado, EntregaRecibida, EstadoEntrega, EntregaResumen,
+    ProgresoOut,
+)
 
 # -------- ENDPOINTS --------
 
-@app.get("/api/categorias/{categoria_id}")
+@app.get("/api/categorias/{categoria_id}", response_model=CategoriaOut)
 def leer_categoria(
     categoria_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     usuario = Depends(get_current_user)
 ):
-    categoria = db.query(models.Categoria).filter(models.Categoria.id == categoria_id).first()
-    if categoria is None:
+    snapshot = catalogo.obtener(db)
+    cuerpo = snapshot.categoria_por_id.get(categoria_id)
+    if cuerpo is None:
         raise HTTPException(status_code=404, detail="Categoría no encontrada")
-    return categoria
+    return catalogo.responder(request, cuerpo, snapshot)
 
 
-@app.get("/api/categorias")
+@app.get("/api/categorias", response_model=List[CategoriaOut])
 def leer_categorias(
+    request: Request,
     db: Session = Depends(get_db),
     usuario = Depends(get_current_user)
 ):
-    return db.query(models.Categoria).all()
+    snapshot = catalogo.obtener(db)
+    return catalogo.responder(request, snapshot.categorias, snapshot)
 
 
-@app.get("/api/ejercicios")
+@app.get("/api/ejercicios", response_model=List[EjercicioResumen])
 def leer_ejercicios(
+    request: Request,
+    db: Session = Depends(get_db),
+    usuario = Depends(get_current_user)
+):
+    snapshot = catalogo.obtener(db)
+    return catalogo.responder(request, snapshot.ejercicios, snapshot)
+
+
+@app.get("/api/ejercicios/buscar", response_model=Busqueda)
+def buscar_ejercicios(
+    q: str = Query(..., min_length=1, max_length=200),
+    categoria_id: Optional[int] = None,
+    dificultad: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    usuario = Depends(get_current_user)
+):
+    # Índice invertido en memoria (buscador.py): sin tildes, BM25 y facetas
+    return buscador.obtener(db).buscar(q, categoria_id, dificultad, limit)
+
+
+# exclude_unset: sin la clave "solucion" para los alumnos, en lugar de null
+@app.get("/api/ejercicios/{ejercicio_id}", response_model=EjercicioDetalle, response_model_exclude_unset=True)
+def leer_ejercicio(
+    ejercicio_id: int,
     db: Session = Depends(get_db),
     usuario = Depends(get_current_user)
 ):
-    return db.query(models.Ejercicio).all()
+    ejercicio = catalogo.detalle(db, ejercicio_id, con_solucion=usuario.rol == "admin")
+    if ejercicio is None:
+        raise HTTPException(status_code=404, detail="Ejercicio no encontrado")
+    return ejercicio
 
 
-@app.post("/api/login")
-def login(request: LoginRequest, db: Session = Depends(get_db)):
-    usuario = db.query(models.Usuario).filter(models.Usuario.nombre == request.nombre).first()
+@app.post("/api/login", response_model=LoginOut)
+async def login(request: LoginRequest, db: Session = Depends(get_db)):
+    # async + pool de bcrypt: el hash no ocupa un hilo del threadpool de FastAPI
+    usuario = await run_in_threadpool(
+        lambda: db.query(models.Usuario).filter(models.Usuario.nombre == request.nombre).first()
+    )
 
-    if not usuario or not verify_password(request.password, usuario.hashed_password):
+    if not usuario:
         raise HTTPException(status_code=401, detail="Credenciales inválidas")
 
-    token = create_access_token({
-        "sub": str(usuario.id),
-        "nombre": usuario.nombre,
-        "rol": usuario.rol
-    })
-
-    return {
-        "access_token": token,
-        "usuario": {
-            "id": usuario.id,
-            "nombre": usuario.nombre,
-            "rol": usuario.rol
-        }
-    }
+    valido, nuevo_hash = await hashing.verify_and_update_async(request.password, usuario.hashed_password)
+    if not valido:
+        raise HTTPException(status_code=401, detail="Credenciales inválidas")
+
+    # Rehash si ha cambiado el coste de bcrypt configurado (va en el commit de la sesión)
+    if nuevo_hash:
+        usuario.hashed_password = nuevo_hash
+
+    refresh_token = await run_in_threadpool(sesiones.iniciar, db, usuario.id)
+    return sesiones.respuesta(usuario, refresh_token)
+
+
+@app.post("/api/token/refresh", response_model=LoginOut)
+def refrescar_token(datos: RefreshRequest, db: Session = Depends(get_db)):
+    # Sin bcrypt: HMAC del token + búsqueda por índice (ver sesiones.py)
+    usuario, refresh_token = sesiones.renovar(db, datos.refresh_token)
+    return sesiones.respuesta(usuario, refresh_token)
 
 
-@app.post("/api/usuarios")
-def crear_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
+@app.post("/api/logout", response_model=Mensaje)
+def logout(datos: RefreshRequest, db: Session = Depends(get_db)):
+    sesiones.revocar(db, datos.refresh_token)
+    db.commit()
+    return {"mensaje": "Sesión cerrada"}
+
+
+@app.post("/api/usuarios", response_model=UsuarioCreado)
+async def crear_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
     # Evitar duplicados por nombre
-    if db.query(models.Usuario).filter(models.Usuario.nombre == usuario.nombre).first():
+    existente = await run_in_threadpool(
+        lambda: db.query(models.Usuario).filter(models.Usuario.nombre == usuario.nombre).first()
+    )
+    if existente:
         raise HTTPException(status_code=400, detail="El nombre de usuario ya existe")
 
-    hashed = get_password_hash(usuario.password)
+    hashed = await hashing.hash_password_async(usuario.password)
 
     nuevo_usuario = models.Usuario(
         email=usuario.email,
@@ -134,68 +255,128 @@ def crear_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
         rol="alumno"   
     )
 
-    db.add(nuevo_usuario)
-    db.commit()
-    db.refresh(nuevo_usuario)
+    def guardar():
+        db.add(nuevo_usuario)
+        estadisticas.sumar(db, usuarios=1, alumnos=1)
+        db.commit()
+        db.refresh(nuevo_usuario)
+
+    await run_in_threadpool(guardar)
 
     return {"mensaje": "Usuario creado", "usuario": {"id": nuevo_usuario.id, "nombre": nuevo_usuario.nombre}}
 
 
-@app.post("/api/entregas")
+@app.post("/api/entregas", response_model=EntregaRecibida, response_model_exclude_none=True)
 def crear_entrega(
     entrega: EntregaCreate,
+    response: Response,
     db: Session = Depends(get_db),
     usuario = Depends(get_current_user)
 ):
+    if ingesta.INGESTA_DIFERIDA:
+        # Se valida contra el catálogo en memoria y se encola; la escribe el hilo de ingesta
+        if not catalogo.existe(db, entrega.ejercicio_id):
+            raise HTTPException(status_code=404, detail="Ejercicio no encontrado")
+        ticket = ingesta.encolar(usuario.id, entrega.ejercicio_id, entrega.codigo, datetime.utcnow())
+        response.status_code = 202
+        return {"mensaje": "Entrega recibida", "ticket": ticket}
+
     nueva = models.Entrega(
         usuario_id=usuario.id,
         ejercicio_id=entrega.ejercicio_id,
-        codigo=entrega.codigo,
+        codigo_hash=codigos.guardar(db, entrega.codigo),
         fecha_envio=datetime.utcnow()
     )
     db.add(nueva)
+    db.flush()
+    progreso.registrar(db, [(nueva.usuario_id, nueva.ejercicio_id, nueva.fecha_envio, nueva.id)])
+    estadisticas.sumar(db, entregas=1)
     db.commit()
     db.refresh(nueva)
+    corrector.encolar(nueva.id, nueva.ejercicio_id, entrega.codigo)
     return {"mensaje": "Entrega guardada", "entrega_id": nueva.id}
 
 
-@app.get("/api/entregas")
+@app.get("/api/entregas/ticket/{ticket}", response_model=EstadoEntrega)
+def estado_entrega(
+    ticket: str,
+    db: Session = Depends(get_db),
+    usuario = Depends(get_current_user)
+):
+    # Solo con INGESTA_DIFERIDA: dice si una entrega encolada ya está en la BD
+    estado = ingesta.estado(db, ticket)
+    if estado is None:
+        raise HTTPException(status_code=404, detail="Ticket no encontrado")
+    return estado
+
+
+@app.get("/api/entregas", response_model=List[EntregaResumen])
 def listar_entregas(
+    usuario_id: Optional[int] = None,
+    ejercicio_id: Optional[int] = None,
+    categoria_id: Optional[int] = None,
+    resultado: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
     db: Session = Depends(get_db),
     usuario = Depends(get_current_user)
 ):
-    entregas = db.query(models.Entrega).all()
-    return [
+    q = filtrar_entregas(
+        consulta_entregas(db),
+        usuario_id, ejercicio_id, categoria_id, resultado, desde, hasta
+    )
+
+    # Sin limit ni cursor se mantiene el listado completo de siempre
+    siguiente = None
+    if limit is None and cursor is None:
+        filas = q.order_by(models.Entrega.id).all()
+    else:
+        filas, siguiente = paginar_entregas(q, cursor, limit or 100)
+
+    # Las filas ya traen solo estas columnas: se serializan sin pasar por pydantic
+    return respuesta_lista([
         {
-            "id": e.id,
-            "usuario": e.usuario.nombre,
-            "ejercicio": e.ejercicio.titulo,
-            "fecha_envio": e.fecha_envio,
+            "id": f.id,
+            "usuario": f.usuario,
+            "ejercicio": f.ejercicio,
+            "fecha_envio": f.fecha_envio,
         }
-        for e in entregas
-    ]
+        for f in filas
+    ], siguiente)
 
 
-@admin_router.get("/entregas")
-def listar_entregas_admin(
+@app.get("/api/progreso", response_model=ProgresoOut)
+def mi_progreso(
+    categoria_id: Optional[int] = None,
     db: Session = Depends(get_db),
-    admin = Depends(require_admin)
+    usuario = Depends(get_current_user)
 ):
-    entregas = db.query(models.Entrega).all()
-    return [
-        {
-            "id": e.id,
-            "usuario": e.usuario.nombre,
-            "ejercicio": e.ejercicio.titulo,
-            "codigo": e.codigo,
-            "fecha_envio": e.fecha_envio,
-            "resultado": e.resultado,
-            "categoria_id": e.ejercicio.categoria_id
-        }
-        for e in entregas
-    ]
+    # Sale de la tabla resumen `progreso` (ver progreso.py), no de recorrer las entregas
+    return progreso.de_alumno(db, usuario.id, categoria_id)
 
 
 @app.get("/api/ping")
 def ping():
+    # Vida: no toca la BD
     return {"status": "ok"}
+
+
+@app.get("/api/ready")
+def ready():
+    # Disponibilidad: calentamiento terminado y BD accesible
+    listo, cuerpo = arranque.estado()
+    return RespuestaJSON(cuerpo, status_code=200 if listo else 503)
+
+
+@app.get("/metrics", include_in_schema=False)
+def exponer_metricas():
+    # Formato de texto de Prometheus
+    return Response(
+        content=metricas.exponer(database.estadisticas_pool()),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+arranque.marcar_importado(INICIO)
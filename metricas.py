@@ -0,0 +1,238 @@
+# backend/metricas.py
+"""
+Métricas de la app en formato de texto de Prometheus (GET /metrics).
+
+- MetricasMiddleware mide cada request: latencia por ruta (histograma),
+  requests en curso y códigos de estado.
+- database.py engancha before/after_cursor_execute del engine y suma en el
+  request actual (contextvar) cuántas sentencias SQL se lanzaron y cuánto
+  tiempo se pasó en la BD.
+- Los requests que superan METRICAS_LENTO_MS se registran en el log con su
+  número de sentencias: un N+1 se ve enseguida.
+
+La ruta se etiqueta con la plantilla ("/api/categorias/{categoria_id}"), no con
+la URL, para que el número de series no crezca con los ids.
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+METRICAS_LENTO_MS = float(os.getenv("METRICAS_LENTO_MS", "500"))
+
+# Límites superiores (segundos) del histograma de latencia
+BUCKETS_LATENCIA = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+# Límites superiores del histograma de sentencias SQL por request
+BUCKETS_SENTENCIAS = [0, 1, 2, 5, 10, 20, 50, 100]
+
+logger = logging.getLogger("metricas")
+
+
+class ConsultasRequest:
+    """
+    Lo que lleva acumulado en la BD el request actual.
+    """
+    __slots__ = ("sentencias", "tiempo_db")
+
+    def __init__(self):
+        self.sentencias = 0
+        self.tiempo_db = 0.0
+
+
+# Mutable a propósito: run_in_threadpool copia el contexto, pero el objeto es el mismo
+request_actual = contextvars.ContextVar("request_actual", default=None)
+
+
+class _Histograma:
+    def __init__(self, buckets: list):
+        self.buckets = buckets
+        self.cuentas = [0] * (len(buckets) + 1)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        i = 0
+        while i < len(self.buckets) and valor > self.buckets[i]:
+            i += 1
+        self.cuentas[i] += 1
+        self.suma += valor
+        self.total += 1
+
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.en_curso = 0
+        self.requests = defaultdict(int)                                   # (metodo, ruta, estado)
+        self.latencia = defaultdict(lambda: _Histograma(BUCKETS_LATENCIA))  # (metodo, ruta)
+        self.sentencias = defaultdict(lambda: _Histograma(BUCKETS_SENTENCIAS))
+        self.tiempo_db = defaultdict(float)
+        self.lentos = defaultdict(int)
+        # Sentencias fuera de un request (hilo de ingesta, arranque...)
+        self.sentencias_fuera = 0
+        self.tiempo_db_fuera = 0.0
+
+    def empezar(self):
+        with self._lock:
+            self.en_curso += 1
+
+    def terminar(self, metodo: str, ruta: str, estado: int, segundos: float, consultas: ConsultasRequest):
+        clave = (metodo, ruta)
+        with self._lock:
+            self.en_curso -= 1
+            self.requests[(metodo, ruta, str(estado))] += 1
+            self.latencia[clave].observar(segundos)
+            self.sentencias[clave].observar(consultas.sentencias)
+            self.tiempo_db[clave] += consultas.tiempo_db
+
+        if segundos * 1000 >= METRICAS_LENTO_MS:
+            with self._lock:
+                self.lentos[clave] += 1
+            logger.warning(
+                "Request lento: %s %s -> %d en %.0f ms, %d sentencias SQL (%.0f ms en BD)",
+                metodo, ruta, estado, segundos * 1000, consultas.sentencias, consultas.tiempo_db * 1000,
+            )
+
+    def sentencia_fuera(self, segundos: float):
+        with self._lock:
+            self.sentencias_fuera += 1
+            self.tiempo_db_fuera += segundos
+
+
+metricas = Metricas()
+
+
+def registrar_sentencia(segundos: float):
+    """
+    Llamado desde los eventos del engine tras cada sentencia SQL.
+    """
+    consultas = request_actual.get()
+    if consultas is None:
+        metricas.sentencia_fuera(segundos)
+        return
+    consultas.sentencias += 1
+    consultas.tiempo_db += segundos
+
+
+# =========================================================
+# Middleware ASGI
+# =========================================================
+
+class MetricasMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        consultas = ConsultasRequest()
+        token = request_actual.set(consultas)
+        inicio = time.perf_counter()
+        estado = 500
+        metricas.empezar()
+
+        async def enviar(mensaje):
+            nonlocal estado
+            if mensaje["type"] == "http.response.start":
+                estado = mensaje["status"]
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            # En streaming el cuerpo ya se ha enviado entero cuando se llega aquí
+            route = scope.get("route")
+            ruta = getattr(route, "path", None) or "sin_ruta"
+            metricas.terminar(scope["method"], ruta, estado, time.perf_counter() - inicio, consultas)
+            request_actual.reset(token)
+
+
+# =========================================================
+# Exposición en texto de Prometheus
+# =========================================================
+
+def _etiquetas(**valores) -> str:
+    partes = []
+    for nombre, valor in valores.items():
+        valor = str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        partes.append(f'{nombre}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+def _histograma(lineas: list, nombre: str, etiquetas: dict, h: _Histograma):
+    acumulado = 0
+    for limite, cuenta in zip(h.buckets, h.cuentas):
+        acumulado += cuenta
+        lineas.append(f"{nombre}_bucket{_etiquetas(**etiquetas, le=limite)} {acumulado}")
+    lineas.append(f'{nombre}_bucket{_etiquetas(**etiquetas, le="+Inf")} {h.total}')
+    lineas.append(f"{nombre}_sum{_etiquetas(**etiquetas)} {h.suma}")
+    lineas.append(f"{nombre}_count{_etiquetas(**etiquetas)} {h.total}")
+
+
+def exponer(pool: dict = None) -> str:
+    m = metricas
+    lineas = []
+
+    with m._lock:
+        lineas += [
+            "# HELP http_requests_en_curso Requests que se están atendiendo ahora mismo",
+            "# TYPE http_requests_en_curso gauge",
+            f"http_requests_en_curso {m.en_curso}",
+            "# HELP http_requests_total Requests atendidos por ruta y código de estado",
+            "# TYPE http_requests_total counter",
+        ]
+        for (metodo, ruta, estado), n in sorted(m.requests.items()):
+            lineas.append(f"http_requests_total{_etiquetas(metodo=metodo, ruta=ruta, estado=estado)} {n}")
+
+        lineas += [
+            "# HELP http_request_duracion_segundos Latencia de los requests por ruta",
+            "# TYPE http_request_duracion_segundos histogram",
+        ]
+        for (metodo, ruta), h in sorted(m.latencia.items()):
+            _histograma(lineas, "http_request_duracion_segundos", {"metodo": metodo, "ruta": ruta}, h)
+
+        lineas += [
+            "# HELP http_request_sentencias_sql Sentencias SQL lanzadas por request",
+            "# TYPE http_request_sentencias_sql histogram",
+        ]
+        for (metodo, ruta), h in sorted(m.sentencias.items()):
+            _histograma(lineas, "http_request_sentencias_sql", {"metodo": metodo, "ruta": ruta}, h)
+
+        lineas += [
+            "# HELP http_request_db_segundos_total Tiempo total en la BD por ruta",
+            "# TYPE http_request_db_segundos_total counter",
+        ]
+        for (metodo, ruta), t in sorted(m.tiempo_db.items()):
+            lineas.append(f"http_request_db_segundos_total{_etiquetas(metodo=metodo, ruta=ruta)} {t}")
+
+        lineas += [
+            "# HELP http_requests_lentos_total Requests por encima de METRICAS_LENTO_MS",
+            "# TYPE http_requests_lentos_total counter",
+        ]
+        for (metodo, ruta), n in sorted(m.lentos.items()):
+            lineas.append(f"http_requests_lentos_total{_etiquetas(metodo=metodo, ruta=ruta)} {n}")
+
+        lineas += [
+            "# HELP db_sentencias_fuera_de_request_total Sentencias SQL fuera de un request (ingesta, arranque)",
+            "# TYPE db_sentencias_fuera_de_request_total counter",
+            f"db_sentencias_fuera_de_request_total {m.sentencias_fuera}",
+            "# HELP db_segundos_fuera_de_request_total Tiempo en la BD fuera de un request",
+            "# TYPE db_segundos_fuera_de_request_total counter",
+            f"db_segundos_fuera_de_request_total {m.tiempo_db_fuera}",
+        ]
+
+    if pool:
+        # Valores numéricos de database.estadisticas_pool(); el histograma ya va en /api/admin/pool
+        lineas += ["# HELP db_pool Estado del pool de conexiones", "# TYPE db_pool gauge"]
+        for nombre, valor in pool.items():
+            if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                lineas.append(f"db_pool{_etiquetas(dato=nombre)} {valor}")
+        for nombre, valor in pool.get("async", {}).items():
+            if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                lineas.append(f"db_pool{_etiquetas(motor='async', dato=nombre)} {valor}")
+
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,126 @@
+# backend/migrar_codigos.py
+"""
+Pasa el código de las entregas antiguas (texto en Entrega.codigo) a la tabla
+de blobs comprimidos y deduplicados (ver codigos.py).
+
+    python migrar_codigos.py                      # migra todo, en lotes de LOTE
+    python migrar_codigos.py --lote 2000 --url sqlite:///otra.db
+    python migrar_codigos.py --limpiar --vacuum   # borra blobs huérfanos y compacta (SQLite)
+
+Cada lote va en su propia transacción: se puede parar y volver a lanzar en
+cualquier momento con la API en marcha, y sigue por donde se quedó.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+LOTE = 1000
+
+
+def migrar(db, lote: int = LOTE, informar=print) -> dict:
+    from sqlalchemy import update
+    import models
+    import codigos
+
+    migradas = 0
+    bytes_antes = 0
+    ultimo = 0
+    inicio = time.perf_counter()
+
+    while True:
+        filas = (
+            db.query(models.Entrega.id, models.Entrega.codigo)
+            .filter(models.Entrega.codigo_hash.is_(None), models.Entrega.id > ultimo)
+            .order_by(models.Entrega.id)
+            .limit(lote)
+            .all()
+        )
+        if not filas:
+            break
+
+        textos = [f.codigo or "" for f in filas]
+        hashes = codigos.guardar_muchos(db, textos)
+        # UPDATE por clave primaria en bloque (executemany)
+        db.execute(update(models.Entrega), [
+            {"id": f.id, "codigo_hash": h, "codigo": ""}
+            for f, h in zip(filas, hashes)
+        ])
+        db.commit()
+
+        ultimo = filas[-1].id
+        migradas += len(filas)
+        bytes_antes += sum(len(t.encode("utf-8")) for t in textos)
+        informar(f"  {migradas} entregas migradas (hasta id {ultimo}), {time.perf_counter() - inicio:.1f} s")
+
+    return {"entregas": migradas, "bytes_codigo": bytes_antes}
+
+
+def limpiar(db) -> int:
+    """
+    Borra los blobs a los que ya no apunta ninguna entrega (p.ej. tras borrarlas).
+    Espera a que acaben las transacciones que están guardando entregas y no
+    deja empezar otras hasta el commit (ver codigos.excluir_limpieza).
+    """
+    import models
+    import codigos
+
+    codigos.excluir_limpieza(db, exclusivo=True)
+    usados = db.query(models.Entrega.codigo_hash).filter(models.Entrega.codigo_hash.isnot(None))
+    borrados = db.query(models.Codigo)\
+        .filter(models.Codigo.hash.notin_(usados))\
+        .delete(synchronize_session=False)
+    db.commit()
+    return borrados
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default=None, help="DATABASE_URL (por defecto la del .env)")
+    parser.add_argument("--lote", type=int, default=LOTE)
+    parser.add_argument("--limpiar", action="store_true", help="borrar blobs sin entregas")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM al acabar (solo SQLite)")
+    args = parser.parse_args()
+
+    if args.url:
+        os.environ["DATABASE_URL"] = args.url
+
+    from sqlalchemy import func, text
+    import database
+    import models
+    from crear_esquema import crear
+
+    crear(database.engine)
+
+    db = database.SessionLocal()
+    try:
+        informe = migrar(db, args.lote)
+        print(f"Migradas: {informe['entregas']} entregas ({informe['bytes_codigo'] / 1e6:.1f} MB de código)")
+
+        if args.limpiar:
+            print(f"Blobs huérfanos borrados: {limpiar(db)}")
+
+        blobs, original, guardado = db.query(
+            func.count(models.Codigo.hash),
+            func.coalesce(func.sum(models.Codigo.tamano), 0),
+            func.coalesce(func.sum(func.length(models.Codigo.datos)), 0),
+        ).one()
+        entregas = db.query(func.count(models.Entrega.id)).scalar()
+        print(f"Tabla codigos: {blobs} blobs distintos para {entregas} entregas, "
+              f"{original / 1e6:.1f} MB de texto en {guardado / 1e6:.1f} MB")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if args.vacuum and database.ES_SQLITE:
+        print("VACUUM...")
+        with database.engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 # backend/models.py
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index, UniqueConstraint, LargeBinary
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -29,6 +29,11 @@ class Ejercicio(Base):
     categoria = relationship("Categoria", back_populates="ejercicios")
     entregas = relationship("Entrega", back_populates="ejercicio")
 
+    __table_args__ = (
+        # listados admin filtrados por categoría y paginados por id
+        Index("ix_ejercicios_categoria_id_id", "categoria_id", "id"),
+    )
+
 # ------------------ Usuarios ------------------
 class Usuario(Base):
     __tablename__ = "usuarios"
@@ -41,6 +46,17 @@ class Usuario(Base):
 
     entregas = relationship("Entrega", back_populates="usuario")
 
+# ------------------ Código de las entregas ------------------
+# Un blob comprimido por contenido distinto; clave = sha256 del texto
+class Codigo(Base):
+    __tablename__ = "codigos"
+
+    hash = Column(String(64), primary_key=True)
+    compresion = Column(String(8), nullable=False)  # zstd, zlib o nada
+    tamano = Column(Integer, nullable=False)        # caracteres sin comprimir
+    datos = Column(LargeBinary, nullable=False)
+
+
 # ------------------ Entregas ------------------
 class Entrega(Base):
     __tablename__ = "entregas"
@@ -48,10 +64,104 @@ class Entrega(Base):
     id = Column(Integer, primary_key=True, index=True)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"))
     ejercicio_id = Column(Integer, ForeignKey("ejercicios.id"))
-    codigo = Column(Text, nullable=False)
+    # Vacío en las entregas nuevas: el código está en `codigos` (ver codigos.py)
+    codigo = Column(Text, nullable=False, default="")
+    codigo_hash = Column(String(64), ForeignKey("codigos.hash"), nullable=True, index=True)
     fecha_envio = Column(DateTime, default=datetime.utcnow)
     resultado = Column(String, nullable=True)
 
     usuario = relationship("Usuario")
     ejercicio = relationship("Ejercicio")
 
+    # Índices para paginación por cursor sobre (fecha_envio, id) con cada filtro
+    __table_args__ = (
+        Index("ix_entregas_fecha_envio_id", "fecha_envio", "id"),
+        Index("ix_entregas_usuario_fecha_envio_id", "usuario_id", "fecha_envio", "id"),
+        Index("ix_entregas_ejercicio_fecha_envio_id", "ejercicio_id", "fecha_envio", "id"),
+        Index("ix_entregas_resultado_fecha_envio_id", "resultado", "fecha_envio", "id"),
+    )
+
+
+# ------------------ Tickets de la ingesta diferida ------------------
+# Ticket de POST /api/entregas -> entrega guardada (entrega_id None si se descartó).
+# Se escribe en la misma transacción que el lote (ver ingesta.py) para que
+# cualquier worker pueda responder GET /api/entregas/ticket/{ticket}
+class TicketEntrega(Base):
+    __tablename__ = "tickets_entrega"
+
+    ticket = Column(String(65), primary_key=True)
+    entrega_id = Column(Integer, nullable=True)
+    fecha = Column(DateTime, default=datetime.utcnow)
+
+
+# ------------------ Progreso ------------------
+# Resumen usuario × ejercicio que mantienen los endpoints de entregas (ver progreso.py)
+class Progreso(Base):
+    __tablename__ = "progreso"
+
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), primary_key=True)
+    ejercicio_id = Column(Integer, ForeignKey("ejercicios.id"), primary_key=True)
+    intentos = Column(Integer, nullable=False, default=0)
+    primera_entrega = Column(DateTime)
+    ultima_entrega = Column(DateTime)
+    ultima_entrega_id = Column(Integer)
+    ultimo_resultado = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_progreso_ejercicio_usuario", "ejercicio_id", "usuario_id"),
+    )
+
+
+# ------------------ Tokens de refresco ------------------
+# Solo se guarda el HMAC del token; cada renovación gasta el token y emite otro
+# de la misma familia (ver sesiones.py)
+class TokenRefresco(Base):
+    __tablename__ = "tokens_refresco"
+
+    id = Column(Integer, primary_key=True, index=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False, index=True)
+    hash_token = Column(String(64), nullable=False, unique=True, index=True)
+    familia = Column(String(32), nullable=False, index=True)
+    creado = Column(DateTime, default=datetime.utcnow)
+    expira = Column(DateTime, nullable=False)
+    usado = Column(DateTime, nullable=True)
+
+
+# ------------------ Contadores ------------------
+# Totales materializados para /api/admin/estadisticas (ver estadisticas.py)
+class Contador(Base):
+    __tablename__ = "contadores"
+
+    nombre = Column(String, primary_key=True)
+    valor = Column(Integer, nullable=False, default=0)
+
+
+# ------------------ Casos de prueba ------------------
+# Entrada (líneas para input()) y salida esperada para la corrección automática
+class CasoPrueba(Base):
+    __tablename__ = "casos_prueba"
+
+    id = Column(Integer, primary_key=True, index=True)
+    ejercicio_id = Column(Integer, ForeignKey("ejercicios.id", ondelete="CASCADE"), nullable=False, index=True)
+    orden = Column(Integer, nullable=False, default=0)
+    entrada = Column(Text, nullable=False, default="")
+    salida_esperada = Column(Text, nullable=False, default="")
+
+
+# ------------------ Correcciones ------------------
+# Memo de la corrección automática: mismo ejercicio + mismo código + mismos casos
+# = mismo resultado, así que una entrega repetida no se vuelve a ejecutar
+class Correccion(Base):
+    __tablename__ = "correcciones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    ejercicio_id = Column(Integer, ForeignKey("ejercicios.id", ondelete="CASCADE"), nullable=False)
+    hash_codigo = Column(String(64), nullable=False)
+    hash_casos = Column(String(64), nullable=False)
+    resultado = Column(String, nullable=False)
+    detalle = Column(Text)  # JSON con el estado de cada caso
+    fecha = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("ejercicio_id", "hash_codigo", "hash_casos", name="uq_correcciones_clave"),
+    )
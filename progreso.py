@@ -0,0 +1,220 @@
+# backend/progreso.py
+"""
+Progreso de cada alumno por ejercicio y por categoría.
+
+La tabla `progreso` resume las entregas por (usuario, ejercicio): intentos,
+primera y última entrega y el resultado de la última. La mantienen, dentro
+de su misma transacción, los endpoints que crean, revisan o borran entregas,
+la ingesta por lotes y el corrector; así leer el progreso de un alumno es
+una búsqueda por clave primaria en lugar de recorrer `entregas`.
+
+recalcular() la rehace desde `entregas` (toda, o solo un usuario/ejercicio).
+"""
+from collections import defaultdict
+from sqlalchemy import and_, case, func, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import models
+
+# Resultados que cuentan como ejercicio resuelto
+RESULTADOS_RESUELTO = ("correcto",)
+
+P = models.Progreso
+E = models.Entrega
+
+
+# =========================================================
+# Mantenimiento incremental
+# =========================================================
+
+def registrar(db: Session, entregas: list):
+    """
+    Suma entregas nuevas [(usuario_id, ejercicio_id, fecha_envio, entrega_id), ...].
+    No hace commit: va en la transacción de quien inserta las entregas.
+    """
+    grupos = defaultdict(list)
+    for usuario_id, ejercicio_id, fecha_envio, entrega_id in entregas:
+        if usuario_id is not None and ejercicio_id is not None:
+            grupos[(usuario_id, ejercicio_id)].append((fecha_envio, entrega_id))
+
+    for (usuario_id, ejercicio_id), nuevas in grupos.items():
+        primera = min(nuevas)
+        ultima = max(nuevas)
+        if _sumar(db, usuario_id, ejercicio_id, len(nuevas), primera, ultima):
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(P), [{
+                    "usuario_id": usuario_id,
+                    "ejercicio_id": ejercicio_id,
+                    "intentos": len(nuevas),
+                    "primera_entrega": primera[0],
+                    "ultima_entrega": ultima[0],
+                    "ultima_entrega_id": ultima[1],
+                    "ultimo_resultado": None,
+                }])
+        except IntegrityError:
+            # Otra transacción creó la fila a la vez
+            _sumar(db, usuario_id, ejercicio_id, len(nuevas), primera, ultima)
+
+
+def _sumar(db: Session, usuario_id: int, ejercicio_id: int, n: int, primera: tuple, ultima: tuple) -> bool:
+    """
+    Las entregas no llegan siempre en orden (ingesta diferida, spools
+    reaplicados): primera y última solo se mueven si (fecha_envio, id) es
+    anterior / posterior a lo guardado. Los CASE leen la fila sin actualizar.
+    """
+    fecha, entrega_id = ultima
+    es_posterior = or_(
+        P.ultima_entrega.is_(None),
+        P.ultima_entrega < fecha,
+        and_(P.ultima_entrega == fecha, P.ultima_entrega_id < entrega_id),
+    )
+    return db.query(P).filter(P.usuario_id == usuario_id, P.ejercicio_id == ejercicio_id).update({
+        P.intentos: P.intentos + n,
+        P.primera_entrega: case(
+            (or_(P.primera_entrega.is_(None), P.primera_entrega > primera[0]), primera[0]),
+            else_=P.primera_entrega,
+        ),
+        P.ultima_entrega: case((es_posterior, fecha), else_=P.ultima_entrega),
+        P.ultima_entrega_id: case((es_posterior, entrega_id), else_=P.ultima_entrega_id),
+        P.ultimo_resultado: case((es_posterior, None), else_=P.ultimo_resultado),
+    }, synchronize_session=False) > 0
+
+
+def actualizar_resultado(db: Session, entrega_id: int, usuario_id: int, ejercicio_id: int, resultado: str):
+    """
+    Solo cambia el resumen si la entrega es la última del alumno en ese ejercicio.
+    """
+    db.query(P).filter(
+        P.usuario_id == usuario_id,
+        P.ejercicio_id == ejercicio_id,
+        P.ultima_entrega_id == entrega_id,
+    ).update({P.ultimo_resultado: resultado}, synchronize_session=False)
+
+
+def eliminar(db: Session, usuario_id: int = None, ejercicio_id: int = None):
+    q = db.query(P)
+    if usuario_id is not None:
+        q = q.filter(P.usuario_id == usuario_id)
+    if ejercicio_id is not None:
+        q = q.filter(P.ejercicio_id == ejercicio_id)
+    q.delete(synchronize_session=False)
+
+
+def recalcular(db: Session, usuario_id: int = None, ejercicio_id: int = None) -> int:
+    """
+    Rehace las filas desde `entregas` en un solo INSERT ... SELECT con funciones
+    de ventana. Sin argumentos rehace toda la tabla. No hace commit.
+    """
+    eliminar(db, usuario_id, ejercicio_id)
+
+    grupo = (E.usuario_id, E.ejercicio_id)
+    filtros = [E.usuario_id.isnot(None), E.ejercicio_id.isnot(None)]
+    if usuario_id is not None:
+        filtros.append(E.usuario_id == usuario_id)
+    if ejercicio_id is not None:
+        filtros.append(E.ejercicio_id == ejercicio_id)
+
+    ventana = select(
+        E.usuario_id,
+        E.ejercicio_id,
+        func.count().over(partition_by=grupo).label("intentos"),
+        func.min(E.fecha_envio).over(partition_by=grupo).label("primera_entrega"),
+        E.fecha_envio.label("ultima_entrega"),
+        E.id.label("ultima_entrega_id"),
+        E.resultado.label("ultimo_resultado"),
+        func.row_number().over(partition_by=grupo, order_by=(E.fecha_envio.desc(), E.id.desc())).label("n"),
+    ).where(*filtros).subquery()
+
+    columnas = ["usuario_id", "ejercicio_id", "intentos", "primera_entrega",
+                "ultima_entrega", "ultima_entrega_id", "ultimo_resultado"]
+    resultado = db.execute(
+        insert(P).from_select(columnas, select(*[ventana.c[c] for c in columnas]).where(ventana.c.n == 1))
+    )
+    return resultado.rowcount
+
+
+def recalcular_si_vacio(db: Session):
+    # Primer arranque con entregas anteriores a la tabla de progreso
+    if db.query(P.usuario_id).first() is None and db.query(E.id).first() is not None:
+        recalcular(db)
+        db.commit()
+
+
+# =========================================================
+# Lectura
+# =========================================================
+
+def _resueltos():
+    return func.count(case((P.ultimo_resultado.in_(RESULTADOS_RESUELTO), 1)))
+
+
+def de_alumno(db: Session, usuario_id: int, categoria_id: int = None) -> dict:
+    """
+    Progreso de un alumno: un resumen por categoría y el detalle por ejercicio.
+    """
+    # Categorías: todos los ejercicios del catálogo, con el progreso del alumno si lo hay
+    q = db.query(
+        models.Ejercicio.categoria_id,
+        models.Categoria.nombre,
+        func.count(models.Ejercicio.id).label("ejercicios"),
+        func.count(P.ejercicio_id).label("intentados"),
+        _resueltos().label("resueltos"),
+        func.coalesce(func.sum(P.intentos), 0).label("intentos"),
+    )\
+        .outerjoin(models.Categoria, models.Ejercicio.categoria_id == models.Categoria.id)\
+        .outerjoin(P, (P.ejercicio_id == models.Ejercicio.id) & (P.usuario_id == usuario_id))
+    if categoria_id is not None:
+        q = q.filter(models.Ejercicio.categoria_id == categoria_id)
+    categorias = q.group_by(models.Ejercicio.categoria_id, models.Categoria.nombre)\
+        .order_by(models.Ejercicio.categoria_id)\
+        .all()
+
+    # Ejercicios: las filas de progreso del alumno (clave primaria)
+    q = db.query(
+        P.ejercicio_id,
+        models.Ejercicio.titulo,
+        models.Ejercicio.categoria_id,
+        P.intentos,
+        P.primera_entrega,
+        P.ultima_entrega,
+        P.ultimo_resultado,
+    ).join(models.Ejercicio, P.ejercicio_id == models.Ejercicio.id)\
+        .filter(P.usuario_id == usuario_id)
+    if categoria_id is not None:
+        q = q.filter(models.Ejercicio.categoria_id == categoria_id)
+    ejercicios = q.order_by(P.ultima_entrega.desc()).all()
+
+    return {
+        "usuario_id": usuario_id,
+        "categorias": [c._asdict() for c in categorias],
+        "ejercicios": [e._asdict() for e in ejercicios],
+    }
+
+
+def de_clase(db: Session, categoria_id: int = None, ejercicio_id: int = None) -> list:
+    """
+    Una fila por alumno con lo que lleva hecho (opcionalmente de una categoría o ejercicio).
+    """
+    condicion = P.usuario_id == models.Usuario.id
+    if ejercicio_id is not None:
+        condicion = condicion & (P.ejercicio_id == ejercicio_id)
+    if categoria_id is not None:
+        ids = select(models.Ejercicio.id).where(models.Ejercicio.categoria_id == categoria_id)
+        condicion = condicion & P.ejercicio_id.in_(ids)
+
+    filas = db.query(
+        models.Usuario.id.label("usuario_id"),
+        models.Usuario.nombre,
+        func.count(P.ejercicio_id).label("intentados"),
+        _resueltos().label("resueltos"),
+        func.coalesce(func.sum(P.intentos), 0).label("intentos"),
+        func.max(P.ultima_entrega).label("ultima_entrega"),
+    ).outerjoin(P, condicion)\
+        .filter(models.Usuario.rol == "alumno")\
+        .group_by(models.Usuario.id, models.Usuario.nombre)\
+        .order_by(models.Usuario.nombre)\
+        .all()
+
+    return [f._asdict() for f in filas]
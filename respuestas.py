@@ -0,0 +1,44 @@
+# backend/respuestas.py
+"""
+Clase de respuesta por defecto de la app (orjson) y atajo para listados.
+
+Los endpoints con response_model validan y serializan con pydantic y luego
+render() solo convierte a bytes. Los listados grandes devuelven directamente
+respuesta_lista(): las filas ya salen de la consulta como tuplas/dicts con los
+campos justos, así que se saltan la validación y el jsonable_encoder.
+"""
+import json
+from datetime import date, datetime
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # sin orjson se usa json, más lento pero mismo resultado
+    orjson = None
+
+
+def _por_defecto(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"{type(valor).__name__} no es serializable a JSON")
+
+
+def codificar(datos) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(datos, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        datos, ensure_ascii=False, separators=(",", ":"), default=_por_defecto
+    ).encode("utf-8")
+
+
+class RespuestaJSON(JSONResponse):
+    def render(self, content) -> bytes:
+        return codificar(content)
+
+
+def respuesta_lista(filas: list, siguiente: str = None) -> RespuestaJSON:
+    """
+    Listado ya construido + cabecera X-Next-Cursor si hay más páginas.
+    """
+    headers = {"X-Next-Cursor": siguiente} if siguiente else None
+    return RespuestaJSON(content=filas, headers=headers)
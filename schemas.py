@@ -0,0 +1,191 @@
+# backend/schemas.py
+from datetime import datetime
+from typing import Dict, List, Optional
+from pydantic import BaseModel, ConfigDict
+
+# Modelos de entrada compartidos por main.py y api_async.py
+
+class UsuarioCreate(BaseModel):
+    email: str
+    nombre: str
+    password: str
+
+class LoginRequest(BaseModel):
+    nombre: str
+    password: str
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class EntregaCreate(BaseModel):
+    usuario_id: int
+    ejercicio_id: int
+    codigo: str
+
+
+# Modelos de salida (response_model): documentan la API y garantizan que
+# no se cuela ningún campo interno, como hashed_password
+
+
+class Mensaje(BaseModel):
+    mensaje: str
+
+
+class CategoriaOut(BaseModel):
+    id: int
+    nombre: Optional[str] = None
+
+
+class EjercicioResumen(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    titulo: Optional[str] = None
+    dificultad: Optional[str] = None
+    lenguaje: Optional[str] = None
+    categoria_id: Optional[int] = None
+    subcategoria: Optional[str] = None
+
+
+class EjercicioDetalle(EjercicioResumen):
+    enunciado: Optional[str] = None
+    solucion: Optional[str] = None
+
+
+class ResultadoBusqueda(EjercicioResumen):
+    puntuacion: float
+
+
+class Busqueda(BaseModel):
+    total: int
+    resultados: List[ResultadoBusqueda]
+    facetas: Dict[str, dict]
+
+
+class UsuarioBasico(BaseModel):
+    id: int
+    nombre: str
+
+
+class UsuarioSesion(UsuarioBasico):
+    rol: Optional[str] = None
+
+
+class UsuarioOut(UsuarioSesion):
+    model_config = ConfigDict(from_attributes=True)
+
+    email: Optional[str] = None
+
+
+class LoginOut(BaseModel):
+    access_token: str
+    refresh_token: Optional[str] = None
+    usuario: UsuarioSesion
+
+
+class UsuarioCreado(Mensaje):
+    usuario: UsuarioBasico
+
+
+class Creado(Mensaje):
+    id: int
+
+
+class EntregaRecibida(Mensaje):
+    # entrega_id si se guardó al momento; ticket si va por la ingesta diferida
+    entrega_id: Optional[int] = None
+    ticket: Optional[str] = None
+
+
+class EstadoEntrega(BaseModel):
+    estado: str
+    entrega_id: Optional[int] = None
+
+
+class EntregaResumen(BaseModel):
+    id: int
+    usuario: Optional[str] = None
+    ejercicio: Optional[str] = None
+    fecha_envio: Optional[datetime] = None
+
+
+class EntregaAdmin(EntregaResumen):
+    codigo: Optional[str] = None
+    resultado: Optional[str] = None
+    categoria_id: Optional[int] = None
+
+
+class UltimaEntrega(BaseModel):
+    usuario: Optional[str] = None
+    ejercicio: Optional[str] = None
+    fecha_envio: Optional[str] = None
+
+
+class Estadisticas(BaseModel):
+    usuarios: int
+    admins: int
+    alumnos: int
+    categorias: int
+    ejercicios: int
+    entregas: int
+    ultimas_entregas: List[UltimaEntrega]
+
+
+class EjercicioImportado(BaseModel):
+    index: int
+    id: int
+    titulo: Optional[str] = None
+
+
+class ErrorImportacion(BaseModel):
+    index: int
+    titulo: Optional[str] = None
+    error: str
+
+
+class InformeImportacion(Mensaje):
+    insertados: int
+    errores: int
+    ejercicios_creados: List[EjercicioImportado]
+    detalle_errores: List[ErrorImportacion]
+
+
+class ProgresoCategoria(BaseModel):
+    categoria_id: Optional[int] = None
+    nombre: Optional[str] = None
+    ejercicios: int
+    intentados: int
+    resueltos: int
+    intentos: int
+
+
+class ProgresoEjercicio(BaseModel):
+    ejercicio_id: int
+    titulo: Optional[str] = None
+    categoria_id: Optional[int] = None
+    intentos: int
+    primera_entrega: Optional[datetime] = None
+    ultima_entrega: Optional[datetime] = None
+    ultimo_resultado: Optional[str] = None
+
+
+class ProgresoOut(BaseModel):
+    usuario_id: int
+    categorias: List[ProgresoCategoria]
+    ejercicios: List[ProgresoEjercicio]
+
+
+class ProgresoAlumno(BaseModel):
+    usuario_id: int
+    nombre: Optional[str] = None
+    intentados: int
+    resueltos: int
+    intentos: int
+    ultima_entrega: Optional[datetime] = None
+
+
+class CasoPruebaOut(BaseModel):
+    id: int
+    orden: int
+    entrada: str
+    salida_esperada: str
@@ -1,39 +1,130 @@
 # backend/seed.py
+"""
+Sincroniza categorías y ejercicios de exercices.json con la BD.
+
+    python seed.py                 # inserta los ejercicios que faltan
+    python seed.py --sincronizar   # además actualiza los que han cambiado en el JSON
+
+Se cargan títulos y contenido existentes en una sola query, se calcula el
+diff por hash de contenido y se aplica todo en una única transacción, así que
+volver a lanzarlo sin cambios es prácticamente gratis.
+"""
+import argparse
+import hashlib
 import json
 import os
 import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from sqlalchemy import insert, update
 from database import SessionLocal, engine, Base
 from models import Categoria, Ejercicio
+import estadisticas
 
-Base.metadata.create_all(bind=engine)
-db = SessionLocal()
+CATEGORIAS_NOMBRES = ["Print/Input", "If/Elif/Else", "Bucles", "Arrays", "Funcions", "POO"]
 
-categorias_nombres = ["Print/Input", "If/Elif/Else", "Bucles", "Arrays", "Funcions", "POO"]
-categorias_db = {}
+CAMPOS = ["titulo", "enunciado", "solucion", "dificultad", "lenguaje", "categoria_id", "subcategoria"]
 
-for nombre in categorias_nombres:
-    categoria = db.query(Categoria).filter(Categoria.nombre == nombre).first()
-    if not categoria:
-        categoria = Categoria(nombre=nombre)
-        db.add(categoria)
-        db.commit()
-    categorias_db[nombre] = categoria
 
-with open("exercices.json", encoding="utf-8") as f:
-    ejercicios_data = json.load(f)
+def hash_contenido(fila: dict) -> str:
+    datos = json.dumps([fila.get(c) for c in CAMPOS], ensure_ascii=False)
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+
+def sincronizar_categorias(db, nombres) -> dict:
+    existentes = {c.nombre: c.id for c in db.query(Categoria.id, Categoria.nombre)}
+
+    nuevas = [{"nombre": n} for n in nombres if n not in existentes]
+    if nuevas:
+        for fila in db.execute(insert(Categoria).returning(Categoria.id, Categoria.nombre), nuevas):
+            existentes[fila.nombre] = fila.id
+        estadisticas.sumar(db, categorias=len(nuevas))
+
+    return existentes
+
+
+def sincronizar_ejercicios(db, ejercicios_data, categorias_db, aplicar_cambios: bool) -> dict:
+    # Una sola query: id + contenido de todos los ejercicios existentes.
+    # El JSON puede repetir títulos: la k-ésima aparición de un título en el
+    # JSON se corresponde con la k-ésima fila (por id) con ese título.
+    existentes = {}
+    for e in db.query(Ejercicio.id, *[getattr(Ejercicio, c) for c in CAMPOS]).order_by(Ejercicio.id):
+        existentes.setdefault(e.titulo, []).append((e.id, hash_contenido(e._asdict())))
+
+    vistos = {}
+    nuevos, cambiados = [], []
+    sin_cambios = 0
+
+    for ej in ejercicios_data:
+        categoria_id = categorias_db.get(ej.get("categoria_nombre"))
+        if categoria_id is None:
+            continue
+
+        fila = {c: ej.get(c) for c in CAMPOS}
+        fila["categoria_id"] = categoria_id
+
+        k = vistos.get(fila["titulo"], 0)
+        vistos[fila["titulo"]] = k + 1
+        filas_titulo = existentes.get(fila["titulo"], [])
+
+        if k >= len(filas_titulo):
+            nuevos.append(fila)
+        elif filas_titulo[k][1] == hash_contenido(fila):
+            sin_cambios += 1
+        else:
+            cambiados.append({"id": filas_titulo[k][0], **fila})
+
+    if nuevos:
+        db.execute(insert(Ejercicio), nuevos)
+        estadisticas.sumar(db, ejercicios=len(nuevos))
+
+    if cambiados and aplicar_cambios:
+        # UPDATE por clave primaria en bloque (executemany)
+        db.execute(update(Ejercicio), cambiados)
+
+    return {
+        "insertados": len(nuevos),
+        "actualizados": len(cambiados) if aplicar_cambios else 0,
+        "modificados_sin_aplicar": 0 if aplicar_cambios else len(cambiados),
+        "sin_cambios": sin_cambios,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--archivo", default="exercices.json")
+    parser.add_argument("--sincronizar", action="store_true",
+                        help="actualizar también los ejercicios cuyo contenido ha cambiado")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+
+    with open(args.archivo, encoding="utf-8") as f:
+        ejercicios_data = json.load(f)
+
+    db = SessionLocal()
+    try:
+        categorias_db = sincronizar_categorias(db, CATEGORIAS_NOMBRES)
+        informe = sincronizar_ejercicios(db, ejercicios_data, categorias_db, args.sincronizar)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
-for ej in ejercicios_data:
-    existente = db.query(Ejercicio).filter(Ejercicio.titulo == ej["titulo"]).first()
-    if existente:
-        continue
-    categoria = categorias_db.get(ej.pop("categoria_nombre"))
-    if categoria:
-        ejercicio = Ejercicio(**ej, categoria_id=categoria.id)
-        db.add(ejercicio)
+    print("✅ Base de datos actualizada con categorías y ejercicios.")
+    print(
+        f"   insertados: {informe['insertados']}, "
+        f"actualizados: {informe['actualizados']}, "
+        f"sin cambios: {informe['sin_cambios']}"
+    )
+    if informe["modificados_sin_aplicar"]:
+        print(
+            f"   {informe['modificados_sin_aplicar']} ejercicios difieren del JSON; "
+            "usa --sincronizar para actualizarlos."
+        )
 
-db.commit()
 
-print("✅ Base de datos actualizada con categorías y ejercicios.")
-db.close()
+if __name__ == "__main__":
+    main()
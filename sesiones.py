@@ -0,0 +1,147 @@
+# backend/sesiones.py
+"""
+Tokens de refresco: renovar la sesión sin volver a pasar por bcrypt.
+
+El login devuelve, además del access token (JWT de 30 minutos), un token de
+refresco opaco. POST /api/token/refresh lo cambia por un access token nuevo
+y otro token de refresco: comprobarlo es un HMAC-SHA256 y una búsqueda por
+índice, no un hash de contraseña.
+
+- En la BD solo se guarda el HMAC del token (con SECRET_KEY): quien lea la
+  tabla no puede usarlos.
+- Rotación: cada token sirve una vez. Todos los que salen de un mismo login
+  forman una familia; si se presenta uno ya gastado (robado y usado por
+  otro) se revoca la familia entera. Durante REFRESCO_GRACIA_S segundos un
+  token gastado aún se cambia por otro de la familia, para dos pestañas que
+  renuevan a la vez.
+- revocar_usuario() los borra todos: al borrar el usuario o cambiarle la
+  contraseña.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+import models
+from dependencies import SECRET_KEY, create_access_token
+
+REFRESCO_DIAS = float(os.getenv("REFRESCO_DIAS", "7"))
+REFRESCO_GRACIA_S = float(os.getenv("REFRESCO_GRACIA_S", "30"))
+
+
+def _hmac(token: str) -> str:
+    return hmac.new(SECRET_KEY.encode("utf-8"), token.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _invalido():
+    return HTTPException(status_code=401, detail="Token de refresco inválido o expirado")
+
+
+def emitir(db: Session, usuario_id: int, familia: str = None) -> str:
+    """
+    Crea un token de refresco (familia nueva si no se indica). No hace commit.
+    """
+    ahora = datetime.utcnow()
+    token = secrets.token_urlsafe(32)
+    db.add(models.TokenRefresco(
+        usuario_id=usuario_id,
+        hash_token=_hmac(token),
+        familia=familia or secrets.token_hex(16),
+        creado=ahora,
+        expira=ahora + timedelta(days=REFRESCO_DIAS),
+    ))
+    # De paso, los caducados de este usuario (índice por usuario_id)
+    db.query(models.TokenRefresco).filter(
+        models.TokenRefresco.usuario_id == usuario_id,
+        models.TokenRefresco.expira < ahora,
+    ).delete(synchronize_session=False)
+    return token
+
+
+def iniciar(db: Session, usuario_id: int) -> str:
+    """
+    Token de refresco de una sesión nueva (login). Hace commit.
+    """
+    token = emitir(db, usuario_id)
+    db.commit()
+    return token
+
+
+def respuesta(usuario, refresh_token: str) -> dict:
+    """
+    Cuerpo de /api/login y /api/token/refresh (LoginOut).
+    """
+    return {
+        "access_token": create_access_token({
+            "sub": str(usuario.id),
+            "nombre": usuario.nombre,
+            "rol": usuario.rol
+        }),
+        "refresh_token": refresh_token,
+        "usuario": {
+            "id": usuario.id,
+            "nombre": usuario.nombre,
+            "rol": usuario.rol
+        }
+    }
+
+
+def renovar(db: Session, token: str) -> tuple:
+    """
+    Gasta el token y devuelve (usuario, token nuevo). Hace commit.
+
+    Un token ya gastado hace menos de REFRESCO_GRACIA_S (dos pestañas, o la
+    respuesta anterior se perdió) recibe otro token nuevo de la misma
+    familia: el sucesor que ya se emitió no se puede devolver, solo se
+    guarda su HMAC.
+    """
+    T = models.TokenRefresco
+    ahora = datetime.utcnow()
+
+    fila = db.query(T.id, T.usuario_id, T.familia, T.expira, T.usado)\
+        .filter(T.hash_token == _hmac(token))\
+        .first()
+    if fila is None or fila.expira <= ahora:
+        raise _invalido()
+
+    if fila.usado is not None and ahora - fila.usado > timedelta(seconds=REFRESCO_GRACIA_S):
+        # Reutilización: alguien más tiene la cadena de tokens
+        db.query(T).filter(T.familia == fila.familia).delete(synchronize_session=False)
+        db.commit()
+        raise _invalido()
+
+    if fila.usado is None:
+        # UPDATE condicional: de dos renovaciones simultáneas solo una lo marca;
+        # la otra, igual que un reintento dentro del margen, recibe un hermano
+        db.query(T).filter(T.id == fila.id, T.usado.is_(None))\
+            .update({T.usado: ahora}, synchronize_session=False)
+
+    usuario = db.query(models.Usuario).filter(models.Usuario.id == fila.usuario_id).first()
+    if usuario is None:
+        db.rollback()
+        raise _invalido()
+
+    nuevo = emitir(db, usuario.id, fila.familia)
+    db.commit()
+    return usuario, nuevo
+
+
+def revocar(db: Session, token: str):
+    """
+    Cierra la sesión: borra la familia del token. No hace commit.
+    """
+    T = models.TokenRefresco
+    familia = db.query(T.familia).filter(T.hash_token == _hmac(token)).scalar()
+    if familia is not None:
+        db.query(T).filter(T.familia == familia).delete(synchronize_session=False)
+
+
+def revocar_usuario(db: Session, usuario_id: int):
+    """
+    Borra todos los tokens de refresco del usuario. No hace commit.
+    """
+    db.query(models.TokenRefresco)\
+        .filter(models.TokenRefresco.usuario_id == usuario_id)\
+        .delete(synchronize_session=False)
@@ -0,0 +1,138 @@
+# backend/tests/conftest.py
+"""
+Fixtures comunes: la app de main.py contra un SQLite temporal.
+
+Las variables de entorno se fijan antes de importar nada del backend (cada
+módulo lee su configuración al importarse). Antes de cada test se vacían las
+tablas y las cachés en memoria del proceso.
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+DIRECTORIO = tempfile.mkdtemp(prefix="tests-backend-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DIRECTORIO, 'tests.db')}"
+os.environ.setdefault("SECRET_KEY", "tests")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("INGESTA_SPOOL_DIR", os.path.join(DIRECTORIO, "spool"))
+os.environ.setdefault("LIMITES_SQLITE_RUTA", os.path.join(DIRECTORIO, "limites.db"))
+
+from fastapi.testclient import TestClient
+
+import main
+import models
+import database
+import catalogo
+import buscador
+import dependencies
+import limites
+from crear_esquema import crear
+
+crear(database.engine)
+
+PASSWORD = "secreto"
+
+
+@pytest.fixture(autouse=True)
+def bd_limpia():
+    with database.engine.begin() as conn:
+        for tabla in reversed(models.Base.metadata.sorted_tables):
+            conn.execute(tabla.delete())
+    catalogo.invalidar()
+    buscador._indice = None
+    dependencies.tokens_cache.clear()
+    dependencies.principales_cache.clear()
+    if limites.middleware_actual is not None:
+        limites.middleware_actual.backend = limites.BackendMemoria()
+    yield
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def db():
+    sesion = database.SessionLocal()
+    try:
+        yield sesion
+    finally:
+        sesion.close()
+
+
+# =========================================================
+# Datos
+# =========================================================
+
+def crear_usuario(db, nombre: str, rol: str = "alumno") -> models.Usuario:
+    usuario = models.Usuario(
+        nombre=nombre,
+        email=f"{nombre}@example.com",
+        hashed_password=dependencies.get_password_hash(PASSWORD),
+        rol=rol,
+    )
+    db.add(usuario)
+    db.commit()
+    return usuario
+
+
+def crear_catalogo(db, ejercicios: int = 5, categorias: int = 1) -> list:
+    """
+    Devuelve los ids de los ejercicios creados, repartidos entre las categorías.
+    """
+    cats = [models.Categoria(nombre=f"Categoría {i}") for i in range(categorias)]
+    db.add_all(cats)
+    db.flush()
+    nuevos = [
+        models.Ejercicio(
+            titulo=f"Ejercicio {i}",
+            enunciado=f"Enunciado del ejercicio {i}",
+            solucion=f"print({i})",
+            dificultad=["fácil", "media", "difícil"][i % 3],
+            lenguaje="Python",
+            categoria_id=cats[i % categorias].id,
+        )
+        for i in range(ejercicios)
+    ]
+    db.add_all(nuevos)
+    db.commit()
+    return [e.id for e in nuevos]
+
+
+def crear_entregas(db, usuarios: list, ejercicios: list, n: int, inicio: datetime = datetime(2026, 1, 1)):
+    """
+    n entregas con el código en la tabla de blobs, repartidas entre usuarios y ejercicios.
+    """
+    import codigos
+    import progreso
+
+    textos = [f"print({i})" for i in range(n)]
+    hashes = codigos.guardar_muchos(db, textos)
+    filas = [
+        models.Entrega(
+            usuario_id=usuarios[i % len(usuarios)],
+            ejercicio_id=ejercicios[i % len(ejercicios)],
+            codigo="",
+            codigo_hash=hashes[i],
+            fecha_envio=inicio + timedelta(minutes=i),
+        )
+        for i in range(n)
+    ]
+    db.add_all(filas)
+    db.flush()
+    progreso.registrar(db, [(f.usuario_id, f.ejercicio_id, f.fecha_envio, f.id) for f in filas])
+    db.commit()
+    return filas
+
+
+def cabeceras(client, nombre: str) -> dict:
+    r = client.post("/api/login", json={"nombre": nombre, "password": PASSWORD})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
@@ -0,0 +1,128 @@
+# backend/tests/test_api_async.py
+"""
+Rutas de api_async.py (DB_ASYNC=1) con aiosqlite, montadas en una app aparte.
+"""
+import asyncio
+import threading
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import api_async
+import catalogo
+import database
+from conftest import PASSWORD, crear_catalogo, crear_entregas, crear_usuario
+from respuestas import RespuestaJSON
+
+pytest.importorskip("aiosqlite")
+
+
+@pytest.fixture
+def app():
+    app = FastAPI(default_response_class=RespuestaJSON)
+    app.include_router(api_async.router)
+    return app
+
+
+def ejecutar(corrutina, limite_s: float = 20):
+    """
+    Corre la corrutina en su propio hilo y event loop. Si el loop se bloquea,
+    ni asyncio.wait_for salta: el límite se comprueba desde fuera.
+    """
+    resultado = {}
+
+    async def envolver():
+        try:
+            resultado["valor"] = await corrutina
+        finally:
+            await database.dispose_async_engine()
+
+    def correr():
+        try:
+            asyncio.run(envolver())
+        except BaseException as e:
+            resultado["error"] = e
+
+    hilo = threading.Thread(target=correr, daemon=True)
+    hilo.start()
+    hilo.join(limite_s)
+    assert not hilo.is_alive(), "el event loop se ha quedado bloqueado"
+    if "error" in resultado:
+        raise resultado["error"]
+    return resultado["valor"]
+
+
+def cliente(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://async")
+
+
+async def cabeceras(c, nombre: str) -> dict:
+    r = await c.post("/api/login", json={"nombre": nombre, "password": PASSWORD})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+def test_login_entregas(app, db):
+    alumno = crear_usuario(db, "alumno")
+    [ejercicio] = crear_catalogo(db, ejercicios=1)
+
+    async def probar():
+        async with cliente(app) as c:
+            h = await cabeceras(c, "alumno")
+            r = await c.post("/api/entregas", json={"usuario_id": alumno.id, "ejercicio_id": ejercicio, "codigo": "print(1)"}, headers=h)
+            assert r.status_code == 200, r.text
+            r = await c.get("/api/entregas", headers=h)
+            return r.json()
+
+    [entrega] = ejecutar(probar())
+    assert entrega["ejercicio"] == "Ejercicio 0"
+
+
+def test_catalogo_caducado_con_concurrencia(app, db, monkeypatch):
+    # Con el snapshot siempre caducado cada request lo reconstruye: no debe bloquear el loop
+    monkeypatch.setattr(catalogo, "CATALOGO_TTL", 0.0)
+    alumno = crear_usuario(db, "alumno")
+    ejercicios = crear_catalogo(db, ejercicios=50, categorias=3)
+    crear_entregas(db, [alumno.id], ejercicios, 10)
+
+    async def probar():
+        async with cliente(app) as c:
+            h = await cabeceras(c, "alumno")
+            respuestas = await asyncio.gather(*[
+                c.get(url, headers=h)
+                for _ in range(10)
+                for url in ("/api/categorias", "/api/ejercicios")
+            ])
+            return [r.status_code for r in respuestas], (await c.get("/api/ejercicios", headers=h)).json()
+
+    estados, ejercicios_api = ejecutar(probar())
+    assert estados == [200] * 20
+    assert len(ejercicios_api) == 50
+
+
+def test_detalle_sin_solucion_para_alumnos(app, db):
+    crear_usuario(db, "alumno")
+    [ejercicio] = crear_catalogo(db, ejercicios=1)
+
+    async def probar():
+        async with cliente(app) as c:
+            r = await c.get(f"/api/ejercicios/{ejercicio}", headers=await cabeceras(c, "alumno"))
+            return r.json()
+
+    detalle = ejecutar(probar())
+    assert detalle["titulo"] == "Ejercicio 0"
+    assert "solucion" not in detalle
+
+
+def test_pool_async_con_metricas(app, db):
+    crear_usuario(db, "alumno")
+
+    async def probar():
+        async with cliente(app) as c:
+            await cabeceras(c, "alumno")
+        return database.estadisticas_pool()
+
+    pool = ejecutar(probar())
+    assert pool["async"]["checkouts"] >= 1
+    assert pool["async"]["conexiones_creadas"] >= 1
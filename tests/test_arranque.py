@@ -0,0 +1,22 @@
+# backend/tests/test_arranque.py
+import os
+import subprocess
+import sys
+
+from conftest import RAIZ
+
+
+def test_importado_cuenta_todos_los_imports_de_main():
+    codigo = (
+        "import time; t0 = time.perf_counter(); import main, arranque; "
+        "print(time.perf_counter() - t0, arranque.estado()[1]['importado_s'])"
+    )
+    salida = subprocess.run([sys.executable, "-c", codigo], cwd=RAIZ, env=dict(os.environ),
+                            capture_output=True, text=True, check=True).stdout
+    total, importado = map(float, salida.split()[-2:])
+    # Con la referencia en arranque.py se quedaban fuera fastapi, SQLAlchemy y los modelos
+    assert importado >= total * 0.9
+
+
+def test_ping(client):
+    assert client.get("/api/ping").status_code == 200
@@ -0,0 +1,144 @@
+# backend/tests/test_buscador.py
+import random
+import time
+
+import pytest
+
+import buscador
+from buscador import IndiceEjercicios, K1
+from conftest import cabeceras, crear_catalogo, crear_usuario
+
+PALABRAS = ["bucle", "lista", "funcion", "recursion", "cadena", "diccionario", "ordenar", "suma"]
+
+
+def _documentos(n: int, semilla: int = 1) -> dict:
+    rnd = random.Random(semilla)
+    return {
+        i: {
+            "titulo": f"Ejercicio {rnd.choice(PALABRAS)}",
+            "enunciado": " ".join(rnd.choice(PALABRAS) for _ in range(rnd.randint(3, 40))),
+            "dificultad": rnd.choice(["fácil", "media", "difícil"]),
+            "lenguaje": "Python",
+            "categoria_id": rnd.randrange(3),
+            "subcategoria": None,
+        }
+        for i in range(1, n + 1)
+    }
+
+
+def _puntuaciones(indice, q: str) -> dict:
+    return {r["id"]: r["puntuacion"] for r in indice.buscar(q, limit=1000)["resultados"]}
+
+
+def test_primer_ejercicio_normalizado_con_su_propia_longitud():
+    indice = IndiceEjercicios()
+    indice.indexar(1, {"titulo": "Suma", "enunciado": "suma dos numeros"})
+    # longitud = media: la norma es K1 y el impacto tf * (K1 + 1) / (tf + K1)
+    tf = buscador.PESO_TITULO + 1
+    assert indice.postings["suma"][1] == pytest.approx(tf * (K1 + 1) / (tf + K1))
+
+
+def test_puntuacion_no_depende_del_orden_de_insercion(monkeypatch):
+    monkeypatch.setattr(buscador, "BUSCADOR_DERIVA_MEDIA", 0.0)
+    documentos = _documentos(200)
+
+    en_orden, al_reves, de_golpe = IndiceEjercicios(), IndiceEjercicios(), IndiceEjercicios()
+    for i in documentos:
+        en_orden.indexar(i, documentos[i])
+    for i in reversed(list(documentos)):
+        al_reves.indexar(i, documentos[i])
+    de_golpe.cargar(documentos.items())
+
+    for q in ["bucle", "lista suma", "recur"]:
+        esperado = _puntuaciones(de_golpe, q)
+        assert _puntuaciones(en_orden, q) == esperado
+        assert _puntuaciones(al_reves, q) == esperado
+
+
+def test_normas_se_recalculan_si_cambia_la_media():
+    indice = IndiceEjercicios()
+    indice.cargar(_documentos(50).items())
+    media = indice.media_normas
+    for i in range(100, 120):
+        indice.indexar(i, {"titulo": "Largo", "enunciado": "bucle " * 500})
+    assert abs(indice._media() - indice.media_normas) <= buscador.BUSCADOR_DERIVA_MEDIA * indice.media_normas
+    assert indice.media_normas > media * 2
+
+
+def test_campeones_dan_el_mismo_top_que_puntuar_todo(monkeypatch):
+    documentos = _documentos(600, semilla=7)
+    exacto = IndiceEjercicios()
+    exacto.cargar(documentos.items())
+
+    monkeypatch.setattr(buscador, "CAMPEONES", 50)
+    monkeypatch.setattr(buscador, "MAX_CANDIDATOS_DIRECTO", 10)
+    aproximado = IndiceEjercicios()
+    aproximado.cargar(documentos.items())
+
+    for q in ["bucle", "lista suma", "funcion rec"]:
+        r_exacto = exacto.buscar(q, limit=10)
+        r_aprox = aproximado.buscar(q, limit=10)
+        assert r_aprox["total"] == r_exacto["total"]
+        assert r_aprox["facetas"] == r_exacto["facetas"]
+        assert [r["puntuacion"] for r in r_aprox["resultados"]] == [r["puntuacion"] for r in r_exacto["resultados"]]
+
+
+def test_cache_de_busquedas_se_invalida_al_indexar():
+    indice = IndiceEjercicios()
+    indice.cargar(_documentos(20).items())
+    antes = indice.buscar("hanoi")
+    assert antes["total"] == 0
+    indice.indexar(99, {"titulo": "Torres de Hanói", "enunciado": "recursion"})
+    assert [r["id"] for r in indice.buscar("hanoi")["resultados"]] == [99]
+    indice.eliminar(99)
+    assert indice.buscar("hanoi")["total"] == 0
+
+
+def test_reconstruccion_conserva_cambios_concurrentes(db, monkeypatch):
+    ids = crear_catalogo(db, ejercicios=3)
+    buscador.obtener(db)
+
+    construir = buscador._construir
+
+    def construir_lento(sesion):
+        indice = construir(sesion)
+        # Cambios de admin_ejercicios mientras se lee la BD: no están en lo leído
+        buscador.indexar(1000, {"titulo": "Nuevo durante la reconstruccion", "dificultad": "fácil"})
+        buscador.eliminar(ids[0])
+        return indice
+
+    monkeypatch.setattr(buscador, "_construir", construir_lento)
+    monkeypatch.setattr(buscador, "_construido_en", time.monotonic() - buscador.BUSCADOR_TTL - 1)
+    viejo = buscador.obtener(db)
+    limite = time.monotonic() + 10
+    while buscador._reconstruyendo and time.monotonic() < limite:
+        time.sleep(0.01)
+
+    nuevo = buscador._indice
+    assert nuevo is not viejo
+    assert 1000 in nuevo.meta
+    assert ids[0] not in nuevo.meta
+    assert buscador._cambios is None
+
+
+def test_endpoint_mayusculas_y_prefijo(client, db):
+    crear_usuario(db, "ana")
+    crear_catalogo(db, ejercicios=3)
+    r = client.get("/api/ejercicios/buscar", params={"q": "ENUNCIADO ejer"}, headers=cabeceras(client, "ana"))
+    assert r.status_code == 200
+    assert r.json()["total"] == 3
+
+
+def test_facetas_de_dificultad_con_distintas_grafias(monkeypatch):
+    grafias = ["fácil", "Fácil", "facil", "fácil", "media", "Media"]
+    indice = IndiceEjercicios()
+    indice.cargar((i, {"titulo": "Bucle", "dificultad": d}) for i, d in enumerate(grafias, 1))
+
+    contando = indice.buscar("bucle")["facetas"]["dificultad"]
+    monkeypatch.setattr(buscador, "MAX_RESULTADOS_CONTEO", 1)
+    indice._resultados.clear()
+    intersecando = indice.buscar("bucle")["facetas"]["dificultad"]
+
+    assert contando == intersecando == {"fácil": 4, "Media": 2}
+    indice.eliminar(6)
+    assert indice.buscar("bucle")["facetas"]["dificultad"] == {"fácil": 4, "media": 1}
@@ -0,0 +1,67 @@
+# backend/tests/test_catalogo.py
+import threading
+import time
+
+import catalogo
+import compresion
+from conftest import cabeceras, crear_catalogo, crear_usuario
+
+
+def test_detalle_sin_solucion_para_alumnos(client, db):
+    crear_usuario(db, "alumno")
+    crear_usuario(db, "admin", "admin")
+    [ejercicio] = crear_catalogo(db, ejercicios=1)
+
+    r = client.get(f"/api/ejercicios/{ejercicio}", headers=cabeceras(client, "alumno"))
+    assert r.status_code == 200
+    assert r.json()["enunciado"] == "Enunciado del ejercicio 0"
+    assert "solucion" not in r.json()
+
+    r = client.get(f"/api/ejercicios/{ejercicio}", headers=cabeceras(client, "admin"))
+    assert r.json()["solucion"] == "print(0)"
+
+
+def test_listados_sin_textos_largos(client, db):
+    crear_usuario(db, "alumno")
+    crear_catalogo(db, ejercicios=3)
+    [e, *_] = client.get("/api/ejercicios", headers=cabeceras(client, "alumno")).json()
+    assert "solucion" not in e and "enunciado" not in e
+
+
+def test_detalle_inexistente(client, db):
+    crear_usuario(db, "alumno")
+    assert client.get("/api/ejercicios/999", headers=cabeceras(client, "alumno")).status_code == 404
+
+
+def test_listado_admin_valida_limit(client, db):
+    crear_usuario(db, "admin", "admin")
+    ids = crear_catalogo(db, ejercicios=3)
+    h = cabeceras(client, "admin")
+
+    for params in ({"limit": 0, "cursor": 100000}, {"limit": 1001}, {"skip": -1}):
+        assert client.get("/api/admin/ejercicios/", params=params, headers=h).status_code == 422
+
+    r = client.get("/api/admin/ejercicios/", params={"limit": 2, "cursor": 100000}, headers=h)
+    assert [e["id"] for e in r.json()] == sorted(ids, reverse=True)[:2]
+    assert r.headers["X-Next-Cursor"] == str(sorted(ids, reverse=True)[1])
+
+
+def test_variante_se_comprime_una_vez(monkeypatch):
+    snapshot = catalogo.Snapshot(0, [], [{"id": i, "titulo": "x" * 100} for i in range(100)])
+    llamadas = []
+    original = compresion.comprimir
+
+    def lento(*args, **kwargs):
+        llamadas.append(1)
+        time.sleep(0.05)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(compresion, "comprimir", lento)
+    hilos = [threading.Thread(target=snapshot.variante, args=(snapshot.ejercicios, "gzip")) for _ in range(8)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+
+    assert len(llamadas) == 1
+    assert snapshot.variante(snapshot.ejercicios, "gzip") == original(snapshot.ejercicios, "gzip", maximo=True)
@@ -0,0 +1,99 @@
+# backend/tests/test_codigos.py
+import logging
+import threading
+
+import database
+import models
+import codigos
+import migrar_codigos
+from conftest import crear_catalogo, crear_usuario
+
+LARGO = "for i in range(10):\n    print('hola', i)\n" * 20
+
+
+def test_comprimir_ida_y_vuelta():
+    compresion, datos = codigos.comprimir(LARGO)
+    assert compresion == "zlib" and len(datos) < len(LARGO)
+    assert codigos.descomprimir(compresion, datos) == LARGO
+    # Si no ahorra nada se guarda tal cual
+    assert codigos.comprimir("x=1") == ("nada", b"x=1")
+    assert codigos.descomprimir("nada", b"x=1") == "x=1"
+
+
+def test_guardar_muchos_deduplica(db):
+    hashes = codigos.guardar_muchos(db, [LARGO, "print(1)", LARGO])
+    codigos.guardar(db, "print(1)")
+    db.commit()
+
+    assert hashes[0] == hashes[2] == codigos.hash_de(LARGO)
+    assert db.query(models.Codigo).count() == 2
+    assert codigos.leer(db, hashes) == {hashes[0]: LARGO, hashes[1]: "print(1)"}
+
+
+def test_resolver_mezcla_migradas_y_antiguas(db):
+    usuario = crear_usuario(db, "ana")
+    [ejercicio] = crear_catalogo(db, ejercicios=1)
+    nueva = models.Entrega(usuario_id=usuario.id, ejercicio_id=ejercicio, codigo="",
+                           codigo_hash=codigos.guardar(db, LARGO))
+    antigua = models.Entrega(usuario_id=usuario.id, ejercicio_id=ejercicio, codigo="print('antes')")
+    db.add_all([nueva, antigua])
+    db.commit()
+
+    assert codigos.resolver(db, [nueva, antigua, nueva]) == [LARGO, "print('antes')", LARGO]
+
+
+def test_migrar_y_limpiar(db):
+    usuario = crear_usuario(db, "ana")
+    [ejercicio] = crear_catalogo(db, ejercicios=1)
+    textos = [LARGO, "print(2)", LARGO, None]
+    db.add_all([models.Entrega(usuario_id=usuario.id, ejercicio_id=ejercicio, codigo=t) for t in textos])
+    db.add(models.Codigo(hash="huerfano", compresion="nada", tamano=1, datos=b"x"))
+    db.commit()
+
+    informe = migrar_codigos.migrar(db, lote=3, informar=lambda _: None)
+    assert informe["entregas"] == 4
+    entregas = db.query(models.Entrega).order_by(models.Entrega.id).all()
+    assert all(e.codigo == "" and e.codigo_hash for e in entregas)
+    assert codigos.resolver(db, entregas) == [LARGO, "print(2)", LARGO, ""]
+    # Relanzarla no hace nada
+    assert migrar_codigos.migrar(db, informar=lambda _: None)["entregas"] == 0
+
+    assert migrar_codigos.limpiar(db) == 1
+    assert db.query(models.Codigo).count() == 3
+
+
+def test_limpiar_espera_a_quien_esta_guardando(db):
+    usuario = crear_usuario(db, "ana")
+    [ejercicio] = crear_catalogo(db, ejercicios=1)
+    # Blob huérfano (p.ej. se borraron sus entregas) que alguien vuelve a enviar
+    h = codigos.guardar(db, LARGO)
+    db.commit()
+
+    assert codigos.guardar_muchos(db, [LARGO]) == [h]  # ya existe: no se inserta
+
+    otra = database.SessionLocal()
+    borrados = []
+    limpieza = threading.Thread(target=lambda: borrados.append(migrar_codigos.limpiar(otra)))
+    limpieza.start()
+    limpieza.join(0.3)
+    assert limpieza.is_alive()  # esperando al cerrojo
+
+    db.add(models.Entrega(usuario_id=usuario.id, ejercicio_id=ejercicio, codigo="", codigo_hash=h))
+    db.commit()
+    limpieza.join(5)
+    otra.close()
+
+    assert borrados == [0]
+    assert codigos.leer(db, [h]) == {h: LARGO}
+
+
+def test_resolver_avisa_si_falta_el_blob(db, caplog):
+    usuario = crear_usuario(db, "ana")
+    [ejercicio] = crear_catalogo(db, ejercicios=1)
+    entrega = models.Entrega(usuario_id=usuario.id, ejercicio_id=ejercicio, codigo="", codigo_hash="perdido")
+    db.add(entrega)
+    db.commit()
+
+    with caplog.at_level(logging.ERROR, logger="codigos"):
+        assert codigos.resolver(db, [entrega]) == [""]
+    assert "perdido" in caplog.text
@@ -0,0 +1,124 @@
+# backend/tests/test_compresion.py
+import asyncio
+import gzip
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+import compresion
+from compresion import CompresionMiddleware
+
+GRANDE = ("hola mundo " * 500).encode()
+TROZOS = [f"linea {i}\n".encode() * 50 for i in range(20)]
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.add_middleware(CompresionMiddleware, minimo=1024)
+
+    @app.get("/pequeno")
+    def pequeno():
+        return PlainTextResponse("x" * 100)
+
+    @app.get("/grande")
+    def grande():
+        return Response(GRANDE, media_type="text/plain")
+
+    @app.get("/ya-codificado")
+    def ya_codificado():
+        return Response(gzip.compress(GRANDE), media_type="text/plain", headers={"Content-Encoding": "gzip"})
+
+    @app.get("/archivo.gz")
+    def archivo():
+        return Response(GRANDE, media_type="application/gzip")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse(iter(TROZOS), media_type="application/x-ndjson")
+
+    return app
+
+
+def _pedir(app, ruta, accept="gzip"):
+    # Cuerpo crudo, sin que httpx lo descomprima
+    with TestClient(app).stream("GET", ruta, headers={"Accept-Encoding": accept}) as r:
+        return r, b"".join(r.iter_raw())
+
+
+def test_por_debajo_del_minimo_no_se_toca(app):
+    r, cuerpo = _pedir(app, "/pequeno")
+    assert "content-encoding" not in r.headers
+    assert cuerpo == b"x" * 100
+
+
+def test_respuesta_grande_en_gzip(app):
+    r, cuerpo = _pedir(app, "/grande")
+    assert r.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in r.headers["vary"]
+    assert int(r.headers["content-length"]) == len(cuerpo) < len(GRANDE)
+    assert gzip.decompress(cuerpo) == GRANDE
+
+
+def test_no_recomprime(app):
+    r, cuerpo = _pedir(app, "/ya-codificado")
+    assert r.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(cuerpo) == GRANDE  # una sola capa de gzip
+
+    r, cuerpo = _pedir(app, "/archivo.gz")
+    assert "content-encoding" not in r.headers
+    assert cuerpo == GRANDE
+
+
+@pytest.mark.parametrize("accept", ["gzip;q=0", "identity", "*;q=0", "gzip;q=0, *;q=1"])
+def test_q0_no_comprime(app, accept, monkeypatch):
+    monkeypatch.setattr(compresion, "brotli", None)
+    r, cuerpo = _pedir(app, "/grande", accept)
+    assert "content-encoding" not in r.headers
+    assert cuerpo == GRANDE
+
+
+def test_negociacion(monkeypatch):
+    elegir = compresion.elegir_codificacion
+    monkeypatch.setattr(compresion, "brotli", None)
+    assert elegir("br, gzip;q=0.5") == "gzip"
+    assert elegir("br") is None
+    assert elegir("*") == "gzip"
+    assert elegir("gzip;q=basura") is None
+    monkeypatch.setattr(compresion, "brotli", object())
+    assert elegir("gzip, br") == "br"
+    assert elegir("gzip, br;q=0.5") == "gzip"
+    assert elegir("br;q=0, *") == "gzip"
+
+
+def test_streaming_trozo_a_trozo(app):
+    r, cuerpo = _pedir(app, "/stream")
+    assert r.headers["content-encoding"] == "gzip"
+    assert "content-length" not in r.headers
+    assert gzip.decompress(cuerpo) == b"".join(TROZOS)
+
+
+def test_cada_trozo_se_puede_descomprimir_al_llegar():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        for i, trozo in enumerate(TROZOS):
+            await send({"type": "http.response.body", "body": trozo, "more_body": i < len(TROZOS) - 1})
+
+    enviados = []
+
+    async def send(mensaje):
+        enviados.append(mensaje)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", b"gzip")]}
+    asyncio.run(CompresionMiddleware(app, minimo=1024)(scope, None, send))
+
+    cuerpos = [m for m in enviados if m["type"] == "http.response.body"]
+    assert len(cuerpos) == len(TROZOS)
+    d = zlib.decompressobj(31)
+    for i, m in enumerate(cuerpos):
+        # Z_SYNC_FLUSH: lo recibido hasta aquí ya se descomprime entero
+        assert d.decompress(m["body"]) == TROZOS[i]
+    assert d.eof and not cuerpos[-1]["more_body"]
@@ -0,0 +1,75 @@
+# backend/tests/test_consultas.py
+"""
+Los listados y las estadísticas hacen un número fijo de sentencias SQL por
+request, haya las filas que haya (sin N+1).
+"""
+import pytest
+from sqlalchemy.orm import joinedload
+
+import database
+import depuracion
+import models
+from conftest import cabeceras, crear_catalogo, crear_entregas, crear_usuario
+
+N = 20
+
+
+def sentencias(client, url: str, headers: dict) -> int:
+    with depuracion.vigilar(repeticiones=N, estricto=False) as vigilancia:
+        r = client.get(url, headers=headers)
+    assert r.status_code == 200, r.text
+    return sum(vigilancia.formas.values())
+
+
+@pytest.mark.parametrize("url, rol", [
+    ("/api/entregas", "alumno"),
+    ("/api/admin/entregas", "admin"),
+    ("/api/admin/entregas?limit=1000", "admin"),
+    ("/api/admin/estadisticas", "admin"),
+])
+def test_sentencias_no_crecen_con_las_filas(client, db, url, rol):
+    admin = crear_usuario(db, "admin", "admin")
+    alumnos = [crear_usuario(db, f"alumno{i}").id for i in range(3)]
+    ejercicios = crear_catalogo(db, ejercicios=7, categorias=2)
+    headers = cabeceras(client, "admin" if rol == "admin" else "alumno0")
+
+    crear_entregas(db, alumnos + [admin.id], ejercicios, N)
+    # El primer request carga el usuario en la caché de auth
+    client.get(url, headers=headers)
+    con_n = sentencias(client, url, headers)
+
+    crear_entregas(db, alumnos + [admin.id], ejercicios, 9 * N)
+    con_10n = sentencias(client, url, headers)
+
+    assert con_10n == con_n
+    assert 1 <= con_n <= 3
+
+
+def test_listado_completo(client, db):
+    admin = crear_usuario(db, "admin", "admin")
+    ejercicios = crear_catalogo(db, ejercicios=3)
+    crear_entregas(db, [admin.id], ejercicios, 5)
+
+    r = client.get("/api/admin/entregas", headers=cabeceras(client, "admin"))
+    assert [e["codigo"] for e in r.json()] == [f"print({i})" for i in range(5)]
+
+
+def test_modo_estricto_detecta_n_mas_1(db):
+    alumnos = [crear_usuario(db, f"alumno{i}").id for i in range(6)]
+    ejercicios = crear_catalogo(db, ejercicios=1)
+    crear_entregas(db, alumnos, ejercicios, 6)
+
+    sesion = database.SessionLocal()  # sin los usuarios ya cargados en el identity map
+    try:
+        with depuracion.vigilar(repeticiones=3, estricto=True):
+            with pytest.raises(depuracion.ViolacionSQL, match="N\\+1"):
+                for entrega in sesion.query(models.Entrega).all():
+                    entrega.usuario.nombre  # un SELECT de usuarios por entrega
+
+        sesion.expunge_all()
+        with depuracion.vigilar(repeticiones=3, estricto=True) as vigilancia:
+            entregas = sesion.query(models.Entrega).options(joinedload(models.Entrega.usuario)).all()
+            assert len({e.usuario.nombre for e in entregas}) == 6
+        assert vigilancia.violaciones == []
+    finally:
+        sesion.close()
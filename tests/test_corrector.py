@@ -0,0 +1,148 @@
+# backend/tests/test_corrector.py
+import os
+import shutil
+import sys
+
+import pytest
+
+import corrector
+import models
+from conftest import cabeceras, crear_catalogo, crear_entregas, crear_usuario
+
+aislable = pytest.mark.skipif(
+    os.geteuid() != 0 or shutil.which("unshare") is None,
+    reason="el sandbox necesita root (o CAP_SYS_ADMIN y CAP_SETUID) y unshare",
+)
+
+
+@pytest.fixture(autouse=True)
+def limites_cortos(monkeypatch):
+    monkeypatch.setattr(corrector, "CORRECTOR_CPU_S", 1)
+    monkeypatch.setattr(corrector, "CORRECTOR_TIEMPO_S", 3)
+
+
+def test_salida_correcta_ignora_espacios_finales():
+    assert corrector.salida_correcta("1 \n2\n\n", "1\n2")
+    assert not corrector.salida_correcta("1\n3", "1\n2")
+
+
+@aislable
+def test_corregir():
+    casos = [("1", "2"), ("5", "6")]
+    assert corrector.corregir("print(int(input()) + 1)", casos)[0] == "correcto"
+    assert corrector.corregir("print(int(input()) + 2)", casos)[0] == "incorrecto"
+    assert corrector.corregir("raise ValueError", casos)[0] == "error"
+
+    resultado, detalle = corrector.corregir("while True: pass", casos)
+    assert resultado == "tiempo"
+    assert detalle[1] == {"estado": "no_ejecutado"}
+
+
+@aislable
+def test_limites():
+    assert corrector.ejecutar_caso("import time; time.sleep(60)", "")["estado"] == "tiempo"
+    assert corrector.ejecutar_caso("x = 'a' * (1 << 30)", "")["estado"] == "memoria"
+    assert "File too large" in corrector.ejecutar_caso("open('x', 'w').write('a' * 10000)", "")["error"]
+    assert "BlockingIOError" in corrector.ejecutar_caso("import os; os.fork()", "")["error"]
+
+
+@aislable
+def test_no_ve_la_api():
+    ataque = r'''
+import os, socket
+for ruta in ("/proc/%d/environ" % os.getppid(), input(), os.environ.get("DATABASE_URL", "x")):
+    try:
+        open(ruta).read()
+        print("leido", ruta)
+    except OSError:
+        pass
+try:
+    socket.create_connection(("127.0.0.1", 22), timeout=1)
+    print("red")
+except OSError:
+    pass
+print(os.getuid())
+'''
+    r = corrector.ejecutar_caso(ataque, os.path.join(os.path.dirname(corrector.__file__), "main.py") + "\n")
+    assert r["estado"] == "ok", r["error"]
+    assert int(r["salida"]) >= corrector.CORRECTOR_UID_BASE
+
+
+@aislable
+def test_comprobar_aislamiento():
+    corrector.comprobar_aislamiento()
+
+
+def test_no_arranca_sin_aislamiento(monkeypatch):
+    monkeypatch.setattr(corrector, "CORRECCION_AUTOMATICA", True)
+    monkeypatch.setattr(corrector, "_corrector", None)
+    monkeypatch.setattr(corrector.shutil, "which", lambda _: None)
+    with pytest.raises(RuntimeError):
+        corrector.arrancar()
+
+
+def test_rechaza_sandbox_con_privilegios(monkeypatch):
+    sonda = {"uid": 0, "gid": 0, "ns_pid": os.readlink("/proc/self/ns/pid"),
+             "ns_red": os.readlink("/proc/self/ns/net"), "backend": ["main.py"], "red": True}
+    monkeypatch.setattr(corrector.shutil, "which", lambda _: "/usr/bin/unshare")
+    monkeypatch.setattr(corrector, "ejecutar_caso",
+                        lambda codigo, entrada: {"estado": "ok", "salida": corrector.json.dumps(sonda), "error": ""})
+    with pytest.raises(RuntimeError, match="uid 0"):
+        corrector.comprobar_aislamiento()
+
+
+@aislable
+def test_procesar_rellena_resultado(db):
+    alumno = crear_usuario(db, "alumno")
+    [ejercicio] = crear_catalogo(db, ejercicios=1)
+    db.add(models.CasoPrueba(ejercicio_id=ejercicio, orden=0, entrada="2", salida_esperada="4"))
+    db.commit()
+    [entrega] = crear_entregas(db, [alumno.id], [ejercicio], 1)
+
+    c = corrector.Corrector()
+    try:
+        c._procesar(entrega.id, ejercicio, "print(int(input()) * 2)")
+        # Mismo código otra vez: sale de la memoria, no se ejecuta
+        c._procesar(entrega.id, ejercicio, "print(int(input()) * 2)")
+    finally:
+        c.parar()
+
+    db.expire_all()
+    assert db.get(models.Entrega, entrega.id).resultado == "correcto"
+    assert db.get(models.Progreso, (alumno.id, ejercicio)).ultimo_resultado == "correcto"
+    assert c.ejecutadas == 1
+
+
+def test_endpoints_sin_correccion_automatica(client, db, monkeypatch):
+    monkeypatch.setattr(corrector, "CORRECCION_AUTOMATICA", False)
+    monkeypatch.setattr(corrector, "_corrector", None)
+    crear_usuario(db, "admin", "admin")
+    h = cabeceras(client, "admin")
+
+    assert client.get("/api/admin/corrector", headers=h).json() == {"activo": False}
+    assert client.post("/api/admin/corrector/pendientes", headers=h).status_code == 409
+    # Ni se crea el Corrector ni se prueba el sandbox
+    assert corrector._corrector is None
+
+
+def test_salida_acotada_sin_sandbox(monkeypatch):
+    # El tope se aplica al leer las tuberías, aunque el programa se salte sys.stdout
+    inundar = "import os\nwhile True: os.write(%d, b'x' * 65536)"
+    monkeypatch.setattr(corrector.os, "chown", lambda *_: None)
+    for fd in (1, 2):
+        monkeypatch.setattr(corrector, "_comando", lambda uid: [sys.executable, "-c", inundar % fd])
+        r = corrector.ejecutar_caso("", "")
+        assert r["estado"] == "error"
+        assert r["error"] == "Salida demasiado larga"
+        assert len(r["salida"]) <= corrector.CORRECTOR_SALIDA_MAX
+
+
+@aislable
+def test_salida_acotada():
+    for codigo in ("import os\nwhile True: os.write(1, b'x' * 65536)",
+                   "import sys\nwhile True: sys.__stdout__.write('x' * 65536)",
+                   "print('x' * (1 << 20))"):
+        r = corrector.ejecutar_caso(codigo, "")
+        assert r["estado"] == "error", codigo
+        assert r["error"] == "Salida demasiado larga"
+        assert len(r["salida"]) <= corrector.CORRECTOR_SALIDA_MAX
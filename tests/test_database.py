@@ -0,0 +1,20 @@
+# backend/tests/test_database.py
+import pytest
+from sqlalchemy import exc, text
+
+import database
+import metricas
+
+
+def test_sentencia_que_falla_no_deja_el_inicio_colgado(monkeypatch):
+    tiempos = []
+    monkeypatch.setattr(metricas, "registrar_sentencia", tiempos.append)
+
+    with database.engine.connect() as conn:
+        with pytest.raises(exc.OperationalError):
+            conn.execute(text("SELECT * FROM no_existe"))
+        assert "inicio_sentencia" not in conn.info
+
+        conn.execute(text("SELECT 1"))
+    # Solo la que terminó, y con su propio tiempo
+    assert len(tiempos) == 1 and tiempos[0] < 1
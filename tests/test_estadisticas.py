@@ -0,0 +1,58 @@
+# backend/tests/test_estadisticas.py
+import pytest
+
+import crearusuarios
+import estadisticas
+import models
+from conftest import cabeceras, crear_catalogo, crear_usuario
+
+CLAVES = estadisticas.CLAVES
+
+
+@pytest.fixture(autouse=True)
+def contadores(monkeypatch):
+    monkeypatch.setattr(estadisticas, "CONTADORES_ACTIVOS", True)
+
+
+def _cuadra(client, db, h):
+    panel = client.get("/api/admin/estadisticas", headers=h).json()
+    db.expire_all()
+    assert {c: panel[c] for c in CLAVES} == estadisticas.contar_totales(db)
+
+
+def test_contadores_cuadran_tras_cada_escritura(client, db):
+    crear_usuario(db, "admin", "admin")
+    crear_catalogo(db, ejercicios=2)
+    h = cabeceras(client, "admin")
+    _cuadra(client, db, h)  # sin contadores: los crea con recalcular
+
+    assert client.post("/api/usuarios", json={"email": "b@x", "nombre": "bea", "password": "secreto"}).status_code == 200
+    _cuadra(client, db, h)
+
+    r = client.post("/api/admin/usuarios", headers=h, params={"email": "c@x", "nombre": "carla", "password": "x"})
+    _cuadra(client, db, h)
+    assert client.put(f"/api/admin/usuarios/{r.json()['id']}/rol", headers=h, params={"nuevo_rol": "admin"}).status_code == 200
+    _cuadra(client, db, h)
+
+    crearusuarios.crear_usuario("d@x", "dani", "x")
+    _cuadra(client, db, h)
+
+    categoria_id = db.query(models.Categoria.id).scalar()
+    r = client.post("/api/admin/ejercicios/", headers=h, json={
+        "titulo": "Nuevo", "enunciado": "-", "solucion": "-", "dificultad": "fácil", "categoria_id": categoria_id,
+    })
+    ejercicio_id = r.json()["id"]
+    _cuadra(client, db, h)
+
+    hb = cabeceras(client, "bea")
+    r = client.post("/api/entregas", headers=hb, json={"usuario_id": 0, "ejercicio_id": ejercicio_id, "codigo": "x"})
+    _cuadra(client, db, h)
+    assert client.delete(f"/api/admin/entregas/{r.json()['entrega_id']}", headers=h).status_code == 200
+    _cuadra(client, db, h)
+
+    assert client.delete(f"/api/admin/ejercicios/{ejercicio_id}", headers=h).status_code == 200
+    _cuadra(client, db, h)
+
+    bea = db.query(models.Usuario.id).filter(models.Usuario.nombre == "bea").scalar()
+    assert client.delete(f"/api/admin/usuarios/{bea}", headers=h).status_code == 200
+    _cuadra(client, db, h)
@@ -0,0 +1,89 @@
+# backend/tests/test_exportacion.py
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+import codigos
+import exportacion
+import models
+from conftest import cabeceras, crear_catalogo, crear_entregas, crear_usuario
+
+RARO = 'print("a, b")\n# ñandú; "comillas"\r\n'
+
+
+@pytest.fixture
+def datos(client, db, monkeypatch):
+    # Trozos y bloques pequeños: el cuerpo llega en muchos pedazos
+    monkeypatch.setattr(exportacion, "EXPORTAR_TROZO", 256)
+    monkeypatch.setattr(exportacion, "EXPORTAR_YIELD_PER", 7)
+    admin = crear_usuario(db, "admin", "admin")
+    alumnos = [crear_usuario(db, f"alumno{i}").id for i in range(3)]
+    ejercicios = crear_catalogo(db, ejercicios=4, categorias=2)
+    crear_entregas(db, alumnos, ejercicios, 50)
+    db.add(models.Entrega(usuario_id=alumnos[0], ejercicio_id=ejercicios[0], codigo="",
+                          codigo_hash=codigos.guardar(db, RARO), resultado="correcto"))
+    db.commit()
+    return cabeceras(client, "admin"), alumnos
+
+
+def _esperado(db, usuario_id=None):
+    q = db.query(models.Entrega).order_by(models.Entrega.id)
+    if usuario_id:
+        q = q.filter(models.Entrega.usuario_id == usuario_id)
+    entregas = q.all()
+    return [e.id for e in entregas], codigos.resolver(db, entregas)
+
+
+def _exportar(client, h, **params):
+    with client.stream("GET", "/api/admin/entregas/exportar", headers=h, params=params) as r:
+        assert r.status_code == 200
+        # iter_bytes deshace el Content-Encoding de CompresionMiddleware, no el .gz
+        return r.headers, list(r.iter_bytes())
+
+
+def test_csv_gzip(client, db, datos):
+    h, _ = datos
+    cabeceras_http, trozos = _exportar(client, h, formato="csv", gzip="true")
+    assert cabeceras_http["content-type"] == "application/gzip"
+    assert "content-encoding" not in cabeceras_http
+
+    texto = gzip.decompress(b"".join(trozos)).decode("utf-8")
+    lector = csv.DictReader(io.StringIO(texto, newline=""))
+    filas = list(lector)
+
+    assert lector.fieldnames == exportacion.COLUMNAS
+    ids, textos = _esperado(db)
+    assert [int(f["id"]) for f in filas] == ids
+    assert [f["codigo"] for f in filas] == textos
+    assert filas[-1]["codigo"] == RARO
+    assert filas[-1]["usuario"] == "alumno0"
+
+
+def test_ndjson_filtrado(client, db, datos):
+    h, alumnos = datos
+    _, trozos = _exportar(client, h, formato="ndjson", usuario_id=alumnos[0])
+    filas = [json.loads(l) for l in b"".join(trozos).decode("utf-8").splitlines()]
+
+    ids, textos = _esperado(db, alumnos[0])
+    assert [f["id"] for f in filas] == ids
+    assert [f["codigo"] for f in filas] == textos
+    assert all(list(f) == exportacion.COLUMNAS for f in filas)
+    assert {f["usuario"] for f in filas} == {"alumno0"}
+
+
+def test_ndjson_gzip_sin_filas(client, db, datos):
+    h, _ = datos
+    _, trozos = _exportar(client, h, formato="ndjson", gzip="true", resultado="no-existe")
+    # Sin filas sigue siendo un gzip válido (vacío)
+    assert gzip.decompress(b"".join(trozos)) == b""
+
+
+def test_generar_va_por_trozos(db, datos):
+    trozos = list(exportacion.generar("csv", False, (None,) * 6))
+    assert len(trozos) > 5
+    assert all(len(t) < 2 * exportacion.EXPORTAR_TROZO for t in trozos)
+    filas = list(csv.DictReader(io.StringIO(b"".join(trozos).decode("utf-8"), newline="")))
+    assert len(filas) == db.query(models.Entrega).count()
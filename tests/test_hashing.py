@@ -0,0 +1,37 @@
+# backend/tests/test_hashing.py
+import threading
+
+import hashing
+from conftest import PASSWORD, crear_usuario
+
+
+def test_pool_saturado_da_503(client, db, monkeypatch):
+    crear_usuario(db, "ana")
+    monkeypatch.setattr(hashing, "_pendientes", threading.BoundedSemaphore(1))
+    dentro, soltar = threading.Event(), threading.Event()
+    verificar = hashing.verify_and_update
+
+    def verificar_bloqueado(*args):
+        dentro.set()
+        soltar.wait(10)
+        return verificar(*args)
+
+    monkeypatch.setattr(hashing, "verify_and_update", verificar_bloqueado)
+    login = lambda: client.post("/api/login", json={"nombre": "ana", "password": PASSWORD})
+
+    primero = {}
+    hilo = threading.Thread(target=lambda: primero.update(r=login()))
+    hilo.start()
+    try:
+        assert dentro.wait(5)  # el único hueco del pool está ocupado
+
+        r = login()
+        assert r.status_code == 503
+        assert r.headers["Retry-After"] == "1"
+    finally:
+        soltar.set()
+        hilo.join(10)
+
+    assert primero["r"].status_code == 200
+    # Con el hueco libre otra vez se atiende con normalidad
+    assert login().status_code == 200
@@ -0,0 +1,96 @@
+# backend/tests/test_importacion.py
+"""
+Importación de ejercicios en lote (INSERT multi-fila con reintento fila a fila)
+y en streaming NDJSON.
+"""
+import json
+
+import pytest
+from sqlalchemy import text
+
+import admin_ejercicios
+import database
+import estadisticas
+import models
+from conftest import cabeceras, crear_catalogo, crear_usuario
+
+
+@pytest.fixture
+def titulo_prohibido():
+    """
+    Un trigger hace fallar en la BD el INSERT de un ejercicio titulado "malo"
+    (y con él el INSERT multi-fila entero), como una restricción que no se
+    puede comprobar antes.
+    """
+    with database.engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TRIGGER titulo_prohibido BEFORE INSERT ON ejercicios "
+            "WHEN NEW.titulo = 'malo' BEGIN SELECT RAISE(ABORT, 'titulo prohibido'); END"
+        ))
+    yield
+    with database.engine.begin() as conn:
+        conn.execute(text("DROP TRIGGER titulo_prohibido"))
+
+
+@pytest.fixture
+def admin(client, db, monkeypatch):
+    monkeypatch.setattr(estadisticas, "CONTADORES_ACTIVOS", True)
+    crear_usuario(db, "admin", "admin")
+    crear_catalogo(db, ejercicios=1)
+    estadisticas.recalcular(db)
+    return cabeceras(client, "admin")
+
+
+def _cuadra(db, informe):
+    db.expire_all()
+    titulos = [t for (t,) in db.query(models.Ejercicio.titulo).order_by(models.Ejercicio.id)]
+    assert titulos[1:] == [e["titulo"] for e in informe["ejercicios_creados"]]
+    assert estadisticas.leer_totales(db)["ejercicios"] == len(titulos)
+
+
+def test_lote_con_una_fila_mala_guarda_el_resto(client, db, admin, titulo_prohibido):
+    payload = [{"titulo": "uno"}, {"titulo": "  "}, {"titulo": "malo"}, {"titulo": "cuatro"}]
+    r = client.post("/api/admin/ejercicios/importar-lote", headers=admin, json=payload)
+    assert r.status_code == 200, r.text
+    informe = r.json()
+
+    assert informe["insertados"] == 2
+    assert [e["index"] for e in informe["ejercicios_creados"]] == [0, 3]
+    assert [e["index"] for e in informe["detalle_errores"]] == [1, 2]
+    assert "titulo prohibido" in informe["detalle_errores"][1]["error"]
+    _cuadra(db, informe)
+
+
+def test_lote_sin_errores(client, db, admin):
+    payload = [{"titulo": f"imp{i}", "dificultad": "Dificil"} for i in range(5)]
+    informe = client.post("/api/admin/ejercicios/importar-lote", headers=admin, json=payload).json()
+    assert informe["insertados"] == 5 and informe["errores"] == 0
+    assert [e["index"] for e in informe["ejercicios_creados"]] == list(range(5))
+    assert {d for (d,) in db.query(models.Ejercicio.dificultad).filter(models.Ejercicio.titulo.like("imp%"))} == {"difícil"}
+    _cuadra(db, informe)
+
+
+def test_ndjson_en_trozos_y_por_bloques(client, db, admin, titulo_prohibido, monkeypatch):
+    monkeypatch.setattr(admin_ejercicios, "IMPORTAR_TAMANO_BLOQUE", 2)
+    lineas = [json.dumps({"titulo": t}) for t in ["a", "b", "malo", "c", "d"]]
+    lineas.insert(3, "{no es json")
+    lineas.insert(1, "")
+    cuerpo = ("\n".join(lineas) + "\n").encode()
+
+    def trozos():
+        # Cortes a mitad de línea: _lineas tiene que recomponerlas
+        for i in range(0, len(cuerpo), 7):
+            yield cuerpo[i:i + 7]
+
+    r = client.post("/api/admin/ejercicios/importar-ndjson", headers=admin, content=trozos())
+    assert r.status_code == 200, r.text
+    informe = r.json()
+
+    assert [e["titulo"] for e in informe["ejercicios_creados"]] == ["a", "b", "c", "d"]
+    assert [e["index"] for e in informe["detalle_errores"]] == [2, 3]
+    _cuadra(db, informe)
+
+
+def test_ndjson_vacio_da_400(client, admin):
+    r = client.post("/api/admin/ejercicios/importar-ndjson", headers=admin, content=b"\n\n")
+    assert r.status_code == 400
@@ -0,0 +1,249 @@
+# backend/tests/test_ingesta.py
+"""
+Ingesta diferida de entregas: errores del escritor, spool y validación.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.exc import OperationalError
+
+import models
+import ingesta
+import arranque
+from conftest import crear_usuario, crear_catalogo, cabeceras
+
+
+@pytest.fixture
+def escritor(monkeypatch):
+    """
+    Una IngestaEntregas sin hilo: el test llama a _guardar a mano.
+    """
+    instancia = ingesta.IngestaEntregas()
+    monkeypatch.setattr(ingesta, "_ingesta", instancia)
+    monkeypatch.setattr(ingesta.time, "sleep", lambda _: None)
+    yield instancia
+    instancia._spool.close()
+    os.remove(instancia.ruta)
+
+
+def _lote(escritor, usuario_id, ejercicios, fechas=None):
+    tickets = []
+    for i, ejercicio_id in enumerate(ejercicios):
+        tickets.append(escritor.encolar(usuario_id, ejercicio_id, f"print({i})", datetime(2026, 1, 1, 0, i)))
+    lote = [escritor.cola.get_nowait() for _ in tickets]
+    for registro, fecha in zip(lote, fechas or []):
+        if fecha is not None:
+            registro["fecha_envio"] = fecha
+    return tickets, lote
+
+
+def _descartadas():
+    ruta = os.path.join(ingesta.INGESTA_SPOOL_DIR, "descartadas.ndjson")
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, encoding="utf-8") as f:
+        return [json.loads(linea) for linea in f]
+
+
+@pytest.fixture(autouse=True)
+def sin_descartadas():
+    ruta = os.path.join(ingesta.INGESTA_SPOOL_DIR, "descartadas.ndjson")
+    if os.path.exists(ruta):
+        os.remove(ruta)
+
+
+def test_fila_mala_se_descarta_y_el_resto_se_guarda(db, escritor):
+    usuario = crear_usuario(db, "ana")
+    ejercicios = crear_catalogo(db, ejercicios=3)
+    tickets, lote = _lote(escritor, usuario.id, ejercicios, fechas=[None, "no-es-una-fecha", None])
+
+    escritor._guardar(lote)
+
+    assert db.query(models.Entrega).count() == 2
+    assert ingesta.estado(db, tickets[0])["estado"] == "guardada"
+    assert ingesta.estado(db, tickets[1]) == {"estado": "descartada", "entrega_id": None}
+    assert ingesta.estado(db, tickets[2])["estado"] == "guardada"
+    [apartada] = _descartadas()
+    assert apartada["ticket"] == tickets[1]
+    assert "ValueError" in apartada["error"]
+
+
+def test_error_transitorio_se_reintenta(db, escritor, monkeypatch):
+    usuario = crear_usuario(db, "ana")
+    ejercicios = crear_catalogo(db, ejercicios=2)
+    tickets, lote = _lote(escritor, usuario.id, ejercicios)
+
+    original = ingesta._insertar_filas
+    fallos = []
+
+    def caida(db, registros):
+        if len(fallos) < 3:
+            fallos.append(1)
+            raise OperationalError("INSERT", {}, Exception("server closed the connection"))
+        return original(db, registros)
+
+    monkeypatch.setattr(ingesta, "_insertar_filas", caida)
+    escritor._guardar(lote)
+
+    assert len(fallos) == 3
+    assert db.query(models.Entrega).count() == 2
+    assert all(ingesta.estado(db, t)["estado"] == "guardada" for t in tickets)
+    assert _descartadas() == []
+
+
+def test_error_no_transitorio_fuera_de_las_filas_no_bloquea(db, escritor, monkeypatch):
+    usuario = crear_usuario(db, "ana")
+    ejercicios = crear_catalogo(db, ejercicios=2)
+    tickets, lote = _lote(escritor, usuario.id, ejercicios)
+
+    def roto(*_):
+        raise RuntimeError("bug")
+
+    monkeypatch.setattr(ingesta.estadisticas, "sumar", roto)
+    escritor._guardar(lote)
+
+    assert db.query(models.Entrega).count() == 0
+    assert [r["ticket"] for r in _descartadas()] == tickets
+    assert all(ingesta.estado(db, t)["estado"] == "descartada" for t in tickets)
+
+
+def test_spool_nuevo_no_es_huerfano(escritor):
+    # reaplicar_huerfanos de otro worker no puede quedarse con el spool vivo
+    with open(escritor.ruta, "r+", encoding="utf-8") as f:
+        assert not ingesta._bloquear(f)
+    assert not os.path.exists(escritor.ruta + ".nuevo")
+
+
+def test_encolar_sin_ingesta_da_503(monkeypatch):
+    monkeypatch.setattr(ingesta, "_ingesta", None)
+    with pytest.raises(HTTPException) as error:
+        ingesta.encolar(1, 1, "print(1)", datetime.utcnow())
+    assert error.value.status_code == 503
+    assert error.value.headers["Retry-After"]
+
+
+def test_ejercicio_creado_por_otro_worker(client, db, escritor, monkeypatch):
+    monkeypatch.setattr(ingesta, "INGESTA_DIFERIDA", True)
+    crear_usuario(db, "ana")
+    crear_catalogo(db, ejercicios=1)
+    h = cabeceras(client, "ana")
+    assert client.get("/api/ejercicios", headers=h).status_code == 200  # snapshot en memoria
+
+    # Sin catalogo.invalidar(): como si lo hubiera creado otro worker
+    nuevo = models.Ejercicio(titulo="Nuevo", enunciado="-", solucion="-", dificultad="fácil",
+                             lenguaje="Python", categoria_id=db.query(models.Categoria.id).scalar())
+    db.add(nuevo)
+    db.commit()
+
+    r = client.post("/api/entregas", headers=h, json={"usuario_id": 0, "ejercicio_id": nuevo.id, "codigo": "x"})
+    assert r.status_code == 202, r.text
+    r = client.post("/api/entregas", headers=h, json={"usuario_id": 0, "ejercicio_id": nuevo.id + 1, "codigo": "x"})
+    assert r.status_code == 404
+
+
+def test_ticket_de_otro_worker_se_lee_de_la_bd(client, db, escritor):
+    usuario = crear_usuario(db, "ana")
+    ejercicios = crear_catalogo(db, ejercicios=2)
+    otro = ingesta.IngestaEntregas()  # otro worker: no es ingesta._ingesta
+    try:
+        tickets, lote = _lote(otro, usuario.id, ejercicios)
+        h = cabeceras(client, "ana")
+
+        r = client.get(f"/api/entregas/ticket/{tickets[0]}", headers=h)
+        assert r.json() == {"estado": "pendiente", "entrega_id": None}
+
+        otro._guardar(lote)
+        ids = [e.id for e in db.query(models.Entrega).order_by(models.Entrega.id)]
+        for ticket, entrega_id in zip(tickets, ids):
+            r = client.get(f"/api/entregas/ticket/{ticket}", headers=h)
+            assert r.json() == {"estado": "guardada", "entrega_id": entrega_id}
+
+        ajeno = f"{escritor.spool}.{'0' * 32}"
+        assert client.get(f"/api/entregas/ticket/{ajeno}", headers=h).status_code == 404
+        assert client.get("/api/entregas/ticket/..%2f..%2fx", headers=h).status_code == 404
+    finally:
+        otro._spool.close()
+        os.remove(otro.ruta)
+
+
+@pytest.fixture
+def con_hilo(monkeypatch):
+    """
+    Una IngestaEntregas con su hilo escritor, como ingesta._ingesta.
+    """
+    instancia = ingesta.IngestaEntregas()
+    monkeypatch.setattr(ingesta, "_ingesta", instancia)
+    monkeypatch.setattr(ingesta, "INGESTA_LATENCIA_MAX_MS", 1)
+    yield instancia
+    if not instancia._spool.closed:
+        instancia._spool.close()
+    if os.path.exists(instancia.ruta):
+        os.remove(instancia.ruta)
+
+
+def _esperar(condicion, segundos=5):
+    limite = time.monotonic() + segundos
+    while not condicion() and time.monotonic() < limite:
+        time.sleep(0.01)
+    return condicion()
+
+
+def test_escritor_sobrevive_a_un_error_inesperado(db, con_hilo, monkeypatch):
+    usuario = crear_usuario(db, "ana")
+    [ejercicio_id] = crear_catalogo(db, ejercicios=1)
+    guardar = con_hilo._guardar
+    fallos = []
+
+    def guardar_con_bug(lote):
+        if not fallos:
+            fallos.append(1)
+            raise KeyError("bug")
+        guardar(lote)
+
+    monkeypatch.setattr(con_hilo, "_guardar", guardar_con_bug)
+    con_hilo.arrancar()
+    primero = con_hilo.encolar(usuario.id, ejercicio_id, "print(1)", datetime(2026, 1, 1))
+    assert _esperar(lambda: fallos)
+    segundo = con_hilo.encolar(usuario.id, ejercicio_id, "print(2)", datetime(2026, 1, 1))
+
+    assert _esperar(lambda: ingesta.estado(db, segundo)["estado"] == "guardada")
+    assert ingesta.vivo()
+    # El lote que falló sigue en el spool para reaplicarlo al arrancar
+    assert ingesta.estado(db, primero)["estado"] == "pendiente"
+    con_hilo.parar()
+    assert primero in open(con_hilo.ruta, encoding="utf-8").read()
+
+
+def test_parar_no_espera_sin_limite(db, con_hilo, monkeypatch):
+    usuario = crear_usuario(db, "ana")
+    [ejercicio_id] = crear_catalogo(db, ejercicios=1)
+    soltar = threading.Event()
+    monkeypatch.setattr(con_hilo, "_guardar", lambda lote: soltar.wait(10))
+    monkeypatch.setattr(ingesta, "INGESTA_PARAR_TIMEOUT_S", 0.2)
+    con_hilo.arrancar()
+    con_hilo.encolar(usuario.id, ejercicio_id, "print(1)", datetime(2026, 1, 1))
+
+    inicio = time.monotonic()
+    con_hilo.parar()
+    assert time.monotonic() - inicio < 2
+    # Atascado: el spool sigue bloqueado para que nadie lo reaplique a la vez
+    assert not con_hilo._spool.closed
+    soltar.set()
+    con_hilo._hilo.join(5)
+
+
+def test_ready_vigila_el_escritor(monkeypatch):
+    monkeypatch.setattr(ingesta, "INGESTA_DIFERIDA", True)
+    monkeypatch.setattr(ingesta, "_ingesta", None)
+    monkeypatch.setattr(arranque, "_calentado", threading.Event())
+    arranque._calentado.set()
+    monkeypatch.setattr(arranque, "_comprobar_bd", lambda: (True, "ok"))
+
+    listo, cuerpo = arranque.estado()
+    assert not listo
+    assert cuerpo["status"] == "sin_ingesta"
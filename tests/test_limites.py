@@ -0,0 +1,70 @@
+# backend/tests/test_limites.py
+import json
+
+import limites
+from conftest import PASSWORD, crear_usuario
+
+
+def login(client, nombre: str, password: str = "mal", relleno: int = 0, ip: str = None):
+    cuerpo = {"nombre": nombre, "password": password}
+    if relleno:
+        cuerpo["relleno"] = "x" * relleno
+    headers = {"Content-Type": "application/json"}
+    if ip:
+        headers["X-Forwarded-For"] = ip
+    return client.post("/api/login", content=json.dumps(cuerpo), headers=headers)
+
+
+def test_limite_por_usuario(client, db):
+    crear_usuario(db, "alumno")
+    estados = [login(client, "alumno").status_code for _ in range(12)]
+    assert estados[:10] == [401] * 10
+    assert estados[10:] == [429, 429]
+
+    r = login(client, "alumno", PASSWORD)
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+
+    # Otra cuenta tiene su propio cubo
+    assert login(client, "otro").status_code == 401
+
+
+def test_el_nombre_se_normaliza(client, db):
+    crear_usuario(db, "alumno")
+    for i in range(10):
+        login(client, ["alumno", "ALUMNO", " Alumno "][i % 3])
+    assert login(client, "alumno").status_code == 429
+
+
+def test_cuerpo_grande_no_salta_el_limite(client, db):
+    crear_usuario(db, "alumno")
+    estados = [login(client, "alumno", relleno=70 * 1024).status_code for _ in range(15)]
+    assert estados == [413] * 15
+    # Un cuerpo justo por debajo del máximo sí cuenta para el cubo del usuario
+    estados = [login(client, "alumno", relleno=60 * 1024).status_code for _ in range(11)]
+    assert estados[-1] == 429
+
+
+def test_sin_nombre_tambien_se_limita(client):
+    estados = [client.post("/api/login", content=b"no es json",
+                           headers={"Content-Type": "application/json"}).status_code for _ in range(11)]
+    assert estados[:10] == [422] * 10
+    assert estados[10] == 429
+
+
+def test_x_forwarded_for_falsificado_no_cambia_de_cubo(client, monkeypatch):
+    monkeypatch.setattr(limites, "LIMITES_PROXIES_CONFIANZA", 1)
+    # El cliente pone lo que quiere a la izquierda; el proxy añade su IP real al final
+    estados = [login(client, f"u{i}", ip=f"10.0.0.{i}, 203.0.113.7").status_code for i in range(61)]
+    assert estados[:60] == [401] * 60
+    assert estados[60] == 429
+    assert login(client, "otro", ip="10.0.0.1, 203.0.113.8").status_code == 401
+
+
+def test_backend_sqlite_compartido(tmp_path):
+    ruta = str(tmp_path / "limites.db")
+    # Dos "workers" con el mismo archivo gastan las mismas fichas
+    a, b = limites.BackendSQLite(ruta), limites.BackendSQLite(ruta)
+    permitidos = [(a if i % 2 else b).consumir("k", 4, 4 / 60)[0] for i in range(6)]
+    assert permitidos == [True] * 4 + [False] * 2
+    assert a.consumir("otra", 4, 4 / 60) == (True, 0.0)
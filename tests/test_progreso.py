@@ -0,0 +1,73 @@
+# backend/tests/test_progreso.py
+import random
+from datetime import datetime, timedelta
+
+import models
+import progreso
+from conftest import crear_catalogo, crear_usuario
+
+
+def _filas(db) -> list:
+    P = models.Progreso
+    return [
+        tuple(f) for f in db.query(
+            P.usuario_id, P.ejercicio_id, P.intentos, P.primera_entrega,
+            P.ultima_entrega, P.ultima_entrega_id, P.ultimo_resultado,
+        ).order_by(P.usuario_id, P.ejercicio_id)
+    ]
+
+
+def _entregas(db, usuario_id: int, ejercicios: list, fechas: list) -> list:
+    filas = [
+        models.Entrega(usuario_id=usuario_id, ejercicio_id=ejercicios[i % len(ejercicios)],
+                       codigo="", fecha_envio=fecha)
+        for i, fecha in enumerate(fechas)
+    ]
+    db.add_all(filas)
+    db.flush()
+    return [(f.usuario_id, f.ejercicio_id, f.fecha_envio, f.id) for f in filas]
+
+
+def test_entrega_atrasada_no_pisa_la_ultima(db):
+    usuario = crear_usuario(db, "ana")
+    [ejercicio] = crear_catalogo(db, ejercicios=1)
+    antigua, nueva = _entregas(db, usuario.id, [ejercicio], [datetime(2026, 1, 1), datetime(2026, 1, 2)])
+
+    progreso.registrar(db, [nueva])
+    progreso.actualizar_resultado(db, nueva[3], usuario.id, ejercicio, "correcto")
+    progreso.registrar(db, [antigua])
+    db.commit()
+
+    [(_, _, intentos, primera, ultima, ultima_id, resultado)] = _filas(db)
+    assert (intentos, primera, ultima, ultima_id, resultado) == (2, antigua[2], nueva[2], nueva[3], "correcto")
+
+
+def test_misma_fecha_gana_el_id_mayor(db):
+    usuario = crear_usuario(db, "ana")
+    [ejercicio] = crear_catalogo(db, ejercicios=1)
+    fecha = datetime(2026, 1, 1)
+    primera, segunda = _entregas(db, usuario.id, [ejercicio], [fecha, fecha])
+
+    progreso.registrar(db, [segunda])
+    progreso.registrar(db, [primera])
+    db.commit()
+
+    assert _filas(db)[0][5] == segunda[3]
+
+
+def test_en_desorden_coincide_con_recalcular(db):
+    usuario = crear_usuario(db, "ana")
+    ejercicios = crear_catalogo(db, ejercicios=3)
+    rnd = random.Random(3)
+    fechas = [datetime(2026, 1, 1) + timedelta(minutes=rnd.randrange(100)) for _ in range(40)]
+    entregas = _entregas(db, usuario.id, ejercicios, fechas)
+
+    rnd.shuffle(entregas)
+    for i in range(0, len(entregas), 7):
+        progreso.registrar(db, entregas[i:i + 7])
+    db.commit()
+    incremental = _filas(db)
+
+    progreso.recalcular(db)
+    db.commit()
+    assert incremental == _filas(db)
@@ -0,0 +1,64 @@
+# backend/tests/test_sesiones.py
+from datetime import datetime, timedelta
+
+import models
+import sesiones
+from conftest import PASSWORD, crear_usuario
+
+
+def _login(client, nombre: str = "ana") -> str:
+    r = client.post("/api/login", json={"nombre": nombre, "password": PASSWORD})
+    assert r.status_code == 200, r.text
+    return r.json()["refresh_token"]
+
+
+def _renovar(client, token: str):
+    return client.post("/api/token/refresh", json={"refresh_token": token})
+
+
+def test_rotacion(client, db):
+    crear_usuario(db, "ana")
+    primero = _login(client)
+    r = _renovar(client, primero)
+    assert r.status_code == 200
+    segundo = r.json()["refresh_token"]
+    assert segundo != primero
+    assert r.json()["usuario"]["nombre"] == "ana"
+    assert _renovar(client, segundo).status_code == 200
+
+
+def test_reutilizacion_dentro_del_margen_da_un_hermano(client, db):
+    crear_usuario(db, "ana")
+    token = _login(client)
+    pestana_a = _renovar(client, token)
+    pestana_b = _renovar(client, token)
+
+    assert pestana_a.status_code == 200
+    assert pestana_b.status_code == 200
+    hermanos = [pestana_a.json()["refresh_token"], pestana_b.json()["refresh_token"]]
+    assert hermanos[0] != hermanos[1]
+    # Los dos siguen la cadena por separado
+    assert all(_renovar(client, t).status_code == 200 for t in hermanos)
+    assert len({f for (f,) in db.query(models.TokenRefresco.familia)}) == 1
+
+
+def test_reutilizacion_fuera_del_margen_revoca_la_familia(client, db):
+    crear_usuario(db, "ana")
+    token = _login(client)
+    siguiente = _renovar(client, token).json()["refresh_token"]
+
+    hace_rato = datetime.utcnow() - timedelta(seconds=sesiones.REFRESCO_GRACIA_S + 1)
+    db.query(models.TokenRefresco).filter(models.TokenRefresco.usado.isnot(None)).update({"usado": hace_rato})
+    db.commit()
+
+    assert _renovar(client, token).status_code == 401
+    assert _renovar(client, siguiente).status_code == 401
+    assert db.query(models.TokenRefresco).count() == 0
+
+
+def test_logout_y_token_desconocido(client, db):
+    crear_usuario(db, "ana")
+    token = _login(client)
+    assert client.post("/api/logout", json={"refresh_token": token}).status_code == 200
+    assert _renovar(client, token).status_code == 401
+    assert _renovar(client, "no-existe").status_code == 401